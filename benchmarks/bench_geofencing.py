@@ -0,0 +1,245 @@
+"""Reproducible benchmarks for geofence generation, serialization and querying
+
+Run from the repo root, e.g.:
+
+    python benchmarks/bench_geofencing.py --sizes 1000 10000 100000 --output bench_results.json
+
+Every stage is timed on seeded synthetic hazard feeds spread over India, and
+results are written as JSON so runs from different commits can be compared.
+Pass --trace-memory to also record the tracemalloc peak per stage (tracing
+slows Python-heavy stages several-fold, so timings from such runs are not
+comparable with untraced ones).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geofencing.columnar import ColumnarGeofences, write_columnar  # noqa: E402
+from geofencing.geometry import adaptive_circle_rings, circle_features, circle_rings  # noqa: E402
+from geofencing.index import GeofenceIndex  # noqa: E402
+from geofencing.output import write_feature_collection  # noqa: E402
+from geofencing.riskgrid import RiskGrid  # noqa: E402
+from geofencing.routes import route_zones  # noqa: E402
+from geofencing.scoring import RiskScorer  # noqa: E402
+from geofencing.store import FeatureStore  # noqa: E402
+from geofencing.tiles import write_tiles  # noqa: E402
+
+MIN_LAT, MAX_LAT = 6.5, 37.1
+MIN_LON, MAX_LON = 68.1, 97.4
+
+# Mirrors the mix of risk types, severities and radii the generators emit
+RISKS = ("weather_hazard", "traffic_incident", "air_quality", "crowd_density",
+         "safety_concern", "natural_disaster", "industrial_hazard", "elevation_hazard")
+SEVERITIES = ("low", "medium", "high", "extreme")
+RADII_KM = {"low": (3, 15), "medium": (5, 25), "high": (8, 40), "extreme": (12, 60)}
+
+TRACE_MEMORY = False
+
+
+def synthetic_feed(size, seed):
+    """Seeded hazard points: lat/lon/radius arrays plus property dicts"""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(MIN_LAT, MAX_LAT, size)
+    lons = rng.uniform(MIN_LON, MAX_LON, size)
+    risks = rng.choice(RISKS, size)
+    severities = rng.choice(SEVERITIES, size, p=(0.1, 0.35, 0.4, 0.15))
+    radii = np.array([rng.uniform(*RADII_KM[s]) for s in severities])
+    properties = [
+        {"risk": r, "severity": s, "source": "Synthetic", "name": f"Zone {i}", "city": f"City {i % 500}"}
+        for i, (r, s) in enumerate(zip(risks.tolist(), severities.tolist()))
+    ]
+    return lats, lons, radii, properties
+
+
+@contextlib.contextmanager
+def measure(results, stage, size, **extra):
+    """Record wall time (and traced peak memory if enabled) of the enclosed block"""
+    record = {"stage": stage, "size": size}
+    if TRACE_MEMORY:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        memory = ""
+        if TRACE_MEMORY:
+            record["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+            tracemalloc.stop()
+            memory = f" {record['peak_mb']:>10.1f} MB"
+        record.update(extra)
+        results.append(record)
+        print(f"  {stage:<28} n={size:<8} {record['seconds']:>10.4f}s{memory}")
+
+
+def bench_size(size, seed, workdir, results):
+    lats, lons, radii, properties = synthetic_feed(size, seed)
+
+    with measure(results, "circles.fixed_32", size):
+        circle_rings(lats, lons, radii, num_points=32)
+    with measure(results, "circles.adaptive", size) as record:
+        rings = adaptive_circle_rings(lats, lons, radii)
+        record["vertices"] = int(sum(len(r) for r in rings))
+    with measure(results, "circles.features", size):
+        features = list(circle_features(lats, lons, radii, properties=properties))
+    with measure(results, "circles.store", size) as record:
+        store = FeatureStore()
+        store.add_circles(lats, lons, radii, properties=properties)
+        record["array_bytes"] = store.nbytes()
+    del store
+
+    baseline = os.path.join(workdir, f"baseline_{size}.json")
+    compact = os.path.join(workdir, f"compact_{size}.json")
+    columnar = os.path.join(workdir, f"columnar_{size}.bin")
+    with measure(results, "write.json_indent2", size) as record:
+        with open(baseline, "w") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f, indent=2)
+        record["bytes"] = os.path.getsize(baseline)
+    with measure(results, "write.compact_stream", size) as record:
+        write_feature_collection(compact, features, compress=("gzip",))
+        record["bytes"] = os.path.getsize(compact)
+        record["gzip_bytes"] = os.path.getsize(compact + ".gz")
+    with measure(results, "write.columnar", size) as record:
+        write_columnar(columnar, features)
+        record["bytes"] = os.path.getsize(columnar)
+
+    tiles = os.path.join(workdir, f"tiles_{size}.mbtiles")
+    with measure(results, "write.vector_tiles_z3_z8", size) as record:
+        record["tiles"] = sum(write_tiles(features, tiles, 3, 8).values())
+        record["bytes"] = os.path.getsize(tiles)
+
+    with measure(results, "load.json", size):
+        with open(compact) as f:
+            json.load(f)
+    with measure(results, "load.columnar_open", size):
+        reader = ColumnarGeofences(columnar)
+        reader.bbox.sum()
+
+    with measure(results, "query.index_build", size):
+        index = GeofenceIndex(features)
+    rng = np.random.default_rng(seed + 1)
+    n_points = min(100_000, max(1000, size))
+    q_lats = rng.uniform(MIN_LAT, MAX_LAT, n_points)
+    q_lons = rng.uniform(MIN_LON, MAX_LON, n_points)
+    with measure(results, "query.points_batch", size, points=n_points) as record:
+        hits = index.query_many(q_lats, q_lons)
+        record["matches"] = int(sum(map(len, hits)))
+    scorer = RiskScorer(features)
+    with measure(results, "query.score_pings", size, points=n_points) as record:
+        scores, _, _ = scorer.score_arrays(q_lats, q_lons)
+        record["scored"] = int(np.count_nonzero(scores))
+    with measure(results, "query.grid_rasterize", size) as record:
+        grid = RiskGrid.from_features(features)
+        record["cells_at_risk"] = int(np.count_nonzero(grid.severity))
+    with measure(results, "query.grid_lookup", size, points=n_points):
+        grid.lookup(q_lats, q_lons)
+    with measure(results, "query.points_single", size, points=1000):
+        for lat, lon in zip(q_lats[:1000].tolist(), q_lons[:1000].tolist()):
+            index.query(lat, lon)
+
+    # A 1,000 km trek-like route densified to ~100 m steps
+    route_lats = np.linspace(28.0, 34.5, 10_000) + 0.2 * np.sin(np.linspace(0, 20, 10_000))
+    route_lons = np.linspace(77.0, 79.5, 10_000)
+    with measure(results, "query.route_points", size, points=route_lats.size):
+        index.query_many(route_lats, route_lons)
+    route_zones(index, route_lats[:2], route_lons[:2])  # builds the edge grid
+    with measure(results, "query.route_corridor", size, points=route_lats.size) as record:
+        record["passes"] = len(route_zones(index, route_lats, route_lons, buffer_km=1.0))
+
+    for path in (baseline, compact, compact + ".gz", columnar, tiles):
+        os.remove(path)
+
+
+def bench_generators(workdir, results):
+    """Run the generator classes end to end inside a scratch data directory"""
+    import comprehensive_india_geofence
+    import enhanced_multi_api_geofence
+
+    cwd = os.getcwd()
+    saved = {name: os.environ.get(name) for name in ("HTTP_CACHE", "LAND_MASK")}
+    # No response cache, and a land mask built in the scratch directory
+    os.environ.update(HTTP_CACHE="", LAND_MASK=os.path.join(workdir, "india_land_mask.npz"))
+    os.chdir(workdir)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with measure(results, "generator.enhanced", 0):
+                enhanced_multi_api_geofence.EnhancedMultiApiGeofence().generate_enhanced_geofences()
+            with measure(results, "generator.comprehensive", 0):
+                comprehensive_india_geofence.ComprehensiveIndiaGeofence().generate_comprehensive_india_geofences()
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--skip-generators", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="record tracemalloc peak per stage")
+    args = parser.parse_args()
+
+    global TRACE_MEMORY
+    TRACE_MEMORY = args.trace_memory
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"📏 {size} synthetic zones")
+            bench_size(size, args.seed, workdir, results)
+        if not args.skip_generators:
+            print("🏭 Generator classes")
+            bench_generators(workdir, results)
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "trace_memory": args.trace_memory,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📁 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,21 @@ import csv
 from io import StringIO
 import os
 
+from geofencing.delta import describe_delta, write_incremental
+from geofencing.dissolve import dissolve_features
+from geofencing.geometry import DEFAULT_MAX_CHORD_ERROR_M
+from geofencing.landmask import default_mask
+from geofencing.metrics import metrics
+from geofencing.properties import RISK_TTL_SECONDS
+from geofencing.simplify import DEFAULT_TOLERANCE_M, simplify_features
+from geofencing.store import FeatureStore
+
 class ComprehensiveIndiaGeofence:
+    # Circle vertex density: max gap between polygon edge and true circle
+    max_chord_error_m = DEFAULT_MAX_CHORD_ERROR_M
+    
     def __init__(self):
-        self.features = []
+        self.features = FeatureStore(ttls=RISK_TTL_SECONDS)
         self.indian_states = {
             'Andhra Pradesh': {'lat': 15.9129, 'lon': 79.7400},
             'Arunachal Pradesh': {'lat': 28.2180, 'lon': 94.7278},
@@ -185,62 +197,67 @@ class ComprehensiveIndiaGeofence:
     
     def create_circular_geofence(self, lat, lon, radius_km=20, properties=None):
         """Create circular geofence polygon"""
-        coords = []
-        num_points = 32
-        
-        for i in range(num_points):
-            angle = 2 * pi * i / num_points
-            dx = radius_km / 111 * cos(angle)
-            dy = radius_km / 111 * sin(angle)
-            coords.append([lon + dx, lat + dy])
-        coords.append(coords[0])
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [coords]
-            },
-            "properties": properties or {}
-        }
-        self.features.append(feature)
+        self.features.add_circle(lat, lon, radius_km=radius_km, properties=properties,
+                                 max_error_m=self.max_chord_error_m)
     
-    def generate_comprehensive_india_geofences(self):
+    def generate_comprehensive_india_geofences(self, dissolve=False, simplify_tolerance_m=DEFAULT_TOLERANCE_M):
         """Generate comprehensive geofences for India"""
         print("🇮🇳 Starting comprehensive India geofencing...")
         print("=" * 60)
         
         # Generate all sample data
-        self.fetch_sample_weather_data()
-        self.fetch_sample_fire_data()
-        self.analyze_elevation_hazards()
-        self.generate_sample_disasters()
+        with metrics.stage("source", source="weather_alerts"):
+            self.fetch_sample_weather_data()
+        with metrics.stage("source", source="fire"):
+            self.fetch_sample_fire_data()
+        with metrics.stage("source", source="elevation_hazards"):
+            self.analyze_elevation_hazards()
+        with metrics.stage("source", source="disaster_alerts"):
+            self.generate_sample_disasters()
+        
+        # Zones whose TTL or expires_at has already passed are not exported
+        expired = self.features.expire()
+        if expired:
+            print(f"⏱️ Dropped {expired} expired zones")
         
-        # Create comprehensive GeoJSON
-        geojson_data = {
-            "type": "FeatureCollection",
-            "features": self.features,
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "total_features": len(self.features),
-                "coverage": "All Indian States",
-                "sources": ["Sample_IMD", "Sample_GDACS", "Sample_NASA_FIRMS", "Elevation_Analysis"],
-                "accuracy": "demonstration"
-            }
+        # Drop zones lying entirely outside India and optionally merge
+        # overlapping zones of the same risk and severity. Circles are already
+        # minimal; only merged outlines lose vertices that don't change the
+        # shape visibly
+        features = self.features
+        mask = default_mask()
+        if mask is not None:
+            features = mask.filter_features(features)
+            if len(features) < len(self.features):
+                print(f"🗺️ Land mask: dropped {len(self.features) - len(features)} zones outside India")
+        if dissolve:
+            features = dissolve_features(features)
+            features = simplify_features(features, tolerance_m=simplify_tolerance_m)
+        
+        metadata = {
+            "generated_at": datetime.now().isoformat(),
+            "total_features": len(features),
+            "dissolved": dissolve,
+            "coverage": "All Indian States",
+            "sources": ["Sample_IMD", "Sample_GDACS", "Sample_NASA_FIRMS", "Elevation_Analysis"],
+            "accuracy": "demonstration"
         }
         
-        # Ensure data directory exists
+        # Write the snapshot (plus .gz and binary columnar companions) and a
+        # delta against the previous run into the project
         data_dir = "SIH MVP/src/data"
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Save to project
         output_file = f"{data_dir}/comprehensive_india_geofences.json"
-        with open(output_file, "w") as f:
-            json.dump(geojson_data, f, indent=2)
+        version, delta = write_incremental(output_file, features, metadata=metadata, columnar=True)
         
         print("=" * 60)
         print(f"🎉 Generated {len(self.features)} comprehensive geofences!")
+        if dissolve:
+            print(f"🧩 Dissolved into {len(features)} merged zones")
         print(f"📁 Saved to: {output_file}")
+        print(describe_delta(version, delta))
+        metrics_file = metrics.report(output_file)
+        if metrics_file:
+            print(f"📊 Metrics: {metrics_file}")
         
         # Print summary
         self.print_summary()
@@ -274,4 +291,4 @@ class ComprehensiveIndiaGeofence:
 
 if __name__ == "__main__":
     generator = ComprehensiveIndiaGeofence()
-    generator.generate_comprehensive_india_geofences()
\ No newline at end of file
+    generator.generate_comprehensive_india_geofences(dissolve=os.environ.get("DISSOLVE") == "1")
\ No newline at end of file
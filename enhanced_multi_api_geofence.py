@@ -1,14 +1,32 @@
-import requests
 import json
 import time
 from datetime import datetime
-import concurrent.futures
+import asyncio
 import os
 import random
 
+from geofencing.delta import describe_delta, write_incremental
+from geofencing.dissolve import dissolve_features
+from geofencing.fetch import current_buffer, fetch_sources
+from geofencing.geometry import DEFAULT_MAX_CHORD_ERROR_M
+from geofencing.http_cache import default_cache
+from geofencing.landmask import default_mask
+from geofencing.metrics import metrics
+from geofencing.properties import RISK_TTL_SECONDS
+from geofencing.simplify import DEFAULT_TOLERANCE_M, simplify_features
+from geofencing.store import FeatureStore
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
 class EnhancedMultiApiGeofence:
+    # Circle vertex density: max gap between polygon edge and true circle
+    max_chord_error_m = DEFAULT_MAX_CHORD_ERROR_M
+    
+    # Seconds each source may take before its results are dropped
+    source_deadline = 30
+    
     def __init__(self):
-        self.features = []
+        self.features = FeatureStore(ttls=RISK_TTL_SECONDS)
         self.api_keys = {
             'openweather': 'your_openweather_key',
             'google': 'your_google_key', 
@@ -16,46 +34,46 @@ class EnhancedMultiApiGeofence:
             'weatherapi': 'your_weatherapi_key',
             'aqicn': 'your_aqicn_key'
         }
+        
+        # Shared TTL/ETag response cache (None when HTTP_CACHE="")
+        self.http_cache = default_cache()
+        
+        # Major Indian cities
+        self.cities = [
+            {'name': 'Delhi', 'lat': 28.6, 'lon': 77.2},
+            {'name': 'Mumbai', 'lat': 19.0, 'lon': 72.8},
+            {'name': 'Bangalore', 'lat': 12.9, 'lon': 77.5},
+            {'name': 'Chennai', 'lat': 13.0, 'lon': 80.2},
+            {'name': 'Kolkata', 'lat': 22.5, 'lon': 88.3},
+            {'name': 'Hyderabad', 'lat': 17.3, 'lon': 78.4},
+            {'name': 'Pune', 'lat': 18.5, 'lon': 73.8},
+            {'name': 'Ahmedabad', 'lat': 23.0, 'lon': 72.5},
+            {'name': 'Jaipur', 'lat': 26.9, 'lon': 75.7},
+            {'name': 'Surat', 'lat': 21.1, 'lon': 72.8}
+        ]
     
-    def fetch_enhanced_weather_data(self):
-        """Fetch from multiple weather APIs"""
-        try:
-            print("🌦️ Fetching enhanced weather data...")
-            
-            # Major Indian cities
-            cities = [
-                {'name': 'Delhi', 'lat': 28.6, 'lon': 77.2},
-                {'name': 'Mumbai', 'lat': 19.0, 'lon': 72.8},
-                {'name': 'Bangalore', 'lat': 12.9, 'lon': 77.5},
-                {'name': 'Chennai', 'lat': 13.0, 'lon': 80.2},
-                {'name': 'Kolkata', 'lat': 22.5, 'lon': 88.3},
-                {'name': 'Hyderabad', 'lat': 17.3, 'lon': 78.4},
-                {'name': 'Pune', 'lat': 18.5, 'lon': 73.8},
-                {'name': 'Ahmedabad', 'lat': 23.0, 'lon': 72.5},
-                {'name': 'Jaipur', 'lat': 26.9, 'lon': 75.7},
-                {'name': 'Surat', 'lat': 21.1, 'lon': 72.8}
-            ]
-            
-            for city in cities:
-                if self.api_keys['openweather'] != 'your_openweather_key':
-                    weather_data = self.get_openweather_data(city['lat'], city['lon'])
-                    if weather_data:
-                        self.process_weather_data(weather_data, city)
-                else:
-                    # Create sample data
-                    self.create_sample_weather(city)
-                    
-        except Exception as e:
-            print(f"Error fetching weather data: {e}")
+    async def fetch_enhanced_weather_data_async(self, client):
+        """Fetch weather for every city concurrently over the shared client"""
+        print("🌦️ Fetching enhanced weather data...")
+        
+        if self.api_keys['openweather'] == 'your_openweather_key':
+            for city in self.cities:
+                self.create_sample_weather(city)
+            return
+        
+        responses = await asyncio.gather(*(
+            client.get_json(OPENWEATHER_URL, params=self.openweather_params(city['lat'], city['lon']))
+            for city in self.cities
+        ), return_exceptions=True)
+        
+        for city, data in zip(self.cities, responses):
+            if isinstance(data, Exception):
+                print(f"Error fetching weather for {city['name']}: {data}")
+            elif data:
+                self.process_weather_data(data, city)
     
-    def get_openweather_data(self, lat, lon):
-        """Get data from OpenWeatherMap API"""
-        try:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_keys['openweather']}&units=metric"
-            response = requests.get(url, timeout=10)
-            return response.json() if response.status_code == 200 else None
-        except:
-            return None
+    def openweather_params(self, lat, lon):
+        return {'lat': lat, 'lon': lon, 'appid': self.api_keys['openweather'], 'units': 'metric'}
     
     def fetch_traffic_incidents(self):
         """Fetch traffic and road incident data"""
@@ -361,79 +379,86 @@ class EnhancedMultiApiGeofence:
     
     def create_circular_geofence(self, lat, lon, radius_km=20, properties=None):
         """Create circular geofence polygon"""
-        from math import cos, sin, pi
-        
-        coords = []
-        num_points = 32
-        
-        for i in range(num_points):
-            angle = 2 * pi * i / num_points
-            dx = radius_km / 111 * cos(angle)
-            dy = radius_km / 111 * sin(angle)
-            coords.append([lon + dx, lat + dy])
-        coords.append(coords[0])
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [coords]
-            },
-            "properties": properties or {}
-        }
-        self.features.append(feature)
+        # While a source runs under fetch_sources its zones go to its own buffer
+        buffer = current_buffer.get()
+        (self.features if buffer is None else buffer).add_circle(
+            lat, lon, radius_km=radius_km, properties=properties,
+            max_error_m=self.max_chord_error_m)
+    
+    def sources(self):
+        """Hazard sources in the order their features are merged"""
+        return [
+            ('weather', self.fetch_enhanced_weather_data_async),
+            ('traffic', self.fetch_traffic_incidents),
+            ('air_quality', self.fetch_air_quality_data),
+            ('crowd', self.fetch_crowd_density_data),
+            ('safety', self.fetch_crime_safety_data),
+            ('disaster', self.fetch_natural_disaster_zones),
+            ('industrial', self.fetch_industrial_hazard_zones)
+        ]
     
-    def generate_enhanced_geofences(self):
+    def generate_enhanced_geofences(self, dissolve=False, simplify_tolerance_m=DEFAULT_TOLERANCE_M):
         """Generate enhanced geofences using multiple APIs"""
         print("🚀 Starting enhanced multi-API geofencing...")
         print("=" * 70)
         
-        # Run all data collection
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            futures = [
-                executor.submit(self.fetch_enhanced_weather_data),
-                executor.submit(self.fetch_traffic_incidents),
-                executor.submit(self.fetch_air_quality_data),
-                executor.submit(self.fetch_crowd_density_data),
-                executor.submit(self.fetch_crime_safety_data),
-                executor.submit(self.fetch_natural_disaster_zones),
-                executor.submit(self.fetch_industrial_hazard_zones)
-            ]
-            
-            # Wait for all to complete
-            concurrent.futures.wait(futures)
+        # Run all sources concurrently, each into its own buffer, and merge
+        # them in a fixed order so output is deterministic
+        results = fetch_sources(self.sources(), deadline=self.source_deadline, cache=self.http_cache)
+        for result in results:
+            if result.error:
+                print(f"⚠️ Source {result.name} failed after {result.elapsed:.1f}s: {result.error}")
+            self.features.extend(result.features)
         
-        # Create comprehensive GeoJSON
-        geojson_data = {
-            "type": "FeatureCollection",
-            "features": self.features,
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "total_features": len(self.features),
-                "apis_used": [
-                    "OpenWeather", "Traffic_Monitor", "AQI_Monitor", 
-                    "Event_Monitor", "Safety_Monitor", "Disaster_Monitor", "Industrial_Monitor"
-                ],
-                "coverage": "Comprehensive India multi-risk data",
-                "risk_categories": [
-                    "weather_hazard", "traffic_incident", "air_quality", 
-                    "crowd_density", "safety_concern", "natural_disaster", "industrial_hazard"
-                ]
-            }
+        # Zones whose TTL or expires_at has already passed are not exported
+        expired = self.features.expire()
+        if expired:
+            print(f"⏱️ Dropped {expired} expired zones")
+        
+        # Drop zones lying entirely outside India and optionally merge
+        # overlapping zones of the same risk and severity. Circles are already
+        # minimal; only merged outlines lose vertices that don't change the
+        # shape visibly
+        features = self.features
+        mask = default_mask()
+        if mask is not None:
+            features = mask.filter_features(features)
+            if len(features) < len(self.features):
+                print(f"🗺️ Land mask: dropped {len(self.features) - len(features)} zones outside India")
+        if dissolve:
+            features = dissolve_features(features)
+            features = simplify_features(features, tolerance_m=simplify_tolerance_m)
+        
+        metadata = {
+            "generated_at": datetime.now().isoformat(),
+            "total_features": len(features),
+            "dissolved": dissolve,
+            "apis_used": [
+                "OpenWeather", "Traffic_Monitor", "AQI_Monitor", 
+                "Event_Monitor", "Safety_Monitor", "Disaster_Monitor", "Industrial_Monitor"
+            ],
+            "coverage": "Comprehensive India multi-risk data",
+            "risk_categories": [
+                "weather_hazard", "traffic_incident", "air_quality", 
+                "crowd_density", "safety_concern", "natural_disaster", "industrial_hazard"
+            ]
         }
         
-        # Ensure data directory exists
+        # Write the snapshot (plus .gz and binary columnar companions) and a
+        # delta against the previous run into the project
         data_dir = "SIH MVP/src/data"
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Save to project
         output_file = f"{data_dir}/enhanced_multi_api_geofences.json"
-        with open(output_file, "w") as f:
-            json.dump(geojson_data, f, indent=2)
+        version, delta = write_incremental(output_file, features, metadata=metadata, columnar=True)
         
         print("=" * 70)
         print(f"🎉 Generated {len(self.features)} enhanced geofences!")
+        if dissolve:
+            print(f"🧩 Dissolved into {len(features)} merged zones")
         print(f"📁 Saved to: {output_file}")
+        print(describe_delta(version, delta))
+        metrics_file = metrics.report(output_file)
+        if metrics_file:
+            print(f"📊 Metrics: {metrics_file}")
         
         # Print summary
         self.print_summary()
@@ -466,4 +491,4 @@ class EnhancedMultiApiGeofence:
 
 if __name__ == "__main__":
     generator = EnhancedMultiApiGeofence()
-    generator.generate_enhanced_geofences()
\ No newline at end of file
+    generator.generate_enhanced_geofences(dissolve=os.environ.get("DISSOLVE") == "1")
\ No newline at end of file
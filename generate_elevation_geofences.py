@@ -1,7 +1,19 @@
-import requests
-import json
-import time
-from math import cos, sin, pi
+import os
+
+import numpy as np
+
+from geofencing.delta import describe_delta, write_incremental
+from geofencing.dissolve import dissolve_features
+from geofencing.elevation import grid_points, make_provider
+from geofencing.elevation_store import CachedElevationProvider, ElevationStore
+from geofencing.geometry import circle_feature
+from geofencing.http_cache import default_cache
+from geofencing.landmask import default_mask
+from geofencing.metrics import metrics
+from geofencing.properties import RISK_TTL_SECONDS
+from geofencing.quadtree import quadtree_scan
+from geofencing.simplify import simplify_features
+from geofencing.store import FeatureStore
 
 # Bounding box for India
 MIN_LAT, MAX_LAT = 6.5, 37.1
@@ -17,84 +29,167 @@ ELEVATION_THRESHOLD = 1000
 # Geofence radius (20km)
 RADIUS_KM = 20
 
-def get_elevation(lat, lon):
-    """Get elevation from OpenTopoData API"""
-    url = f"https://api.opentopodata.org/v1/test-dataset?locations={lat},{lon}"
-    try:
-        resp = requests.get(url, timeout=10)
-        data = resp.json()
-        if data['status'] == 'OK' and data['results']:
-            return data['results'][0]['elevation']
-        return None
-    except Exception as e:
-        print(f"Error fetching elevation for {lat},{lon}: {e}")
-        return None
-
-def create_circle_geojson(lat, lon, radius_km=RADIUS_KM, num_points=32):
+# Scan mode: "grid" samples every LAT_STEP x LON_STEP point; "quadtree"
+# samples QUADTREE_COARSE_STEP cells and subdivides only those that straddle
+# the threshold or are rugged (std dev above QUADTREE_SPREAD_M) down to
+# QUADTREE_MIN_STEP, for far fewer lookups and a sharper boundary
+SCAN_MODE = os.environ.get("SCAN_MODE", "grid")
+QUADTREE_COARSE_STEP = 1.44
+QUADTREE_MIN_STEP = 0.09
+QUADTREE_SPREAD_M = 400
+
+# Elevation source: "opentopodata" (public API) or "srtm" (local .hgt tiles,
+# no network needed, fine enough for 0.01° grids)
+ELEVATION_PROVIDER = os.environ.get("ELEVATION_PROVIDER", "opentopodata")
+SRTM_DIR = os.environ.get("SRTM_DIR", "data/srtm")
+
+# Fetched API elevations are kept here so interrupted scans resume and
+# re-runs with another threshold/radius need no HTTP calls ("" disables)
+ELEVATION_CACHE = os.environ.get("ELEVATION_CACHE", "data/elevation_cache.sqlite")
+
+# Circle vertex density (max chord error) and simplification tolerance, in metres
+MAX_CHORD_ERROR_M = 100
+SIMPLIFY_TOLERANCE_M = 50
+
+# Merge overlapping neighbouring circles into single zones (needs shapely)
+DISSOLVE = os.environ.get("DISSOLVE") == "1"
+
+# OpenTopoData batching: up to 100 locations per request, within the
+# public API budget of 1 request per second
+DATASET = "test-dataset"
+BATCH_SIZE = 100
+MAX_IN_FLIGHT = 4
+REQUESTS_PER_SECOND = 1.0
+
+def elevation_properties(lat, lon, elevation=None):
+    """Properties attached to every elevation geofence"""
+    return {
+        "risk": "elevation",
+        "elevation": elevation,
+        "location": f"{lat},{lon}"
+    }
+
+def create_circle_geojson(lat, lon, radius_km=RADIUS_KM, num_points=None):
     """Create a circular polygon in GeoJSON format"""
-    coords = []
-    for i in range(num_points):
-        angle = 2 * pi * i / num_points
-        # Approximate conversion: 1 degree ≈ 111km
-        dx = radius_km / 111 * cos(angle)
-        dy = radius_km / 111 * sin(angle)
-        coords.append([lon + dx, lat + dy])
-    coords.append(coords[0])  # Close the polygon
-    
+    return circle_feature(lat, lon, radius_km=radius_km,
+                          properties=elevation_properties(lat, lon),
+                          num_points=num_points, max_error_m=MAX_CHORD_ERROR_M)
+
+def create_provider():
+    """Build the configured elevation provider"""
+    if ELEVATION_PROVIDER == "srtm":
+        return make_provider("srtm", tile_dir=SRTM_DIR)
+    # With the elevation store on, fetched elevations are persisted there;
+    # caching the raw responses as well would only duplicate them
+    provider = make_provider(
+        ELEVATION_PROVIDER,
+        dataset=DATASET,
+        batch_size=BATCH_SIZE,
+        max_in_flight=MAX_IN_FLIGHT,
+        requests_per_second=REQUESTS_PER_SECOND,
+        cache=None if ELEVATION_CACHE else default_cache()
+    )
+    if ELEVATION_CACHE:
+        provider = CachedElevationProvider(provider, ElevationStore(ELEVATION_CACHE))
+    return provider
+
+def box_feature(box, elevation):
+    """Rectangular zone for a quadtree cell lying entirely above the threshold"""
+    min_lon, min_lat, max_lon, max_lat = box
+    center = (round((min_lat + max_lat) / 2, 6), round((min_lon + max_lon) / 2, 6))
     return {
         "type": "Feature",
         "geometry": {
             "type": "Polygon",
-            "coordinates": [coords]
+            "coordinates": [[[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat],
+                             [min_lon, max_lat], [min_lon, min_lat]]]
         },
-        "properties": {
-            "risk": "elevation",
-            "elevation": None,
-            "location": f"{lat},{lon}"
-        }
+        "properties": dict(elevation_properties(*center, elevation),
+                           cell_deg=round(max_lat - min_lat, 6))
     }
 
-def main():
-    features = []
-    total_points = int((MAX_LAT - MIN_LAT) / LAT_STEP) * int((MAX_LON - MIN_LON) / LON_STEP)
-    current_point = 0
+def scan_quadtree_features():
+    """Adaptive scan: buffered circles along the threshold edge plus whole high cells"""
+    provider = create_provider()
+    print(f"Quadtree scan across India using {provider.name} "
+          f"({QUADTREE_COARSE_STEP}° down to {QUADTREE_MIN_STEP}°)...")
     
-    print(f"Scanning {total_points} points across India...")
-    print("This will take a while due to API rate limits...")
+    def report(level, cells, lookups, splits):
+        print(f"Level {level}: {cells} cells, {lookups} new lookups, {splits} subdivided")
     
-    lat = MIN_LAT
-    while lat <= MAX_LAT:
-        lon = MIN_LON
-        while lon <= MAX_LON:
-            current_point += 1
-            print(f"Progress: {current_point}/{total_points} ({lat:.2f}, {lon:.2f})")
-            
-            elev = get_elevation(lat, lon)
-            if elev is not None and elev > ELEVATION_THRESHOLD:
-                print(f"  ✓ High elevation found: {elev}m")
-                circle = create_circle_geojson(lat, lon)
-                circle['properties']['elevation'] = elev
-                features.append(circle)
-            
-            # Rate limiting - be nice to the API
-            time.sleep(1)
-            
-            lon += LON_STEP
-        lat += LAT_STEP
+    with metrics.stage("elevation_sample", provider=provider.name):
+        result = quadtree_scan(
+            provider, MIN_LAT, MAX_LAT, MIN_LON, MAX_LON, ELEVATION_THRESHOLD,
+            coarse_step=QUADTREE_COARSE_STEP, min_step=QUADTREE_MIN_STEP,
+            spread_m=QUADTREE_SPREAD_M, mask=default_mask(), progress=report
+        )
+    print(f"  ✓ {result.lookups} lookups: {len(result.lats)} edge points, "
+          f"{len(result.boxes)} whole high cells")
     
-    # Create GeoJSON FeatureCollection
-    geojson_data = {
-        "type": "FeatureCollection",
-        "features": features
-    }
+    with metrics.stage("polygons"):
+        features = FeatureStore(ttls=RISK_TTL_SECONDS)
+        features.add_circles(
+            result.lats, result.lons, RADIUS_KM,
+            properties=[elevation_properties(float(lat), float(lon), float(elev))
+                        for lat, lon, elev in zip(result.lats, result.lons, result.elevations)],
+            max_error_m=MAX_CHORD_ERROR_M
+        )
+        for box, elevation in zip(result.boxes.tolist(), result.box_elevations.tolist()):
+            features.append(box_feature(box, elevation))
+    return features
+
+def scan_elevation_features():
+    """Scan India and return the high-elevation geofences for the configured SCAN_MODE"""
+    if SCAN_MODE == "quadtree":
+        return scan_quadtree_features()
+    lats, lons = grid_points(MIN_LAT, MAX_LAT, MIN_LON, MAX_LON, LAT_STEP, LON_STEP)
+    provider = create_provider()
+    
+    # Skip sea and neighbouring-country points before any lookup, using the
+    # land mask cached at $LAND_MASK (default data/india_land_mask.npz, "" disables)
+    mask = default_mask()
+    if mask is not None:
+        on_land = mask.contains(lats, lons)
+        print(f"Land mask: skipping {lats.size - on_land.sum()} of {lats.size} grid points")
+        lats, lons = lats[on_land], lons[on_land]
     
-    # Save to file
+    print(f"Scanning {lats.size} points across India using {provider.name}...")
+    
+    def report(done, total):
+        print(f"Progress: {done}/{total} chunks")
+    
+    with metrics.stage("elevation_sample", provider=provider.name):
+        elevations = provider.sample(lats, lons, progress=report)
+    metrics.count("grid_points", lats.size)
+    high = np.flatnonzero(elevations > ELEVATION_THRESHOLD)
+    hits = [(float(lats[i]), float(lons[i]), float(elevations[i])) for i in high]
+    print(f"  ✓ High elevation found at {len(hits)} points")
+    
+    # Build every circle in one vectorized pass into a compact store
+    with metrics.stage("polygons"):
+        features = FeatureStore(ttls=RISK_TTL_SECONDS)
+        features.add_circles(
+            [h[0] for h in hits], [h[1] for h in hits], RADIUS_KM,
+            properties=[elevation_properties(*h) for h in hits],
+            max_error_m=MAX_CHORD_ERROR_M
+        )
+    return features
+
+def main():
+    features = scan_elevation_features()
+    if DISSOLVE:
+        # Adaptive circles are already minimal; only merged outlines need simplifying
+        features = dissolve_features(features)
+        features = simplify_features(features, tolerance_m=SIMPLIFY_TOLERANCE_M)
     output_file = "SIH MVP/src/data/india_elevation_geofences.json"
-    with open(output_file, "w") as f:
-        json.dump(geojson_data, f, indent=2)
+    version, delta = write_incremental(output_file, features, columnar=True)
     
     print(f"\n✅ Done! Created {len(features)} elevation geofences")
     print(f"📁 Saved to: {output_file}")
+    print(describe_delta(version, delta))
+    metrics_file = metrics.report(output_file)
+    if metrics_file:
+        print(f"📊 Metrics: {metrics_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""Shared building blocks for the geofence generator scripts"""
+from .geometry import circle_feature, circle_features, circle_rings, unit_circle
+from .index import GeofenceIndex
+from .store import FeatureStore, FeatureView
+
+__all__ = [
+    "FeatureStore",
+    "FeatureView",
+    "GeofenceIndex",
+    "circle_feature",
+    "circle_features",
+    "circle_rings",
+    "unit_circle",
+]
@@ -0,0 +1,301 @@
+"""Compact binary columnar geofence format with a zero-copy memory-mapped reader
+
+Layout: an 8-byte magic, a little-endian uint32 header length, a JSON header
+and then 8-byte aligned sections:
+
+- ``coords``: float32 [lon, lat] pairs for every ring vertex
+- ``ring_offsets`` / ``part_offsets`` / ``feature_offsets``: uint32 prefix
+  offsets (ring -> coords, polygon part -> rings, feature -> parts)
+- ``bbox``: float32 [min_lon, min_lat, max_lon, max_lat] per feature
+- one int32 code column per dictionary-encoded property (-1 = missing), with
+  the dictionary stored in the header
+- one float32 column per numeric property (NaN = missing)
+"""
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from .index import polygon_parts
+
+MAGIC = b"GEOFCOL1"
+DEFAULT_COLUMNS = ("risk", "severity", "source", "city", "state")
+DEFAULT_NUMERIC_COLUMNS = ("elevation", "aqi", "confidence")
+ALIGN = 8
+# Features buffered in memory before their sections are spooled to disk
+CHUNK_FEATURES = 4096
+
+
+def _number(value):
+    """``value`` as a float; NaN if missing or not numeric (e.g. "N/A")"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ColumnarWriter:
+    """Stream features into one columnar file
+
+    Every section is spooled to its own temporary file, ``chunk_size``
+    features at a time, and the spools are copied behind the header on
+    close, so memory stays flat like the GeoJSON writer; only the property
+    dictionaries (distinct values) are kept in memory. The file is written
+    to a ``.tmp`` sibling and moved into place, like the GeoJSON output.
+    """
+
+    def __init__(self, path, columns=DEFAULT_COLUMNS, numeric_columns=DEFAULT_NUMERIC_COLUMNS,
+                 metadata=None, chunk_size=CHUNK_FEATURES):
+        self.path = path
+        self.columns = tuple(columns)
+        self.numeric_columns = tuple(numeric_columns)
+        self.metadata = metadata
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._dictionaries = {name: {} for name in self.columns}
+        # Section name -> (spool file, dtype, trailing shape, rows written)
+        directory = os.path.dirname(path) or '.'
+        sections = [("coords", '<f4', (2,)), ("ring_offsets", '<u4', ()),
+                    ("part_offsets", '<u4', ()), ("feature_offsets", '<u4', ()),
+                    ("bbox", '<f4', (4,))]
+        sections += [(f"col:{name}", '<i4', ()) for name in self.columns]
+        sections += [(f"num:{name}", '<f4', ()) for name in self.numeric_columns]
+        self._spools = {name: [tempfile.TemporaryFile(dir=directory), np.dtype(dtype), shape, 0]
+                        for name, dtype, shape in sections}
+        for name in ("ring_offsets", "part_offsets", "feature_offsets"):
+            self._spool(name, np.zeros(1, dtype='<u4'))
+        self._totals = [0, 0, 0]  # coords, rings, parts written so far
+        self._reset_chunk()
+
+    def _reset_chunk(self):
+        self._coords = []
+        self._ring_sizes = []
+        self._part_sizes = []
+        self._feature_sizes = []
+        self._codes = {name: [] for name in self.columns}
+        self._numbers = {name: [] for name in self.numeric_columns}
+
+    def write(self, feature):
+        parts = 0
+        for rings in polygon_parts(feature.get('geometry')):
+            for ring in rings:
+                ring = np.asarray(ring, dtype=np.float32)[:, :2]
+                self._coords.append(ring)
+                self._ring_sizes.append(len(ring))
+            self._part_sizes.append(len(rings))
+            parts += 1
+        self._feature_sizes.append(parts)
+
+        props = feature.get('properties') or {}
+        for name in self.columns:
+            value = props.get(name)
+            if value is None:
+                self._codes[name].append(-1)
+            else:
+                dictionary = self._dictionaries[name]
+                self._codes[name].append(dictionary.setdefault(str(value), len(dictionary)))
+        for name in self.numeric_columns:
+            self._numbers[name].append(_number(props.get(name)))
+        self.count += 1
+        if len(self._feature_sizes) >= self.chunk_size:
+            self._flush()
+
+    def write_all(self, features):
+        for feature in features:
+            self.write(feature)
+        return self
+
+    def _spool(self, name, array):
+        spool = self._spools[name]
+        spool[0].write(np.ascontiguousarray(array, dtype=spool[1]).tobytes())
+        spool[3] += len(array)
+
+    def _flush(self):
+        """Append the buffered chunk to the section spools"""
+        count = len(self._feature_sizes)
+        if not count:
+            return
+        coords = (np.concatenate(self._coords) if self._coords
+                  else np.empty((0, 2), dtype=np.float32))
+        bbox = np.full((count, 4), np.nan, dtype='<f4')
+        ring_feature = np.repeat(np.repeat(np.arange(count), self._feature_sizes), self._part_sizes)
+        if len(coords):
+            coord_feature = np.repeat(ring_feature, self._ring_sizes)
+            has_coords = np.unique(coord_feature)
+            starts = np.searchsorted(coord_feature, has_coords)
+            bbox[has_coords, 0] = np.minimum.reduceat(coords[:, 0], starts)
+            bbox[has_coords, 1] = np.minimum.reduceat(coords[:, 1], starts)
+            bbox[has_coords, 2] = np.maximum.reduceat(coords[:, 0], starts)
+            bbox[has_coords, 3] = np.maximum.reduceat(coords[:, 1], starts)
+
+        self._spool("coords", coords)
+        for n, (name, sizes) in enumerate((("ring_offsets", self._ring_sizes),
+                                           ("part_offsets", self._part_sizes),
+                                           ("feature_offsets", self._feature_sizes))):
+            offsets = self._totals[n] + np.cumsum(sizes, dtype=np.int64)
+            self._spool(name, offsets)
+        self._totals = [self._totals[0] + len(coords), self._totals[1] + len(self._ring_sizes),
+                        self._totals[2] + len(self._part_sizes)]
+        self._spool("bbox", bbox)
+        for name in self.columns:
+            self._spool(f"col:{name}", self._codes[name])
+        for name in self.numeric_columns:
+            self._spool(f"num:{name}", self._numbers[name])
+        self._reset_chunk()
+
+    def close(self):
+        if self._spools is None:
+            return
+        self._flush()
+        layout = {}
+        offset = 0
+        for name, (spool, dtype, shape, rows) in self._spools.items():
+            layout[name] = {"offset": offset, "dtype": dtype.str, "shape": [rows, *shape]}
+            offset += -(-spool.tell() // ALIGN) * ALIGN
+
+        header = json.dumps({
+            "count": self.count,
+            "dictionaries": {name: list(self._dictionaries[name]) for name in self.columns},
+            "numeric_columns": list(self.numeric_columns),
+            "sections": layout,
+            "metadata": self.metadata(self) if callable(self.metadata) else self.metadata,
+        }, separators=(',', ':')).encode('utf-8')
+        prefix = len(MAGIC) + 4 + len(header)
+        padding = -prefix % ALIGN
+
+        with open(self.path + '.tmp', 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header) + padding))
+            f.write(header + b' ' * padding)
+            for spool, _, _, _ in self._spools.values():
+                size = spool.tell()
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                f.write(b'\0' * (-size % ALIGN))
+        self.abort()
+        os.replace(self.path + '.tmp', self.path)
+
+    def abort(self):
+        """Drop the spooled sections without writing the file"""
+        if self._spools is None:
+            return
+        for spool, _, _, _ in self._spools.values():
+            spool.close()
+        self._spools = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_columnar(path, features, **options):
+    """Write ``features`` to a columnar file and return the feature count"""
+    with ColumnarWriter(path, **options) as writer:
+        writer.write_all(features)
+    return writer.count
+
+
+class ColumnarGeofences:
+    """Memory-mapped reader; every array is a zero-copy view into the file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not a columnar geofence file: {path}")
+        (header_len,) = struct.unpack('<I', bytes(self._buffer[len(MAGIC):len(MAGIC) + 4]))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._buffer[start:start + header_len]))
+        self._data_start = start + header_len
+        self.dictionaries = self.header["dictionaries"]
+        self.metadata = self.header.get("metadata")
+
+        self.coords = self._section("coords")
+        self.ring_offsets = self._section("ring_offsets")
+        self.part_offsets = self._section("part_offsets")
+        self.feature_offsets = self._section("feature_offsets")
+        self.bbox = self._section("bbox")
+
+    def _section(self, name):
+        info = self.header["sections"][name]
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"])) if info["shape"] else 1
+        array = np.frombuffer(self._buffer, dtype=dtype, count=count,
+                              offset=self._data_start + info["offset"])
+        return array.reshape(info["shape"])
+
+    def __len__(self):
+        return self.header["count"]
+
+    @property
+    def columns(self):
+        return list(self.dictionaries)
+
+    @property
+    def numeric_columns(self):
+        return self.header["numeric_columns"]
+
+    def codes(self, name):
+        """Return the int32 code column for a dictionary-encoded property"""
+        return self._section(f"col:{name}")
+
+    def numbers(self, name):
+        return self._section(f"num:{name}")
+
+    def mask(self, name, value):
+        """Boolean mask of features whose property equals ``value``"""
+        try:
+            code = self.dictionaries[name].index(value)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self.codes(name) == code
+
+    def properties(self, i):
+        props = {}
+        for name, dictionary in self.dictionaries.items():
+            code = int(self.codes(name)[i])
+            if code >= 0:
+                props[name] = dictionary[code]
+        for name in self.numeric_columns:
+            value = float(self.numbers(name)[i])
+            if not np.isnan(value):
+                props[name] = value
+        return props
+
+    def rings(self, i):
+        """Return the polygon parts of feature ``i`` as lists of coordinate views"""
+        parts = []
+        for p in range(self.feature_offsets[i], self.feature_offsets[i + 1]):
+            parts.append([self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+                          for r in range(self.part_offsets[p], self.part_offsets[p + 1])])
+        return parts
+
+    def geometry(self, i):
+        """GeoJSON geometry of feature ``i``; None if it has no polygon parts"""
+        parts = [[ring.tolist() for ring in rings] for rings in self.rings(i)]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return {"type": "Polygon", "coordinates": parts[0]}
+        return {"type": "MultiPolygon", "coordinates": parts}
+
+    def feature(self, i):
+        return {"type": "Feature", "geometry": self.geometry(i), "properties": self.properties(i)}
+
+    def iter_features(self):
+        for i in range(len(self)):
+            yield self.feature(i)
+
+    def to_feature_collection(self):
+        collection = {"type": "FeatureCollection", "features": list(self.iter_features())}
+        if self.metadata is not None:
+            collection["metadata"] = self.metadata
+        return collection
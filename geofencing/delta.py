@@ -0,0 +1,232 @@
+"""Stable feature IDs plus snapshot/delta output for incremental refreshes"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .metrics import metrics
+from .output import json_dumps, open_writers, quantize, quantize_feature
+from .properties import RISK_TTL_SECONDS, live_features
+from .simplify import vertex_count
+
+# Properties that change on every run without the zone itself changing.
+# A transient zone's timestamp decides when it expires, so for risk types
+# with a TTL it counts as content: a re-reported incident is a change.
+VOLATILE_PROPERTIES = frozenset({"timestamp"})
+
+# Properties identifying "the same zone" across runs
+IDENTITY_PROPERTIES = ("risk", "source", "name", "location", "city", "state")
+
+
+def _digest(obj, length=16):
+    data = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:length]
+
+
+def _volatile_keys(props):
+    return frozenset() if props.get('risk') in RISK_TTL_SECONDS else VOLATILE_PROPERTIES
+
+
+def content_hash(feature, precision=6):
+    """Hash of geometry (quantized) and non-volatile properties"""
+    geometry = feature.get('geometry') or {}
+    props = feature.get('properties') or {}
+    volatile = _volatile_keys(props)
+    return _digest({
+        "type": geometry.get('type'),
+        "coordinates": quantize(geometry.get('coordinates') or [], precision),
+        "properties": {k: v for k, v in props.items() if k not in volatile},
+    })
+
+
+def assign_ids(features):
+    """Yield ``features`` with a stable ``id`` derived from identity properties
+
+    Zones sharing the same identity are told apart by their order of
+    appearance, which the generators keep deterministic. Features are
+    copied one at a time as they are consumed, so a stream stays a stream.
+    """
+    seen = {}
+    for feature in features:
+        props = feature.get('properties') or {}
+        base = _digest([props.get(name) for name in IDENTITY_PROPERTIES], 12)
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        yield dict(feature, id=base if n == 0 else f"{base}-{n}")
+
+
+def delta_path(path):
+    root, _ = os.path.splitext(path)
+    return root + '.delta.json'
+
+
+def index_path(path):
+    """Path of the ID -> content hash index kept next to a snapshot"""
+    root, _ = os.path.splitext(path)
+    return root + '.ids.json'
+
+
+def load_snapshot(path, now=None):
+    """Return (live features, metadata) of an existing snapshot, or ([], {})"""
+    try:
+        with open(path) as f:
+            collection = json.load(f)
+    except (OSError, ValueError):
+        return [], {}
+    return live_features(collection.get('features', []), now), collection.get('metadata') or {}
+
+
+def _volatile(props):
+    return {k: props[k] for k in _volatile_keys(props) if k in props}
+
+
+def load_index(path, precision=6):
+    """Return (version, {id: (content hash, volatile properties)}) of the snapshot at ``path``
+
+    Read from the small index written next to the snapshot. Snapshots from
+    before the index existed are hashed once from the full file.
+    """
+    try:
+        with open(index_path(path)) as f:
+            index = json.load(f)
+        if index.get('precision') == precision:
+            return index['version'], {fid: tuple(entry) for fid, entry in index['features'].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+    previous, metadata = load_snapshot(path)
+    return metadata.get('version', 0), {
+        f['id']: (content_hash(f, precision), _volatile(f.get('properties') or {}))
+        for f in previous if 'id' in f
+    }
+
+
+def diff_features(previous, current, precision=6):
+    """Compare two ID'd feature lists; returns (added, changed, removed_ids, unchanged_ids)"""
+    previous_hashes = {f['id']: content_hash(f, precision) for f in previous if 'id' in f}
+    added, changed, unchanged = [], [], set()
+    current_ids = set()
+    for feature in current:
+        fid = feature['id']
+        current_ids.add(fid)
+        if fid not in previous_hashes:
+            added.append(feature)
+        elif previous_hashes[fid] != content_hash(feature, precision):
+            changed.append(feature)
+        else:
+            unchanged.add(fid)
+    removed = [fid for fid in previous_hashes if fid not in current_ids]
+    return added, changed, removed, unchanged
+
+
+def _write_json(path, obj):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f, separators=(',', ':'))
+
+
+def write_incremental(path, features, metadata=None, precision=6, **options):
+    """Write a full snapshot plus a delta against the previous snapshot at ``path``
+
+    Features are ID'd, hashed, compared with the previous snapshot's ID
+    index and written in one streaming pass; only the ID/hash maps are
+    held in memory. Unchanged zones keep their original timestamps, except
+    transient ones whose expiry follows the timestamp, and when nothing
+    changed no file is rewritten, so the snapshot's bytes and version stay
+    the same. The delta file lists the added and changed
+    features and removed IDs, with the version it applies on top of. Every
+    file goes to a ``.tmp`` sibling first and is moved into place with
+    ``os.replace``, the ID index last, so a crash never leaves a truncated
+    snapshot behind. Returns (version, delta or None), where the returned
+    delta holds the added, changed and removed IDs.
+    """
+    dataset = os.path.splitext(os.path.basename(path))[0]
+    with metrics.stage("write", dataset=dataset):
+        version, delta, count, vertices = _write_incremental(path, features, metadata, precision, **options)
+    if metrics.enabled:
+        metrics.gauge("features", count, dataset=dataset)
+        metrics.gauge("vertices", vertices, dataset=dataset)
+        metrics.gauge("version", version, dataset=dataset)
+        for change in ("added", "changed", "removed"):
+            metrics.gauge(f"delta_{change}", len(delta[change]) if delta else 0, dataset=dataset)
+    return version, delta
+
+
+def _write_incremental(path, features, metadata, precision, **options):
+    base_version, previous = load_index(path, precision)
+    version = base_version + 1
+    current = {}
+    vertices = 0
+    ids = {"added": [], "changed": []}
+    directory = os.path.dirname(path) or '.'
+    writers = open_writers(path, metadata=dict(metadata or {}, version=version),
+                           precision=precision, **options)
+    # Added and changed features are spooled as they stream past and
+    # joined into the delta file at the end
+    spools = {change: tempfile.TemporaryFile(dir=directory) for change in ids}
+    try:
+        for feature in assign_ids(features):
+            fid = feature['id']
+            digest = content_hash(feature, precision)
+            props = feature.get('properties') or {}
+            old = previous.get(fid)
+            if old is None or old[0] != digest:
+                change = "added" if old is None else "changed"
+                spool = spools[change]
+                spool.write((b',' if ids[change] else b'') + json_dumps(quantize_feature(feature, precision), True))
+                ids[change].append(fid)
+            elif old[1] != _volatile(props):
+                # Unchanged zone: keep the timestamps it was first written with
+                props = {k: v for k, v in props.items() if k not in VOLATILE_PROPERTIES or k in old[1]}
+                props.update(old[1])
+                feature = dict(feature, properties=props)
+            current[fid] = (digest, _volatile(feature.get('properties') or {}))
+            vertices += vertex_count((feature,))
+            for writer in writers:
+                writer.write(feature)
+
+        removed = [fid for fid in previous if fid not in current]
+        if os.path.exists(path) and not (ids["added"] or ids["changed"] or removed):
+            for writer in writers:
+                writer.abort()
+            if not os.path.exists(index_path(path)):
+                _write_json(index_path(path), {"version": base_version, "precision": precision,
+                                               "features": current})
+                os.replace(index_path(path) + '.tmp', index_path(path))
+            return base_version, None, len(current), vertices
+
+        delta = delta_path(path)
+        with open(delta + '.tmp', 'wb') as f:
+            f.write(b'{"version":%d,"base_version":%d' % (version, base_version))
+            for change, spool in spools.items():
+                f.write(b',"%s":[' % change.encode())
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                f.write(b']')
+            f.write(b',"removed":' + json_dumps(removed, True) + b'}')
+        _write_json(index_path(path), {"version": version, "precision": precision,
+                                       "features": current})
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        for tmp in (delta_path(path), index_path(path)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp + '.tmp')
+        raise
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+    for writer in writers:
+        writer.close()
+    os.replace(delta + '.tmp', delta)
+    os.replace(index_path(path) + '.tmp', index_path(path))
+    return version, dict(version=version, base_version=base_version, removed=removed, **ids), len(current), vertices
+
+
+def describe_delta(version, delta):
+    """One-line progress message for a write_incremental() result"""
+    if delta is None:
+        return f"♻️ No changes since version {version}; snapshot left untouched"
+    return (f"🔁 Version {version}: +{len(delta['added'])} added, "
+            f"~{len(delta['changed'])} changed, -{len(delta['removed'])} removed")
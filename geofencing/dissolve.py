@@ -0,0 +1,78 @@
+"""Dissolve overlapping geofences that share the same risk and severity"""
+from collections import OrderedDict
+
+from .metrics import metrics
+from .properties import max_severity
+
+try:
+    from shapely.geometry import mapping, shape
+    from shapely.ops import unary_union
+    from shapely.strtree import STRtree
+except ImportError:  # optional dependency, only needed for this stage
+    shape = None
+
+DEFAULT_GROUP_BY = ("risk", "severity")
+
+
+def unique(values):
+    """Distinct non-None ``values`` in first-seen order"""
+    return list(OrderedDict.fromkeys(v for v in values if v is not None))
+
+
+def _aggregate(group_key, group_by, members):
+    props = dict(zip(group_by, group_key))
+    props['severity'] = max_severity(m.get('severity') for m in members) or props.get('severity')
+    props['names'] = unique(m.get('name') for m in members)
+    props['sources'] = unique(m.get('source') for m in members)
+    cities = unique(m.get('city') or m.get('state') for m in members)
+    if cities:
+        props['cities'] = cities
+    props['name'] = props['names'][0] if len(props['names']) == 1 else \
+        f"{len(members)} merged {props.get('risk', 'risk')} zones"
+    props['merged_count'] = len(members)
+    return props
+
+
+@metrics.timed("dissolve")
+def dissolve_features(features, group_by=DEFAULT_GROUP_BY, per_component=True):
+    """Union overlapping polygons within each ``group_by`` group
+
+    With ``per_component=True`` every connected cluster of overlapping zones
+    becomes one feature, so properties (contributing names, sources, cities,
+    max severity) stay local to that cluster. Otherwise each group collapses
+    into a single MultiPolygon feature. Features come out grouped in first
+    appearance order.
+    """
+    if shape is None:
+        raise RuntimeError("Dissolving geofences requires shapely (pip install shapely)")
+
+    groups = OrderedDict()
+    for feature in features:
+        if not feature.get('geometry'):
+            continue
+        props = feature.get('properties') or {}
+        key = tuple(props.get(name) for name in group_by)
+        groups.setdefault(key, []).append((shape(feature['geometry']).buffer(0), props))
+
+    dissolved = []
+    for key, members in groups.items():
+        geometries = [geom for geom, _ in members]
+        merged = unary_union(geometries)
+        if not per_component:
+            dissolved.append({
+                "type": "Feature",
+                "geometry": mapping(merged),
+                "properties": _aggregate(key, group_by, [p for _, p in members])
+            })
+            continue
+
+        tree = STRtree(geometries)
+        components = getattr(merged, 'geoms', [merged])
+        for component in components:
+            hits = sorted(int(i) for i in tree.query(component, predicate='intersects'))
+            dissolved.append({
+                "type": "Feature",
+                "geometry": mapping(component),
+                "properties": _aggregate(key, group_by, [members[i][1] for i in hits])
+            })
+    return dissolved
@@ -0,0 +1,256 @@
+"""Elevation lookups for the nationwide elevation scan"""
+import concurrent.futures
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+OPENTOPODATA_URL = "https://api.opentopodata.org/v1"
+
+# OpenTopoData accepts at most 100 locations per request
+MAX_LOCATIONS_PER_REQUEST = 100
+
+
+def grid_points(min_lat, max_lat, min_lon, max_lon, lat_step, lon_step):
+    """Return flat lat/lon arrays for a row-major grid over the bounding box"""
+    n_lat = int(np.floor((max_lat - min_lat) / lat_step + 1e-9)) + 1
+    n_lon = int(np.floor((max_lon - min_lon) / lon_step + 1e-9)) + 1
+    lats = min_lat + lat_step * np.arange(n_lat)
+    lons = min_lon + lon_step * np.arange(n_lon)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    return np.round(grid_lat.ravel(), 6), np.round(grid_lon.ravel(), 6)
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly within a requests-per-second budget"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ElevationProvider:
+    """Base class for elevation sources sampled with whole lat/lon arrays
+
+    Subclasses implement either sample() or sample_with_status().
+    """
+
+    name = "base"
+
+    @property
+    def dataset_key(self):
+        """Identifies the underlying dataset when caching lookups"""
+        return self.name
+
+    def sample(self, lats, lons, progress=None):
+        """Return an elevation array aligned with the inputs (NaN where unavailable)"""
+        return self.sample_with_status(lats, lons, progress=progress)[0]
+
+    def sample_with_status(self, lats, lons, progress=None):
+        """Return (elevations, ok) where ok is False for lookups that failed and may be retried"""
+        elevations = self.sample(lats, lons, progress=progress)
+        return elevations, np.ones(elevations.shape, dtype=bool)
+
+
+class OpenTopoDataProvider(ElevationProvider):
+    """Batched OpenTopoData client with a pooled session and rate limiting"""
+
+    name = "opentopodata"
+
+    def __init__(self, dataset="test-dataset", base_url=OPENTOPODATA_URL,
+                 batch_size=MAX_LOCATIONS_PER_REQUEST, max_in_flight=4,
+                 requests_per_second=1.0, timeout=10, max_retries=3, session=None, cache=None):
+        self.dataset = dataset
+        self.url = f"{base_url.rstrip('/')}/{dataset}"
+        self.batch_size = max(1, min(batch_size, MAX_LOCATIONS_PER_REQUEST))
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.session = session or self._make_session()
+        self.cache = cache
+
+    @property
+    def dataset_key(self):
+        return f"{self.name}/{self.dataset}"
+
+    def _make_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _fetch(self, url, params, headers, timeout):
+        """Rate-limited GET returning (status, headers, json_or_None)"""
+        self.rate_limiter.wait()
+        host = urlparse(url).netloc
+        try:
+            with metrics.stage("http_request", host=host):
+                resp = self.session.get(url, params=params, headers=headers, timeout=timeout)
+        except Exception:
+            metrics.count("http_requests", host=host, status="error")
+            raise
+        metrics.count("http_requests", host=host, status=resp.status_code)
+        return resp.status_code, dict(resp.headers), resp.json() if resp.status_code == 200 else None
+
+    def _request_batch(self, lats, lons):
+        """Fetch one batch and return its elevations in request order"""
+        locations = "|".join(f"{lat:.6f},{lon:.6f}" for lat, lon in zip(lats, lons))
+        params = {"locations": locations}
+        for attempt in range(self.max_retries + 1):
+            if self.cache is not None:
+                status, data = self.cache.get(self.url, params, fetch=self._fetch, timeout=self.timeout)
+            else:
+                status, _, data = self._fetch(self.url, params, None, self.timeout)
+            if status == 429 or status >= 500:
+                if attempt < self.max_retries:
+                    metrics.count("http_retries", provider=self.name)
+                    time.sleep(2 ** attempt)
+                    continue
+            if status != 200:
+                raise requests.HTTPError(f"HTTP {status} from {self.url}")
+            if data.get('status') != 'OK':
+                raise ValueError(data.get('error', data.get('status')))
+            return [r.get('elevation') for r in data['results']]
+
+    def sample_with_status(self, lats, lons, progress=None):
+        """Fetch all points in batches; failed batches are NaN and flagged not ok"""
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        elevations = np.full(lats.size, np.nan)
+        ok = np.zeros(lats.size, dtype=bool)
+        batches = [slice(i, i + self.batch_size) for i in range(0, lats.size, self.batch_size)]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = {
+                executor.submit(self._request_batch, lats[b], lons[b]): b for b in batches
+            }
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                batch = futures[future]
+                expected = len(elevations[batch])
+                try:
+                    values = future.result()
+                    if len(values) != expected:
+                        raise ValueError(f"expected {expected} results, got {len(values)}")
+                    elevations[batch] = [np.nan if v is None else v for v in values]
+                    ok[batch] = True
+                except Exception as e:
+                    metrics.count("elevation_batch_errors", provider=self.name)
+                    print(f"Error fetching elevation batch {batch.start}-{batch.start + expected}: {e}")
+                if progress:
+                    progress(done, len(batches))
+        return elevations, ok
+
+
+# SRTM .hgt tiles are square big-endian int16 grids: 3601 samples per side
+# for 1 arc-second data and 1201 for 3 arc-second data
+SRTM_VOID = -32768
+SRTM_TILE_SIZES = {3601 * 3601 * 2: 3601, 1201 * 1201 * 2: 1201}
+
+
+def srtm_tile_name(lat, lon):
+    """Return the .hgt file name of the tile whose south-west corner is (lat, lon)"""
+    ns = 'N' if lat >= 0 else 'S'
+    ew = 'E' if lon >= 0 else 'W'
+    return f"{ns}{abs(int(lat)):02d}{ew}{abs(int(lon)):03d}.hgt"
+
+
+class SRTMTileProvider(ElevationProvider):
+    """Offline provider reading SRTM .hgt tiles from disk through numpy.memmap
+
+    Tiles are opened lazily and only the pages touched by a query are read,
+    so memory stays bounded by the OS page cache. Points over missing tiles
+    (e.g. open sea) or void cells come back as NaN.
+    """
+
+    name = "srtm"
+
+    def __init__(self, tile_dir):
+        self.tile_dir = tile_dir
+        self._tiles = {}
+
+    def _tile(self, lat0, lon0):
+        key = (lat0, lon0)
+        if key not in self._tiles:
+            path = os.path.join(self.tile_dir, srtm_tile_name(lat0, lon0))
+            tile = None
+            if os.path.exists(path):
+                size = SRTM_TILE_SIZES.get(os.path.getsize(path))
+                if size is None:
+                    raise ValueError(f"Unrecognised SRTM tile size: {path}")
+                tile = np.memmap(path, dtype='>i2', mode='r', shape=(size, size))
+            self._tiles[key] = tile
+        return self._tiles[key]
+
+    def sample(self, lats, lons, progress=None):
+        """Bilinearly interpolate elevations for whole lat/lon arrays"""
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        elevations = np.full(lats.size, np.nan)
+
+        tile_lat = np.floor(lats).astype(np.int64)
+        tile_lon = np.floor(lons).astype(np.int64)
+        keys = (tile_lat + 90) * 360 + (tile_lon + 180)
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        bounds = np.append(starts, order.size)
+
+        for n, key in enumerate(unique_keys):
+            idx = order[bounds[n]:bounds[n + 1]]
+            lat0, lon0 = int(key // 360) - 90, int(key % 360) - 180
+            tile = self._tile(lat0, lon0)
+            if tile is not None:
+                elevations[idx] = self._interpolate(tile, lats[idx] - lat0, lons[idx] - lon0)
+            if progress:
+                progress(n + 1, len(unique_keys))
+        return elevations
+
+    @staticmethod
+    def _interpolate(tile, dlat, dlon):
+        """Bilinear interpolation inside one tile; rows run north to south"""
+        last = tile.shape[0] - 1
+        row = (1.0 - dlat) * last
+        col = dlon * last
+        r0 = np.clip(np.floor(row).astype(np.int64), 0, last - 1)
+        c0 = np.clip(np.floor(col).astype(np.int64), 0, last - 1)
+        fr = row - r0
+        fc = col - c0
+
+        corners = np.stack([
+            tile[r0, c0], tile[r0, c0 + 1], tile[r0 + 1, c0], tile[r0 + 1, c0 + 1]
+        ]).astype(float)
+        corners[corners == SRTM_VOID] = np.nan
+        top = corners[0] * (1 - fc) + corners[1] * fc
+        bottom = corners[2] * (1 - fc) + corners[3] * fc
+        return top * (1 - fr) + bottom * fr
+
+
+PROVIDERS = {
+    OpenTopoDataProvider.name: OpenTopoDataProvider,
+    SRTMTileProvider.name: SRTMTileProvider,
+}
+
+
+def make_provider(name, **options):
+    """Instantiate a registered elevation provider by name"""
+    try:
+        return PROVIDERS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown elevation provider: {name}") from None
@@ -0,0 +1,129 @@
+"""Persistent on-disk cache of fetched elevations"""
+import os
+import sqlite3
+
+import numpy as np
+
+from .elevation import ElevationProvider
+from .metrics import metrics
+
+# Coordinates are stored as integer micro-degrees so float noise from grid
+# stepping cannot create duplicate keys
+SCALE = 1_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS elevations (
+    dataset TEXT NOT NULL,
+    lat_e6 INTEGER NOT NULL,
+    lon_e6 INTEGER NOT NULL,
+    elevation REAL,
+    PRIMARY KEY (dataset, lat_e6, lon_e6)
+) WITHOUT ROWID
+"""
+
+
+def _keys(values):
+    return np.rint(np.asarray(values, dtype=float).reshape(-1) * SCALE).astype(np.int64)
+
+
+class ElevationStore:
+    """SQLite table of elevations keyed by (dataset, lat, lon)
+
+    A row means the point has been looked up; a NULL elevation records a
+    definitive "no data" answer (e.g. sea) so it is not fetched again.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def lookup(self, dataset, lats, lons):
+        """Return (elevations, known) arrays aligned with the inputs"""
+        lat_keys, lon_keys = _keys(lats), _keys(lons)
+        elevations = np.full(lat_keys.size, np.nan)
+        known = np.zeros(lat_keys.size, dtype=bool)
+        if lat_keys.size == 0:
+            return elevations, known
+
+        rows = self.conn.execute(
+            "SELECT lat_e6, lon_e6, elevation FROM elevations "
+            "WHERE dataset = ? AND lat_e6 BETWEEN ? AND ? AND lon_e6 BETWEEN ? AND ?",
+            (dataset, int(lat_keys.min()), int(lat_keys.max()),
+             int(lon_keys.min()), int(lon_keys.max()))
+        )
+        cached = {(lat, lon): elev for lat, lon, elev in rows}
+        for i, key in enumerate(zip(lat_keys.tolist(), lon_keys.tolist())):
+            if key in cached:
+                known[i] = True
+                elev = cached[key]
+                elevations[i] = np.nan if elev is None else elev
+        return elevations, known
+
+    def save(self, dataset, lats, lons, elevations):
+        """Insert or replace looked-up elevations (NaN is stored as no data)"""
+        values = [
+            (dataset, lat, lon, None if np.isnan(elev) else elev)
+            for lat, lon, elev in zip(_keys(lats).tolist(), _keys(lons).tolist(),
+                                      np.asarray(elevations, dtype=float).tolist())
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO elevations (dataset, lat_e6, lon_e6, elevation) "
+                "VALUES (?, ?, ?, ?)", values
+            )
+
+    def count(self, dataset):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM elevations WHERE dataset = ?", (dataset,)
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedElevationProvider(ElevationProvider):
+    """Wraps a provider so only points missing from the store are fetched
+
+    Fresh results are committed chunk by chunk, so an interrupted scan
+    resumes where it stopped and re-runs with a different threshold or
+    radius are served entirely from disk.
+    """
+
+    def __init__(self, provider, store, chunk_size=2000):
+        self.provider = provider
+        self.store = store
+        self.chunk_size = chunk_size
+        self.name = provider.name
+
+    @property
+    def dataset_key(self):
+        return self.provider.dataset_key
+
+    def sample_with_status(self, lats, lons, progress=None):
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        dataset = self.dataset_key
+
+        elevations, known = self.store.lookup(dataset, lats, lons)
+        ok = known.copy()
+        missing = np.flatnonzero(~known)
+        print(f"Elevation cache: {known.sum()} cached, {missing.size} to fetch")
+        metrics.count("elevation_cache", int(known.sum()), result="hit")
+        metrics.count("elevation_cache", int(missing.size), result="miss")
+
+        chunks = [missing[i:i + self.chunk_size] for i in range(0, missing.size, self.chunk_size)]
+        for n, idx in enumerate(chunks, 1):
+            values, fetched = self.provider.sample_with_status(lats[idx], lons[idx])
+            elevations[idx] = values
+            ok[idx] = fetched
+            self.store.save(dataset, lats[idx[fetched]], lons[idx[fetched]], values[fetched])
+            if progress:
+                progress(n, len(chunks))
+        return elevations, ok
@@ -0,0 +1,196 @@
+"""Asyncio fetch engine running hazard sources concurrently over one pooled client"""
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+from .store import FeatureStore
+
+try:
+    import aiohttp
+except ImportError:  # optional; a pooled requests.Session on worker threads is used instead
+    aiohttp = None
+
+DEFAULT_REQUEST_TIMEOUT = 10
+DEFAULT_SOURCE_DEADLINE = 30
+
+# Features created while a source runs go to that source's own buffer
+current_buffer = contextvars.ContextVar("geofence_feature_buffer", default=None)
+
+
+class AsyncHttpClient:
+    """Shared, connection-pooled HTTP client for all sources of one run"""
+
+    def __init__(self, max_connections=20, timeout=DEFAULT_REQUEST_TIMEOUT, cache=None):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache = cache
+        self._session = None
+        self._executor = None
+
+    async def __aenter__(self):
+        if aiohttp is not None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections))
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_connections,
+                                  pool_maxsize=self.max_connections)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_connections)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if aiohttp is not None:
+            await self._session.close()
+        else:
+            self._session.close()
+            self._executor.shutdown(wait=False)
+
+    async def get(self, url, params=None, headers=None, timeout=None):
+        """Return (status, headers, json_or_None) for a GET request"""
+        host = urlparse(url).netloc
+        try:
+            with metrics.stage("http_request", host=host):
+                status, headers, data = await self._get(url, params, headers, timeout or self.timeout)
+        except Exception:
+            metrics.count("http_requests", host=host, status="error")
+            raise
+        metrics.count("http_requests", host=host, status=status)
+        return status, headers, data
+
+    async def _get(self, url, params, headers, timeout):
+        if aiohttp is not None:
+            async with self._session.get(url, params=params, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                data = await resp.json(content_type=None) if resp.status == 200 else None
+                return resp.status, dict(resp.headers), data
+
+        def blocking_get():
+            resp = self._session.get(url, params=params, headers=headers, timeout=timeout)
+            return resp.status_code, dict(resp.headers), resp.json() if resp.status_code == 200 else None
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, blocking_get)
+
+    async def get_json(self, url, params=None, timeout=None):
+        """Return the decoded JSON body of a 200 response, else None"""
+        if self.cache is not None:
+            status, data = await self.cache.get_async(url, self, params=params, timeout=timeout)
+        else:
+            status, _, data = await self.get(url, params=params, timeout=timeout)
+        return data if status == 200 else None
+
+
+class SourceResult:
+    """Features and outcome of one source run"""
+
+    __slots__ = ("name", "features", "error", "elapsed")
+
+    def __init__(self, name, features, error=None, elapsed=0.0):
+        self.name = name
+        self.features = features
+        self.error = error
+        self.elapsed = elapsed
+
+
+def _drain(source):
+    returned = source()
+    if returned is None or isinstance(returned, FeatureStore):
+        return returned
+    return list(returned)
+
+
+def _settle(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _in_daemon_thread(func, *args):
+    """Run ``func(*args)`` on a new daemon thread; returns an asyncio future of its result
+
+    A sync source still running past its deadline is abandoned there and
+    never keeps the interpreter from exiting, unlike an executor thread.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def run():
+        try:
+            result, error = func(*args), None
+        except BaseException as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(_settle, future, result, error)
+        except RuntimeError:
+            pass  # the loop already closed after the deadline
+
+    threading.Thread(target=run, daemon=True, name="source").start()
+    return future
+
+
+async def _run_source(name, source, client, deadline):
+    buffer = FeatureStore()
+    token = current_buffer.set(buffer)
+    start = time.perf_counter()
+    error = None
+    try:
+        if inspect.iscoroutinefunction(source):
+            returned = await asyncio.wait_for(source(client), deadline)
+        else:
+            # Run in a copy of this context so the worker sees this buffer;
+            # returned iterables are drained on the worker too
+            context = contextvars.copy_context()
+            returned = await asyncio.wait_for(
+                _in_daemon_thread(context.run, _drain, source), deadline)
+        if returned:
+            buffer.extend(returned)
+    except asyncio.TimeoutError:
+        error = f"deadline of {deadline}s exceeded"
+        # The abandoned worker may still be appending; drop what it made
+        buffer = FeatureStore()
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    finally:
+        current_buffer.reset(token)
+    elapsed = time.perf_counter() - start
+    metrics.observe("source", elapsed, source=name)
+    if error:
+        metrics.count("source_errors", source=name)
+    metrics.count("source_features", len(buffer), source=name)
+    return SourceResult(name, buffer, error, elapsed)
+
+
+async def fetch_sources_async(sources, deadline=DEFAULT_SOURCE_DEADLINE, max_connections=20,
+                              request_timeout=DEFAULT_REQUEST_TIMEOUT, cache=None):
+    """Run every ``(name, source[, deadline])`` concurrently; results keep the given order
+
+    A source is either a coroutine function taking the shared client or a
+    plain callable run on a daemon thread. Features are collected from what
+    it creates while running and from any iterable it returns. Each source
+    has its own deadline, so a slow or failing one only loses its own
+    features. ``cache`` is an optional
+    :class:`~geofencing.http_cache.ResponseCache` for get_json().
+    """
+    async with AsyncHttpClient(max_connections, request_timeout, cache=cache) as client:
+        return await asyncio.gather(*(
+            _run_source(name, source, client, *(rest or (deadline,)))
+            for name, source, *rest in sources
+        ))
+
+
+def fetch_sources(sources, **options):
+    """Synchronous entry point for :func:`fetch_sources_async`"""
+    return asyncio.run(fetch_sources_async(sources, **options))
@@ -0,0 +1,124 @@
+"""Shared geometry helpers for the geofence generators"""
+from functools import lru_cache
+
+import numpy as np
+
+# Mean Earth radius and length of one degree of latitude
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+DEFAULT_NUM_POINTS = 32
+
+# Largest allowed gap between a polygon edge and the true circle (the
+# sagitta of one chord); 32 vertices at 20 km is about 96 m
+DEFAULT_MAX_CHORD_ERROR_M = 100
+MIN_POINTS = 8
+MAX_POINTS = 256
+
+
+@lru_cache(maxsize=32)
+def unit_circle(num_points=DEFAULT_NUM_POINTS):
+    """Return a read-only closed (num_points + 1, 2) table of [cos, sin] values"""
+    angles = 2 * np.pi * np.arange(num_points) / num_points
+    table = np.empty((num_points + 1, 2))
+    table[:-1, 0] = np.cos(angles)
+    table[:-1, 1] = np.sin(angles)
+    table[-1] = table[0]
+    table.flags.writeable = False
+    return table
+
+
+def _as_columns(lats, lons, radii_km):
+    lats = np.asarray(lats, dtype=float).reshape(-1)
+    lons = np.asarray(lons, dtype=float).reshape(-1)
+    if lats.shape != lons.shape:
+        raise ValueError("lats and lons must have the same length")
+    radii = np.broadcast_to(np.asarray(radii_km, dtype=float), lats.shape)
+    return lats, lons, radii
+
+
+def circle_rings(lats, lons, radii_km, num_points=DEFAULT_NUM_POINTS, geodesic=False):
+    """Build closed circle rings for many centers in a single NumPy pass
+
+    Returns an array of shape (n, num_points + 1, 2) holding [lon, lat] pairs.
+    By default the longitude offset is scaled by 1 / cos(lat) so circles stay
+    round at every latitude; ``geodesic=True`` uses exact great-circle offsets.
+    """
+    lats, lons, radii = _as_columns(lats, lons, radii_km)
+    table = unit_circle(num_points)
+    rings = np.empty((lats.size, num_points + 1, 2))
+
+    if geodesic:
+        # Destination point on a sphere; table[:, 0] is sin(bearing) and
+        # table[:, 1] is cos(bearing) for bearings measured from north.
+        phi = np.radians(lats)[:, None]
+        delta = (radii / EARTH_RADIUS_KM)[:, None]
+        sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+        sin_d, cos_d = np.sin(delta), np.cos(delta)
+        sin_phi2 = sin_phi * cos_d + cos_phi * sin_d * table[:, 1]
+        phi2 = np.arcsin(np.clip(sin_phi2, -1.0, 1.0))
+        dlam = np.arctan2(table[:, 0] * sin_d * cos_phi, cos_d - sin_phi * sin_phi2)
+        rings[:, :, 0] = lons[:, None] + np.degrees(dlam)
+        rings[:, :, 1] = np.degrees(phi2)
+        return rings
+
+    dlat = radii / KM_PER_DEGREE
+    dlon = dlat / np.maximum(np.cos(np.radians(lats)), 1e-6)
+    rings[:, :, 0] = lons[:, None] + dlon[:, None] * table[:, 0]
+    rings[:, :, 1] = lats[:, None] + dlat[:, None] * table[:, 1]
+    return rings
+
+
+def vertices_for_radius(radii_km, max_error_m=DEFAULT_MAX_CHORD_ERROR_M,
+                        min_points=MIN_POINTS, max_points=MAX_POINTS):
+    """Smallest vertex count keeping the chord error of each circle under ``max_error_m``"""
+    radii_m = np.asarray(radii_km, dtype=float) * 1000
+    ratio = np.clip(1 - max_error_m / np.maximum(radii_m, 1e-9), -1.0, 1.0)
+    with np.errstate(divide='ignore'):
+        counts = np.ceil(np.pi / np.arccos(ratio))
+    return np.clip(np.nan_to_num(counts, posinf=max_points), min_points, max_points).astype(int)
+
+
+def adaptive_circle_rings(lats, lons, radii_km, max_error_m=DEFAULT_MAX_CHORD_ERROR_M,
+                          geodesic=False):
+    """Build rings whose vertex count adapts to each radius; returns a list of arrays"""
+    lats, lons, radii = _as_columns(lats, lons, radii_km)
+    counts = vertices_for_radius(radii, max_error_m)
+    rings = [None] * lats.size
+    for count in np.unique(counts):
+        idx = np.flatnonzero(counts == count)
+        group = circle_rings(lats[idx], lons[idx], radii[idx], num_points=int(count), geodesic=geodesic)
+        for i, ring in zip(idx.tolist(), group):
+            rings[i] = ring
+    return rings
+
+
+def circle_features(lats, lons, radii_km, properties=None, num_points=None,
+                    max_error_m=DEFAULT_MAX_CHORD_ERROR_M, geodesic=False):
+    """Yield GeoJSON circle features for arrays of centers and radii
+
+    ``properties`` is an optional sequence of dicts aligned with the centers.
+    Vertex counts adapt to each radius via ``max_error_m`` unless a fixed
+    ``num_points`` is given.
+    """
+    if num_points:
+        rings = circle_rings(lats, lons, radii_km, num_points=num_points, geodesic=geodesic)
+    else:
+        rings = adaptive_circle_rings(lats, lons, radii_km, max_error_m=max_error_m,
+                                      geodesic=geodesic)
+    for i, ring in enumerate(rings):
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [ring.tolist()]
+            },
+            "properties": (properties[i] if properties is not None else None) or {}
+        }
+
+
+def circle_feature(lat, lon, radius_km=20, properties=None, num_points=None,
+                   max_error_m=DEFAULT_MAX_CHORD_ERROR_M, geodesic=False):
+    """Create a single circular GeoJSON feature"""
+    return next(circle_features([lat], [lon], radius_km, [properties], num_points=num_points,
+                                max_error_m=max_error_m, geodesic=geodesic))
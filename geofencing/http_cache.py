@@ -0,0 +1,326 @@
+"""TTL and ETag aware response cache shared by the generators' HTTP calls"""
+import concurrent.futures
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+
+import requests
+
+from .metrics import metrics
+
+# Seconds a response stays fresh per host; None means it never expires.
+# Elevations don't change, but scans persist them in ElevationStore, so
+# OpenTopoData responses only need to outlive a few re-runs here
+DEFAULT_TTLS = {
+    "api.openweathermap.org": 600,
+    "api.opentopodata.org": 7 * 24 * 3600,
+}
+DEFAULT_TTL = 300
+
+# Per host, whether a 200 body is a real answer worth caching; APIs that
+# report rate limits and errors inside a 200 body are never cached
+DEFAULT_VALIDATORS = {
+    "api.opentopodata.org": lambda data: isinstance(data, dict) and data.get('status') == 'OK',
+    "api.openweathermap.org": lambda data: isinstance(data, dict) and str(data.get('cod', 200)) == '200',
+}
+
+# Query parameters carrying credentials; never part of a cache key, so API
+# keys stay out of the SQLite file
+CREDENTIAL_PARAMS = frozenset({"appid", "apikey", "api_key", "key", "token", "access_token"})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL
+)
+"""
+
+
+class CacheEntry:
+    __slots__ = ("data", "etag", "last_modified", "stored_at", "expires_at")
+
+    def __init__(self, data, etag=None, last_modified=None, stored_at=0.0, expires_at=None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    def is_fresh(self, now):
+        return self.expires_at is None or now < self.expires_at
+
+
+def cache_key(url, params=None):
+    """URL plus sorted query parameters, without credential parameters"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    query = sorted((k, str(v)) for k, v in query if k.lower() not in CREDENTIAL_PARAMS)
+    base = urlunsplit(parts._replace(query=""))
+    return f"{base}?{urlencode(query)}" if query else base
+
+
+class ResponseCache:
+    """In-memory LRU in front of a SQLite store of JSON responses
+
+    Fresh entries are served without network I/O. Expired entries are
+    revalidated with If-None-Match / If-Modified-Since; within
+    ``stale_grace`` seconds of expiry the stale body is returned at once and
+    revalidated on a background thread. If upstream fails, any stale copy
+    is served instead. Only 200 bodies accepted by the host's validator
+    are stored. The SQLite file is only created on the first lookup.
+    """
+
+    def __init__(self, path, ttls=None, default_ttl=DEFAULT_TTL, memory_entries=256,
+                 stale_grace=None, validators=None):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.validators = dict(DEFAULT_VALIDATORS if validators is None else validators)
+        self.default_ttl = default_ttl
+        self.memory_entries = memory_entries
+        self.stale_grace = stale_grace
+        self.hits = self.misses = self.revalidated = self.stale_served = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._session = requests.Session()
+        self._background = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._connection = None
+        self._open_lock = threading.Lock()
+
+    def ttl_for(self, url):
+        host = urlparse(url).hostname or ""
+        return self.ttls.get(host, self.default_ttl)
+
+    def is_valid(self, url, data):
+        validator = self.validators.get(urlparse(url).hostname or "")
+        return data is not None and (validator is None or validator(data))
+
+    def _tally(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _grace_for(self, url):
+        if self.stale_grace is not None:
+            return self.stale_grace
+        return self.ttl_for(url) or 0
+
+    # Storage -------------------------------------------------------------
+
+    @property
+    def _db(self):
+        """SQLite connection, opened (creating the file) on first use"""
+        with self._open_lock:
+            if self._connection is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute(SCHEMA)
+                connection.commit()
+                self._purge_credentials(connection)
+                self._connection = connection
+            return self._connection
+
+    @staticmethod
+    def _purge_credentials(db):
+        """Drop rows keyed by URLs with credentials, written by older versions"""
+        with db:
+            keys = [key for (key,) in db.execute("SELECT key FROM responses")
+                    if cache_key(key) != key]
+            db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, stored_at, expires_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(json.loads(row[0]), *row[1:])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _save(self, key, url, data, headers, previous=None):
+        now = time.time()
+        ttl = self.ttl_for(url)
+        entry = CacheEntry(
+            data if previous is None else previous.data,
+            headers.get('ETag') or (previous.etag if previous else None),
+            headers.get('Last-Modified') or (previous.last_modified if previous else None),
+            now,
+            None if ttl is None else now + ttl,
+        )
+        self._remember(key, entry)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, etag, last_modified, stored_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.data), entry.etag, entry.last_modified,
+                 entry.stored_at, entry.expires_at)
+            )
+        return entry
+
+    # Revalidation --------------------------------------------------------
+
+    @staticmethod
+    def _conditional_headers(entry):
+        headers = {}
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def _plan(self, key, url):
+        """Return (entry, action) where action is 'hit', 'stale' or 'fetch'"""
+        entry = self._load(key)
+        now = time.time()
+        host = urlparse(url).netloc
+        if entry is not None and entry.is_fresh(now):
+            self._tally("hits")
+            metrics.count("http_cache", host=host, result="hit")
+            return entry, 'hit'
+        if entry is not None and now < entry.expires_at + self._grace_for(url):
+            metrics.count("http_cache", host=host, result="stale")
+            return entry, 'stale'
+        self._tally("misses")
+        metrics.count("http_cache", host=host, result="miss")
+        return entry, 'fetch'
+
+    def _complete(self, key, url, entry, status, headers, data):
+        """Apply a network response; returns (status, data) for the caller"""
+        if status == 304 and entry is not None:
+            self._tally("revalidated")
+            metrics.count("http_cache_revalidated", host=urlparse(url).netloc)
+            return 200, self._save(key, url, None, headers, previous=entry).data
+        if status == 200 and self.is_valid(url, data):
+            return 200, self._save(key, url, data, headers).data
+        if entry is not None:
+            self._tally("stale_served")
+            return 200, entry.data
+        if status == 200 and data is not None:
+            # An error reported in the body: hand it back uncached
+            metrics.count("http_cache_rejected", host=urlparse(url).netloc)
+            return 200, data
+        return status, None
+
+    def _default_fetch(self, url, params, headers, timeout):
+        resp = self._session.get(url, params=params, headers=headers, timeout=timeout)
+        return resp.status_code, dict(resp.headers), resp.json() if resp.status_code == 200 else None
+
+    def _refresh_in_background(self, key, url, params, entry, timeout):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                status, headers, data = self._default_fetch(
+                    url, params, self._conditional_headers(entry), timeout)
+                self._complete(key, url, entry, status, headers, data)
+            except Exception as e:
+                print(f"Background refresh failed for {url}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._background.submit(refresh)
+
+    def get(self, url, params=None, fetch=None, timeout=10):
+        """Return (status, json) for a GET, going to the network only when needed
+
+        ``fetch(url, params, headers, timeout)`` must return
+        (status, headers, json_or_None); a pooled session is used by default.
+        """
+        key = cache_key(url, params)
+        entry, action = self._plan(key, url)
+        if action == 'hit':
+            return 200, entry.data
+        if action == 'stale':
+            self._tally("stale_served")
+            self._refresh_in_background(key, url, params, entry, timeout)
+            return 200, entry.data
+        try:
+            status, headers, data = (fetch or self._default_fetch)(
+                url, params, self._conditional_headers(entry), timeout)
+        except Exception:
+            if entry is None:
+                raise
+            self._tally("stale_served")
+            return 200, entry.data
+        return self._complete(key, url, entry, status, headers, data)
+
+    async def get_async(self, url, client, params=None, timeout=None):
+        """Async variant of :meth:`get` fetching through an AsyncHttpClient"""
+        key = cache_key(url, params)
+        entry, action = self._plan(key, url)
+        if action == 'hit':
+            return 200, entry.data
+        if action == 'stale':
+            self._tally("stale_served")
+            self._refresh_in_background(key, url, params, entry, timeout or 10)
+            return 200, entry.data
+        try:
+            status, headers, data = await client.get(
+                url, params=params, headers=self._conditional_headers(entry), timeout=timeout)
+        except Exception:
+            if entry is None:
+                raise
+            self._tally("stale_served")
+            return 200, entry.data
+        return self._complete(key, url, entry, status, headers, data)
+
+    def get_json(self, url, params=None, timeout=10):
+        """Return the cached or fetched JSON body, or None"""
+        status, data = self.get(url, params=params, timeout=timeout)
+        return data if status == 200 else None
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "revalidated": self.revalidated, "stale_served": self.stale_served}
+
+    def close(self):
+        self._background.shutdown(wait=True)
+        self._session.close()
+        if self._connection is not None:
+            self._connection.close()
+
+
+# data/ next to the geofencing package, whatever the working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data", "http_cache.sqlite")
+
+_default_cache = None
+
+
+def default_cache():
+    """Process-wide cache at $HTTP_CACHE (default DEFAULT_PATH); None if disabled"""
+    global _default_cache
+    path = os.environ.get("HTTP_CACHE", DEFAULT_PATH)
+    if not path:
+        return None
+    if _default_cache is None:
+        _default_cache = ResponseCache(path)
+    return _default_cache
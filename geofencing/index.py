@@ -0,0 +1,381 @@
+"""Spatial index and point-in-geofence queries over generated FeatureCollections"""
+import json
+import os
+
+import numpy as np
+
+from .properties import live_features
+
+# Single-ring polygons up to this many vertices are tested in one padded,
+# fully vectorized pass; larger or holed polygons fall back to a per-part loop
+MAX_PADDED_VERTICES = 256
+PAIR_CHUNK = 4096
+_CELL_OFFSET = 1 << 20
+_CELL_STRIDE = 1 << 21
+
+DEFAULT_DATA_DIR = "SIH MVP/src/data"
+# FeatureCollections written under DEFAULT_DATA_DIR by the generators
+DATASETS = ("comprehensive_india_geofences", "enhanced_multi_api_geofences",
+            "india_elevation_geofences", "mountain_hazard_geofences")
+# Deduplicated merge of DATASETS, written by geofencing.merge
+UNIFIED_DATASET = "unified_geofences"
+
+
+def load_feature_collection(path, now=None):
+    """Read a GeoJSON FeatureCollection, leaving out zones that expired by ``now``"""
+    with open(path) as f:
+        collection = json.load(f)
+    if collection.get('features'):
+        collection['features'] = live_features(collection['features'], now)
+    return collection
+
+
+def dataset_paths(data_dir=DEFAULT_DATA_DIR, names=DATASETS):
+    """Paths of the generated datasets that exist in ``data_dir``"""
+    paths = [os.path.join(data_dir, f"{name}.json") for name in names]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def zone_paths(data_dir=DEFAULT_DATA_DIR):
+    """The unified dataset if it is newer than every generated one, else the generated datasets"""
+    paths = dataset_paths(data_dir)
+    unified = os.path.join(data_dir, f"{UNIFIED_DATASET}.json")
+    if os.path.exists(unified) and all(os.path.getmtime(unified) >= os.path.getmtime(p) for p in paths):
+        return [unified]
+    return paths
+
+
+def polygon_parts(geometry):
+    """Yield each polygon of a Polygon/MultiPolygon geometry as a list of rings"""
+    if not geometry:
+        return
+    if geometry.get('type') == 'Polygon':
+        yield geometry['coordinates']
+    elif geometry.get('type') == 'MultiPolygon':
+        yield from geometry['coordinates']
+
+
+def points_in_ring(ring, xs, ys):
+    """Even-odd ray casting of many points against one closed [x, y] ring"""
+    x0, y0 = ring[:-1, 0][:, None], ring[:-1, 1][:, None]
+    x1, y1 = ring[1:, 0][:, None], ring[1:, 1][:, None]
+    crosses = (y0 > ys) != (y1 > ys)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(crosses & (xs < x_at), axis=0) % 2 == 1
+
+
+def _expand_ranges(starts, counts):
+    """Concatenate arange(start, start + count) for every pair, vectorized"""
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    nonzero = counts > 0
+    starts, counts = starts[nonzero], counts[nonzero]
+    steps = np.ones(total, dtype=np.int64)
+    steps[0] = starts[0]
+    steps[np.cumsum(counts)[:-1]] = starts[1:] - (starts[:-1] + counts[:-1] - 1)
+    return np.cumsum(steps)
+
+
+def _sorted_unique(keys):
+    """np.unique for int keys that are mostly in order already
+
+    A stable (run-merging) sort is near linear on such input, unlike the
+    hash-based np.unique.
+    """
+    keys = np.sort(keys, kind='stable')
+    if keys.size:
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+    return keys
+
+
+def _box_cells(boxes, cell_size):
+    """Return (box_idx, cell_key) for every grid cell each box touches"""
+    lo = np.floor(boxes[:, :2] / cell_size).astype(np.int64)
+    hi = np.floor(boxes[:, 2:] / cell_size).astype(np.int64)
+    nx, ny = hi[:, 0] - lo[:, 0] + 1, hi[:, 1] - lo[:, 1] + 1
+    counts = nx * ny
+    owners = np.repeat(np.arange(len(boxes)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = lo[owners, 0] + k // ny[owners] + _CELL_OFFSET
+    cy = lo[owners, 1] + k % ny[owners] + _CELL_OFFSET
+    return owners, cx * _CELL_STRIDE + cy
+
+
+def _build_grid(boxes, cell_size):
+    """CSR grid registering each box in every cell it touches: (keys, offsets, members)"""
+    members, keys = _box_cells(boxes, cell_size)
+    order = np.argsort(keys, kind='stable')
+    keys, starts = np.unique(keys[order], return_index=True)
+    return keys, np.append(starts, order.size).astype(np.int64), members[order]
+
+
+def _overlapping(grid, cell_size, boxes, member_boxes):
+    """Unique (box_idx, member_idx) pairs of overlapping boxes, sorted by box"""
+    cell_keys, cell_offsets, cell_members = grid
+    if not len(boxes) or not len(cell_keys):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owners, keys = _box_cells(boxes, cell_size)
+    slot = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+    found = cell_keys[slot] == keys
+    owners, slot = owners[found], slot[found]
+    starts = cell_offsets[slot]
+    counts = cell_offsets[slot + 1] - starts
+    owners = np.repeat(owners, counts)
+    members = cell_members[_expand_ranges(starts, counts)]
+    a, b = boxes[owners], member_boxes[members]
+    keep = (a[:, 0] <= b[:, 2]) & (b[:, 0] <= a[:, 2]) & (a[:, 1] <= b[:, 3]) & (b[:, 1] <= a[:, 3])
+    stride = max(len(member_boxes), 1)
+    # A member spanning several of a box's cells is found once per cell
+    pairs = _sorted_unique(owners[keep] * stride + members[keep])
+    return pairs // stride, pairs % stride
+
+
+class GeofenceIndex:
+    """Uniform grid hash over polygon bounding boxes with exact containment checks
+
+    Every polygon part is registered in each grid cell its bounding box
+    touches (stored CSR-style as sorted cell keys plus offsets). Queries look
+    up each point's cell, filter candidates by bbox and then run ray casting
+    only on the survivors, vectorized across all (point, polygon) pairs.
+    """
+
+    def __init__(self, features, cell_size=None):
+        self.features = list(features)
+        part_feature = []
+        self.part_rings = []
+        bboxes = []
+        for fid, feature in enumerate(self.features):
+            for rings in polygon_parts(feature.get('geometry')):
+                arrays = [np.asarray(ring, dtype=float)[:, :2] for ring in rings if len(ring) >= 3]
+                if not arrays:
+                    continue
+                shell = arrays[0]
+                part_feature.append(fid)
+                self.part_rings.append(arrays)
+                bboxes.append((shell[:, 0].min(), shell[:, 1].min(),
+                               shell[:, 0].max(), shell[:, 1].max()))
+
+        self.part_feature = np.asarray(part_feature, dtype=np.int64)
+        self.bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        self.cell_size = cell_size or self._auto_cell_size()
+        self._edges = None
+        self._edge_grid = None
+        self._build_cells()
+        self._build_padded_rings()
+
+    @classmethod
+    def from_feature_collection(cls, collection, **kwargs):
+        return cls(collection.get('features', []), **kwargs)
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        """Bulk-load one or more GeoJSON FeatureCollection files into a single index"""
+        features = []
+        for path in paths:
+            features.extend(load_feature_collection(path).get('features', []))
+        return cls(features, **kwargs)
+
+    def _auto_cell_size(self):
+        if not len(self.bboxes):
+            return 1.0
+        extent = np.maximum(self.bboxes[:, 2] - self.bboxes[:, 0],
+                            self.bboxes[:, 3] - self.bboxes[:, 1])
+        return float(max(np.median(extent), 1e-3))
+
+    def _cell_keys(self, xs, ys):
+        cx = np.floor(np.asarray(xs) / self.cell_size).astype(np.int64) + _CELL_OFFSET
+        cy = np.floor(np.asarray(ys) / self.cell_size).astype(np.int64) + _CELL_OFFSET
+        return cx * _CELL_STRIDE + cy
+
+    def _build_cells(self):
+        self.cell_keys, self.cell_offsets, self.cell_parts = _build_grid(self.bboxes, self.cell_size)
+
+    def _build_padded_rings(self):
+        """Pad small single-ring parts into one (parts, vertices, 2) array
+
+        Edge slopes are precomputed for the ray casting kernel, and convex
+        parts get an inner box (NaN otherwise) whose points are inside
+        without testing any edge.
+        """
+        sizes = np.array([len(r[0]) if len(r) == 1 else 0 for r in self.part_rings], dtype=np.int64)
+        self.padded_ok = (sizes > 0) & (sizes <= MAX_PADDED_VERTICES)
+        width = int(sizes[self.padded_ok].max()) if self.padded_ok.any() else 1
+        self.padded = np.zeros((len(self.part_rings), width, 2))
+        for pid in np.flatnonzero(self.padded_ok).tolist():
+            ring = self.part_rings[pid][0]
+            self.padded[pid, :len(ring)] = ring
+            # Repeating the last vertex adds zero-length edges that never cross
+            self.padded[pid, len(ring):] = ring[-1]
+        edges = np.diff(self.padded, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.padded_slope = edges[..., 0] / edges[..., 1]
+        self.inner_boxes = self._inner_boxes(edges, sizes)
+
+    def _inner_boxes(self, edges, sizes):
+        """Largest bbox-shaped box around the vertex mean inside each convex padded part"""
+        boxes = np.full((len(self.part_rings), 4), np.nan)
+        if not self.padded_ok.any() or self.padded.shape[1] < 4:
+            return boxes
+        # Convex: consecutive edges all turn the same way, allowing for the
+        # wobble of coordinates rounded to 6 decimals
+        turns = edges[:, :-1, 0] * edges[:, 1:, 1] - edges[:, :-1, 1] * edges[:, 1:, 0]
+        lengths = np.hypot(edges[..., 0], edges[..., 1])
+        slack = 4e-6 * (lengths[:, :-1] + lengths[:, 1:])
+        convex = self.padded_ok & (sizes >= 4) & ((turns >= -slack).all(axis=1) | (turns <= slack).all(axis=1))
+        ids = np.flatnonzero(convex)
+        if not ids.size:
+            return boxes
+        rings = self.padded[ids]
+        # Mean of the distinct vertices (padding repeats the closing one)
+        padding = self.padded.shape[1] - sizes[ids, None]
+        center = (rings[:, :-1].sum(axis=1) - padding * rings[:, -1]) / (sizes[ids, None] - 1)
+        half = (self.bboxes[ids, 2:] - self.bboxes[ids, :2]) / 2
+        e = edges[ids]
+        w = rings[:, :-1] - center[:, None, :]
+        scale = np.full(ids.size, np.inf)
+        for sx, sy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+            dx, dy = (sx * half[:, 0])[:, None], (sy * half[:, 1])[:, None]
+            den = dx * e[..., 1] - dy * e[..., 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (w[..., 0] * e[..., 1] - w[..., 1] * e[..., 0]) / den
+                u = (w[..., 0] * dy - w[..., 1] * dx) / den
+            hit = (den != 0) & (u >= 0) & (u <= 1) & (t > 0)
+            scale = np.minimum(scale, np.where(hit, t, np.inf).min(axis=1))
+        scale = np.where(np.isfinite(scale), scale * 0.999, np.nan)
+        boxes[ids, :2] = center - scale[:, None] * half
+        boxes[ids, 2:] = center + scale[:, None] * half
+        return boxes
+
+    def _candidate_pairs(self, xs, ys):
+        """Return (point_idx, part_idx) pairs whose part bbox contains the point"""
+        xs = np.asarray(xs, dtype=float).reshape(-1)
+        ys = np.asarray(ys, dtype=float).reshape(-1)
+        keys = self._cell_keys(xs, ys)
+        slot = np.searchsorted(self.cell_keys, keys)
+        slot = np.minimum(slot, max(len(self.cell_keys) - 1, 0))
+        found = (self.cell_keys[slot] == keys) if len(self.cell_keys) else np.zeros(keys.size, bool)
+        starts = np.where(found, self.cell_offsets[slot] if len(self.cell_keys) else 0, 0)
+        counts = np.where(found, self.cell_offsets[slot + 1] - starts if len(self.cell_keys) else 0, 0)
+
+        points = np.repeat(np.arange(xs.size), counts)
+        parts = self.cell_parts[_expand_ranges(starts, counts)]
+        box = self.bboxes[parts]
+        px, py = xs[points], ys[points]
+        keep = (box[:, 0] <= px) & (px <= box[:, 2]) & (box[:, 1] <= py) & (py <= box[:, 3])
+        return points[keep], parts[keep]
+
+    def candidate_box_pairs(self, boxes):
+        """Return unique (box_idx, part_idx) pairs whose bboxes overlap, sorted by box
+
+        ``boxes`` are [min_x, min_y, max_x, max_y] rows, e.g. the (buffered)
+        bounding boxes of route segments.
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        return _overlapping((self.cell_keys, self.cell_offsets, self.cell_parts),
+                            self.cell_size, boxes, self.bboxes)
+
+    def edges(self):
+        """Every ring edge as (offsets, x0, y0, x1, y1); part p owns rows offsets[p]:offsets[p+1]"""
+        if self._edges is None:
+            rings = [ring for part in self.part_rings for ring in part]
+            counts = np.array([sum(len(ring) - 1 for ring in part) for part in self.part_rings],
+                              dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            if rings:
+                start = np.concatenate([ring[:-1] for ring in rings])
+                end = np.concatenate([ring[1:] for ring in rings])
+            else:
+                start = end = np.empty((0, 2))
+            self._edges = (offsets, start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        return self._edges
+
+    def candidate_edge_pairs(self, boxes):
+        """Return unique (box_idx, edge_idx) pairs whose bboxes overlap, sorted by box
+
+        Edges (rows of :meth:`edges`) get their own finer grid, built on
+        first use, so a box only meets the few edges near it rather than
+        every edge of each overlapping part.
+        """
+        offsets, x0, y0, x1, y1 = self.edges()
+        if self._edge_grid is None:
+            edge_boxes = np.column_stack([np.minimum(x0, x1), np.minimum(y0, y1),
+                                          np.maximum(x0, x1), np.maximum(y0, y1)])
+            extent = np.maximum(edge_boxes[:, 2] - edge_boxes[:, 0], edge_boxes[:, 3] - edge_boxes[:, 1])
+            cell_size = float(max(4 * np.median(extent), 1e-4)) if extent.size else 1.0
+            self._edge_grid = (_build_grid(edge_boxes, cell_size), cell_size, edge_boxes)
+        grid, cell_size, edge_boxes = self._edge_grid
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        return _overlapping(grid, cell_size, boxes, edge_boxes)
+
+    def contains_pairs(self, points, parts, xs, ys):
+        """Exact containment for each (point, part) pair"""
+        xs = np.asarray(xs, dtype=float).reshape(-1)
+        ys = np.asarray(ys, dtype=float).reshape(-1)
+        inside = np.zeros(points.size, dtype=bool)
+        padded = self.padded_ok[parts]
+
+        fast = np.flatnonzero(padded)
+        if fast.size:
+            box = self.inner_boxes[parts[fast]]
+            px, py = xs[points[fast]], ys[points[fast]]
+            core = (box[:, 0] < px) & (px < box[:, 2]) & (box[:, 1] < py) & (py < box[:, 3])
+            inside[fast[core]] = True
+            fast = fast[~core]
+        for start in range(0, fast.size, PAIR_CHUNK):
+            sel = fast[start:start + PAIR_CHUNK]
+            pids = parts[sel]
+            px, py = xs[points[sel]][:, None], ys[points[sel]][:, None]
+            y0, y1 = self.padded[pids, :-1, 1], self.padded[pids, 1:, 1]
+            crosses = (y0 > py) != (y1 > py)
+            with np.errstate(invalid='ignore'):
+                x_at = self.padded[pids, :-1, 0] + (py - y0) * self.padded_slope[pids]
+            inside[sel] = np.count_nonzero(crosses & (px < x_at), axis=1) % 2 == 1
+
+        slow = np.flatnonzero(~padded)
+        for pid in np.unique(parts[slow]).tolist():
+            sel = slow[parts[slow] == pid]
+            inside[sel] = self._contains(pid, xs[points[sel]], ys[points[sel]])
+        return inside
+
+    def _contains(self, pid, xs, ys):
+        rings = self.part_rings[pid]
+        inside = points_in_ring(rings[0], xs, ys)
+        for hole in rings[1:]:
+            inside &= ~points_in_ring(hole, xs, ys)
+        return inside
+
+    def match_pairs(self, lats, lons):
+        """Return unique (point_idx, feature_idx) containment pairs, sorted by point"""
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        points, parts = self._candidate_pairs(lons, lats)
+        inside = self.contains_pairs(points, parts, lons, lats)
+        stride = max(len(self.features), 1)
+        # Pairs arrive grouped by point; duplicates come from multi-part features
+        keys = _sorted_unique(points[inside] * stride + self.part_feature[parts[inside]])
+        return keys // stride, keys % stride
+
+    def query(self, lat, lon):
+        """Return the indices of features containing the point"""
+        return self.query_many([lat], [lon])[0]
+
+    def query_many(self, lats, lons):
+        """Return, for each point, the sorted indices of features containing it"""
+        n = np.asarray(lats).size
+        points, fids = self.match_pairs(lats, lons)
+        bounds = np.searchsorted(points, np.arange(n + 1))
+        fids = fids.tolist()
+        return [fids[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+    def properties_at(self, lat, lon):
+        """Return the properties (risk, severity, source, ...) of every zone containing the point"""
+        return [self.features[fid].get('properties', {}) for fid in self.query(lat, lon)]
+
+    def properties_many(self, lats, lons):
+        return [[self.features[fid].get('properties', {}) for fid in hits]
+                for hits in self.query_many(lats, lons)]
+
+    def __len__(self):
+        return len(self.features)
@@ -0,0 +1,258 @@
+"""Cached rasterized India land mask for skipping ocean and out-of-country points"""
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+from .geometry import KM_PER_DEGREE
+from .index import load_feature_collection, points_in_ring, polygon_parts
+from .metrics import metrics
+from .store import FeatureStore
+
+# Coarse [lon, lat] outline of India (mainland as officially mapped, plus the
+# Andaman and Nicobar chains and the Lakshadweep atolls), accurate to roughly
+# 0.2°. The mask is dilated by DEFAULT_MARGIN_KM to absorb that; point
+# INDIA_BOUNDARY at a proper boundary GeoJSON for a tighter mask.
+INDIA_OUTLINE = [
+    [[68.2, 23.7], [68.8, 24.3], [70.0, 24.2], [71.1, 24.4], [70.6, 25.7], [70.1, 26.6],
+     [69.5, 27.0], [70.4, 28.0], [71.9, 27.9], [72.9, 29.0], [73.4, 29.9], [74.0, 30.4],
+     [74.6, 31.1], [74.5, 31.8], [75.2, 32.2], [74.7, 32.8], [73.6, 32.9], [73.4, 33.8],
+     [73.1, 34.5], [72.6, 35.0], [72.5, 35.8], [73.5, 36.4], [74.6, 37.0], [75.5, 36.9],
+     [76.2, 36.2], [77.8, 35.5], [78.9, 35.7], [80.2, 35.5], [80.3, 34.4], [79.5, 33.3],
+     [79.4, 32.6], [78.4, 32.5], [78.8, 31.9], [78.7, 31.2], [79.8, 30.9], [80.9, 30.2],
+     [80.4, 29.5], [80.1, 28.8], [81.1, 28.4], [82.0, 27.9], [83.3, 27.4], [84.1, 27.4],
+     [84.6, 27.0], [85.6, 26.8], [86.7, 26.4], [87.8, 26.4], [88.1, 26.6], [88.2, 27.4],
+     [88.0, 27.9], [88.6, 28.1], [88.9, 27.9], [88.8, 27.3], [89.0, 26.9], [90.0, 26.8],
+     [91.5, 26.8], [92.1, 26.9], [92.1, 27.4], [91.6, 27.9], [92.5, 27.9], [93.5, 28.7],
+     [94.8, 29.3], [96.2, 29.3], [97.0, 28.3], [97.4, 27.9], [96.7, 27.4], [96.2, 27.3],
+     [95.3, 26.7], [95.1, 26.0], [94.6, 25.2], [94.2, 24.0], [93.4, 23.9], [93.3, 23.0],
+     [93.1, 22.2], [92.7, 21.95], [92.3, 22.5], [92.2, 23.6], [91.6, 22.9], [91.15, 23.6],
+     [91.9, 24.3], [92.4, 24.9], [92.0, 25.2], [90.0, 25.2], [89.85, 25.3], [89.8, 26.0],
+     [89.1, 26.3], [88.4, 26.5], [88.1, 25.9], [88.4, 25.2], [88.9, 25.2], [88.5, 24.3],
+     [88.7, 24.2], [88.9, 23.6], [88.6, 23.0], [89.0, 22.1], [88.9, 21.6], [88.0, 21.6],
+     [87.0, 21.5], [86.9, 20.8], [86.3, 19.9], [85.2, 19.5], [84.5, 18.6], [83.3, 17.6],
+     [82.3, 16.6], [81.3, 16.3], [80.3, 15.6], [80.1, 15.0], [80.3, 13.5], [80.3, 13.0],
+     [79.9, 12.0], [79.8, 11.2], [79.9, 10.3], [79.3, 10.3], [79.1, 9.3], [78.2, 8.5],
+     [77.5, 8.1], [76.6, 8.9], [76.2, 9.9], [75.8, 11.3], [75.2, 12.2], [74.8, 12.9],
+     [74.5, 14.0], [74.1, 14.8], [73.7, 15.7], [73.3, 17.0], [72.9, 18.5], [72.8, 19.3],
+     [72.7, 20.5], [72.6, 21.3], [72.6, 22.2], [72.3, 21.6], [71.0, 20.8], [70.0, 21.0],
+     [69.0, 22.3], [70.2, 22.6], [69.6, 22.9], [68.4, 23.5], [68.2, 23.7]],
+    [[92.2, 13.7], [93.1, 13.7], [93.1, 12.0], [92.8, 10.5], [92.3, 10.5], [92.2, 12.0],
+     [92.2, 13.7]],
+    [[92.7, 9.3], [93.1, 9.3], [93.95, 7.0], [93.8, 6.7], [93.6, 6.7], [92.7, 8.0],
+     [92.7, 9.3]],
+]
+
+# Lakshadweep atolls and reefs as (lat, lon); each becomes a small square
+# (wider than one mask cell, never overlapping the next) that the dilation
+# grows over the whole atoll
+LAKSHADWEEP_ISLANDS = [
+    (12.25, 71.88), (11.90, 71.82), (11.69, 72.71), (11.59, 72.18), (11.48, 73.00),
+    (11.22, 72.78), (11.12, 72.73), (10.94, 72.29), (10.86, 72.19), (10.57, 72.64),
+    (10.05, 72.28), (10.81, 73.68), (10.07, 73.65), (8.28, 73.05),
+]
+ISLAND_HALF_SIZE = 0.04
+
+
+def _square(lat, lon, half):
+    return [[lon - half, lat - half], [lon + half, lat - half], [lon + half, lat + half],
+            [lon - half, lat + half], [lon - half, lat - half]]
+
+
+INDIA_OUTLINE += [_square(lat, lon, ISLAND_HALF_SIZE) for lat, lon in LAKSHADWEEP_ISLANDS]
+
+DEFAULT_BOUNDS = (6.0, 37.5, 68.0, 98.0)  # min_lat, max_lat, min_lon, max_lon
+DEFAULT_RESOLUTION = 0.05
+DEFAULT_MARGIN_KM = 25
+ROW_CHUNK = 64
+
+
+def boundary_rings(path=None):
+    """Outer rings of a boundary GeoJSON file, or the built-in outline"""
+    if not path:
+        return [np.asarray(ring, dtype=float) for ring in INDIA_OUTLINE]
+    data = load_feature_collection(path)
+    if data.get('type') == 'FeatureCollection':
+        geometries = [f.get('geometry') for f in data.get('features', [])]
+    else:
+        geometries = [data.get('geometry') if data.get('type') == 'Feature' else data]
+    rings = []
+    for geometry in geometries:
+        for part in polygon_parts(geometry):
+            rings.extend(np.asarray(ring, dtype=float)[:, :2] for ring in part)
+    return rings
+
+
+def rasterize(rings, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION):
+    """Even-odd fill of ``rings`` sampled at cell centres; returns a (rows, cols) bool grid"""
+    min_lat, max_lat, min_lon, max_lon = bounds
+    rows = int(math.ceil((max_lat - min_lat) / resolution - 1e-9))
+    cols = int(math.ceil((max_lon - min_lon) / resolution - 1e-9))
+    lons = min_lon + (np.arange(cols) + 0.5) * resolution
+    grid = np.zeros((rows, cols), dtype=bool)
+    for start in range(0, rows, ROW_CHUNK):
+        lats = min_lat + (np.arange(start, min(rows, start + ROW_CHUNK)) + 0.5) * resolution
+        ys, xs = np.repeat(lats, cols), np.tile(lons, len(lats))
+        inside = np.zeros(xs.size, dtype=bool)
+        for ring in rings:
+            inside ^= points_in_ring(ring, xs, ys)
+        grid[start:start + len(lats)] = inside.reshape(len(lats), cols)
+    return grid
+
+
+def dilate(grid, margin_km, resolution, mid_lat=22.0):
+    """Grow the mask by ``margin_km`` (disk element, widened in longitude at ``mid_lat``)"""
+    ky = int(math.ceil(margin_km / (resolution * KM_PER_DEGREE)))
+    kx = int(math.ceil(margin_km / (resolution * KM_PER_DEGREE * math.cos(math.radians(mid_lat)))))
+    if not ky and not kx:
+        return grid
+    padded = np.pad(grid, ((ky, ky), (kx, kx)))
+    result = np.zeros_like(grid)
+    rows, cols = grid.shape
+    for dy in range(-ky, ky + 1):
+        for dx in range(-kx, kx + 1):
+            if (dy / max(ky, 1)) ** 2 + (dx / max(kx, 1)) ** 2 <= 1:
+                result |= padded[ky + dy:ky + dy + rows, kx + dx:kx + dx + cols]
+    return result
+
+
+class LandMask:
+    """Bitmap of cells inside the country, with fast point and box queries"""
+
+    def __init__(self, grid, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION):
+        self.grid = np.asarray(grid, dtype=bool)
+        self.bounds = tuple(bounds)
+        self.resolution = resolution
+        # Summed-area table for "any land inside this box" queries
+        self._sums = np.pad(self.grid.cumsum(0, dtype=np.int64).cumsum(1), ((1, 0), (1, 0)))
+
+    @classmethod
+    def build(cls, rings=None, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION,
+              margin_km=DEFAULT_MARGIN_KM):
+        rings = boundary_rings() if rings is None else rings
+        grid = rasterize(rings, bounds, resolution)
+        return cls(dilate(grid, margin_km, resolution, (bounds[0] + bounds[1]) / 2), bounds, resolution)
+
+    def _cells(self, lats, lons):
+        min_lat, _, min_lon, _ = self.bounds
+        rows = np.floor((np.asarray(lats, dtype=float) - min_lat) / self.resolution).astype(np.int64)
+        cols = np.floor((np.asarray(lons, dtype=float) - min_lon) / self.resolution).astype(np.int64)
+        return rows, cols
+
+    def contains(self, lats, lons):
+        """Bool array: which points fall on (dilated) land; outside the raster is False"""
+        rows, cols = self._cells(lats, lons)
+        inside = (rows >= 0) & (rows < self.grid.shape[0]) & (cols >= 0) & (cols < self.grid.shape[1])
+        result = np.zeros(rows.shape, dtype=bool)
+        result[inside] = self.grid[rows[inside], cols[inside]]
+        return result
+
+    def any_in_boxes(self, boxes):
+        """For [min_lon, min_lat, max_lon, max_lat] rows, whether any land cell overlaps"""
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        n_rows, n_cols = self.grid.shape
+        r0, c0 = self._cells(boxes[:, 1], boxes[:, 0])
+        r1, c1 = self._cells(boxes[:, 3], boxes[:, 2])
+        r0, r1 = np.clip(r0, 0, n_rows), np.clip(r1 + 1, 0, n_rows)
+        c0, c1 = np.clip(c0, 0, n_cols), np.clip(c1 + 1, 0, n_cols)
+        s = self._sums
+        return (s[r1, c1] - s[r0, c1] - s[r1, c0] + s[r0, c0]) > 0
+
+    def feature_mask(self, features):
+        """Bool array: which features have at least one vertex on land"""
+        if isinstance(features, FeatureStore):
+            coords = features.coords.view()
+            if not len(coords):
+                return np.zeros(len(features), dtype=bool)
+            on_land = self.contains(coords[:, 1], coords[:, 0])
+            # Vertex range of every feature via its first part/ring offsets
+            starts = features.ring_offsets.view()[
+                features.part_offsets.view()[features.feature_offsets.view()[:-1]]]
+            counts = np.diff(np.append(starts, len(coords)))
+            keep = np.zeros(len(features), dtype=bool)
+            has = counts > 0
+            keep[has] = np.logical_or.reduceat(on_land, starts[has])
+            return keep
+        keep = []
+        for feature in features:
+            coords = [np.asarray(ring, dtype=float)[:, :2]
+                      for rings in polygon_parts(feature.get('geometry')) for ring in rings]
+            points = np.concatenate(coords) if coords else np.empty((0, 2))
+            keep.append(bool(self.contains(points[:, 1], points[:, 0]).any()))
+        return np.array(keep, dtype=bool)
+
+    def filter_features(self, features):
+        """Drop zones lying entirely outside the country"""
+        keep = self.feature_mask(features)
+        metrics.count("zones_outside_country", int((~keep).sum()))
+        if isinstance(features, FeatureStore):
+            return features.take(np.flatnonzero(keep))
+        return [f for f, k in zip(features, keep) if k]
+
+    def save(self, path, key=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        meta = {"bounds": self.bounds, "resolution": self.resolution,
+                "shape": self.grid.shape, "key": key}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, bits=np.packbits(self.grid), meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path):
+        """Return (mask, build key) from a file written by :meth:`save`"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            count = meta['shape'][0] * meta['shape'][1]
+            grid = np.unpackbits(data['bits'], count=count).astype(bool).reshape(meta['shape'])
+        return cls(grid, meta['bounds'], meta['resolution']), meta.get('key')
+
+
+def mask_key(boundary_path, bounds, resolution, margin_km):
+    """Identifies the inputs a cached mask was built from"""
+    if boundary_path:
+        with open(boundary_path, 'rb') as f:
+            source = hashlib.sha1(f.read()).hexdigest()
+    else:
+        source = hashlib.sha1(json.dumps(INDIA_OUTLINE).encode()).hexdigest()
+    return f"{source}:{list(bounds)}:{resolution}:{margin_km}"
+
+
+def load_or_build(path, boundary_path=None, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION,
+                  margin_km=DEFAULT_MARGIN_KM):
+    """Load the cached mask at ``path``, rebuilding it when its inputs changed"""
+    key = mask_key(boundary_path, bounds, resolution, margin_km)
+    if os.path.exists(path):
+        try:
+            mask, cached_key = LandMask.load(path)
+            if cached_key == key:
+                return mask
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Rebuilding land mask ({e})")
+    mask = LandMask.build(boundary_rings(boundary_path), bounds, resolution, margin_km)
+    mask.save(path, key)
+    return mask
+
+
+# data/ next to the geofencing package, whatever the working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data", "india_land_mask.npz")
+
+_default_mask = None
+
+
+def default_mask():
+    """Process-wide mask cached at $LAND_MASK (default DEFAULT_PATH); None if disabled
+
+    $INDIA_BOUNDARY may name a boundary GeoJSON to rasterize instead of the
+    built-in outline.
+    """
+    global _default_mask
+    path = os.environ.get("LAND_MASK", DEFAULT_PATH)
+    if not path:
+        return None
+    if _default_mask is None:
+        _default_mask = load_or_build(path, os.environ.get("INDIA_BOUNDARY"))
+    return _default_mask
@@ -0,0 +1,261 @@
+"""Merge every generated dataset into one deduplicated dataset with a normalized schema
+
+    python -m geofencing.merge [--min-overlap 0.25] [--precision 4]
+
+The generators overlap: the same city weather, flood or mountain pass can
+show up in several datasets under different risk names and shapes. Zones
+are normalized first (risk aliases, severity, name, location) and then
+deduplicated in two passes:
+
+- exact: zones whose geometry (rounded to ``precision`` decimals) and
+  properties other than source and timestamp hash the same are kept once;
+- near: zones of the same risk from *different* datasets are merged when
+  their intersection covers at least ``min_overlap`` of the smaller one.
+  Zones of one dataset are never merged with each other, since a
+  generator emits distinct zones on purpose.
+
+Merged zones get the union of the member geometries, the worst severity,
+the latest timestamp and the names, sources and datasets of all members.
+"""
+import argparse
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from .delta import content_hash, describe_delta, write_incremental
+from .dissolve import unique
+from .index import DATASETS, DEFAULT_DATA_DIR, UNIFIED_DATASET, load_feature_collection
+from .metrics import metrics
+from .properties import SEVERITY_RANK, max_severity
+
+try:
+    import shapely
+    from shapely.geometry import mapping, shape
+except ImportError:  # optional; without it only exact duplicates are removed
+    shapely = None
+
+DEFAULT_PRECISION = 4
+DEFAULT_MIN_OVERLAP = 0.25
+
+# Risk names the generators use for the same hazard
+RISK_ALIASES = {
+    "mountain_hazard": "elevation_hazard",
+    "elevation": "elevation_hazard",
+    "disaster_alert": "natural_disaster",
+}
+
+# Where a zone came from, as opposed to what it is; left out of the content hash
+PROVENANCE_PROPERTIES = frozenset({"datasets", "sources", "names", "merged_count"})
+# Also left out of the exact-duplicate key, so a zone reported by several
+# datasets or refreshed at a different time still hashes the same (merging
+# keeps every source and the latest timestamp)
+DEDUP_IGNORED_PROPERTIES = PROVENANCE_PROPERTIES | {"source", "timestamp"}
+
+
+def normalize_properties(props, dataset):
+    """Canonical properties of a zone from ``dataset``
+
+    Risk names are lower snake case with aliases resolved, unknown
+    severities are dropped, ``location`` is filled from city/state and
+    every zone has a name and source. Other properties pass through.
+    """
+    props = {k: v for k, v in props.items() if v is not None}
+    risk = str(props.get('risk') or 'unknown').strip().lower().replace(' ', '_').replace('-', '_')
+    props['risk'] = RISK_ALIASES.get(risk, risk)
+    severity = str(props.pop('severity', '')).strip().lower()
+    if severity in SEVERITY_RANK:
+        props['severity'] = severity
+    location = props.get('location') or props.get('city') or props.get('state')
+    if location:
+        props['location'] = location
+    if not props.get('name'):
+        props['name'] = props['risk'].replace('_', ' ').capitalize() + (f" - {location}" if location else "")
+    props.setdefault('source', dataset)
+    props['datasets'] = [dataset]
+    props['sources'] = [props['source']]
+    props['merged_count'] = 1
+    return props
+
+
+def merge_properties(members):
+    """Properties of one zone reported several times (``members`` in priority order)"""
+    merged = {}
+    for props in members:
+        for key, value in props.items():
+            if key not in PROVENANCE_PROPERTIES:
+                merged.setdefault(key, value)
+    severity = max_severity(p.get('severity') for p in members)
+    if severity:
+        merged['severity'] = severity
+    timestamps = [str(p['timestamp']) for p in members if p.get('timestamp')]
+    if timestamps:
+        merged['timestamp'] = max(timestamps)
+    merged['names'] = unique(name for p in members for name in p.get('names', [p.get('name')]))
+    merged['datasets'] = unique(d for p in members for d in p['datasets'])
+    merged['sources'] = unique(s for p in members for s in p['sources'])
+    merged['merged_count'] = sum(p['merged_count'] for p in members)
+    return merged
+
+
+def _overlap_clusters(geometries, properties, min_overlap):
+    """Group zones of one risk from different datasets that cover each other
+
+    Candidate pairs come from an STRtree and are merged greedily, best
+    coverage first, while a cluster holds at most one zone per dataset.
+    Returns clusters as lists of zone indices in priority order.
+    """
+    areas = shapely.area(geometries)
+    left, right = shapely.STRtree(geometries).query(geometries, predicate='intersects')
+    risks = np.array([p['risk'] for p in properties], dtype=object)
+    keep = (left < right) & (risks[left] == risks[right])
+    left, right = left[keep], right[keep]
+    overlap = shapely.area(shapely.intersection(geometries[left], geometries[right]))
+    smaller = np.minimum(areas[left], areas[right])
+    coverage = np.divide(overlap, smaller, out=np.zeros_like(overlap), where=smaller > 0)
+    iou = overlap / np.maximum(areas[left] + areas[right] - overlap, 1e-18)
+    keep = coverage >= min_overlap
+    left, right = left[keep], right[keep]
+    order = np.lexsort((-iou[keep], -coverage[keep]))
+
+    parent = list(range(len(geometries)))
+    datasets = [set(p['datasets']) for p in properties]
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(left[order].tolist(), right[order].tolist()):
+        a, b = root(i), root(j)
+        if a == b or datasets[a] & datasets[b]:
+            continue
+        a, b = min(a, b), max(a, b)
+        parent[b] = a
+        datasets[a] |= datasets[b]
+
+    clusters = OrderedDict()
+    for i in range(len(geometries)):
+        clusters.setdefault(root(i), []).append(i)
+    return list(clusters.values())
+
+
+@metrics.timed("merge")
+def merge_features(datasets, precision=DEFAULT_PRECISION, min_overlap=DEFAULT_MIN_OVERLAP):
+    """Merge ``{dataset: features}`` (in priority order) into one deduplicated feature list
+
+    ``min_overlap`` above 1 turns the near-duplicate pass off.
+    """
+    groups = OrderedDict()
+    for dataset, features in datasets.items():
+        for feature in features:
+            if not feature.get('geometry'):
+                continue
+            props = normalize_properties(feature.get('properties') or {}, dataset)
+            key = content_hash({"geometry": feature['geometry'], "properties": {
+                k: v for k, v in props.items() if k not in DEDUP_IGNORED_PROPERTIES}}, precision)
+            groups.setdefault(key, []).append((feature['geometry'], props))
+    zones = [(members[0][0], merge_properties([p for _, p in members]) if len(members) > 1 else members[0][1])
+             for members in groups.values()]
+    metrics.count("exact_duplicates", sum(len(m) - 1 for m in groups.values()))
+
+    if shapely is None or min_overlap > 1 or not zones:
+        if shapely is None:
+            print("⚠️ shapely not installed; only exact duplicates are merged")
+        return [{"type": "Feature", "geometry": g, "properties": p} for g, p in zones]
+
+    geometries = shapely.make_valid(np.array([shape(g) for g, _ in zones], dtype=object))
+    properties = [p for _, p in zones]
+    merged = []
+    for cluster in _overlap_clusters(geometries, properties, min_overlap):
+        if len(cluster) == 1:
+            geometry, props = zones[cluster[0]]
+        else:
+            geometry = mapping(shapely.union_all(geometries[cluster]))
+            props = merge_properties([properties[i] for i in cluster])
+        merged.append({"type": "Feature", "geometry": geometry, "properties": props})
+    metrics.count("near_duplicates", len(zones) - len(merged))
+    return merged
+
+
+def load_datasets(data_dir=DEFAULT_DATA_DIR, names=DATASETS):
+    """``{dataset: features}`` for every generated dataset present in ``data_dir``"""
+    datasets = OrderedDict()
+    for name in names:
+        path = os.path.join(data_dir, f"{name}.json")
+        if os.path.exists(path):
+            datasets[name] = load_feature_collection(path).get('features', [])
+    return datasets
+
+
+def write_unified(datasets, data_dir=DEFAULT_DATA_DIR, precision=DEFAULT_PRECISION,
+                  min_overlap=DEFAULT_MIN_OVERLAP):
+    """Merge ``datasets`` and write the unified dataset; returns (features, version, delta)
+
+    Written through :func:`~geofencing.delta.write_incremental` with the
+    columnar export, so zones get stable IDs and a bbox-indexed binary
+    file sits next to the GeoJSON.
+    """
+    features = merge_features(datasets, precision, min_overlap)
+    metadata = {
+        "generated_at": datetime.now().isoformat(),
+        "total_features": len(features),
+        "input_features": sum(len(f) for f in datasets.values()),
+        "datasets": list(datasets),
+        "dedup": {"precision": precision, "min_overlap": min_overlap},
+        "risk_categories": sorted({f['properties']['risk'] for f in features}),
+    }
+    version, delta = write_incremental(os.path.join(data_dir, f"{UNIFIED_DATASET}.json"),
+                                       features, metadata=metadata, columnar=True)
+    return features, version, delta
+
+
+class DatasetMerger:
+    """Scheduler listener rewriting the unified dataset whenever a generated one changes
+
+    Datasets the scheduler just wrote are taken from memory; the others
+    are read from ``data_dir``.
+    """
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, **options):
+        self.data_dir = data_dir
+        self.options = options
+
+    def update(self, dataset, version, features, metadata=None):
+        if dataset not in DATASETS:
+            return None
+        datasets = load_datasets(self.data_dir)
+        datasets[dataset] = features
+        datasets = OrderedDict((name, datasets[name]) for name in DATASETS if name in datasets)
+        merged, version, delta = write_unified(datasets, self.data_dir, **self.options)
+        print(f"🧩 {UNIFIED_DATASET}: {len(merged)} zones. {describe_delta(version, delta)}")
+        return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the generated geofence datasets into one")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help="coordinate decimals compared by the exact-duplicate hash")
+    parser.add_argument("--min-overlap", type=float, default=DEFAULT_MIN_OVERLAP,
+                        help="share of the smaller zone two zones must overlap to be merged (>1 disables)")
+    args = parser.parse_args()
+
+    datasets = load_datasets(args.data_dir)
+    if not datasets:
+        print(f"❌ No generated datasets found in {args.data_dir}")
+        return
+    started = time.perf_counter()
+    features, version, delta = write_unified(datasets, args.data_dir, args.precision, args.min_overlap)
+    total = sum(len(f) for f in datasets.values())
+    print(f"🧩 Merged {total} zones from {len(datasets)} datasets into {len(features)} "
+          f"in {time.perf_counter() - started:.2f}s")
+    print(describe_delta(version, delta))
+    print(f"📁 Saved to: {os.path.join(args.data_dir, UNIFIED_DATASET + '.json')}")
+
+
+if __name__ == "__main__":
+    main()
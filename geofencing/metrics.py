@@ -0,0 +1,215 @@
+"""Per-stage timing, counters and memory metrics for generator runs"""
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# METRICS=0 turns recording off; METRICS_PROMETHEUS=1 also prints the
+# Prometheus text exposition to stdout whenever a report is written
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_PROMETHEUS = os.environ.get("METRICS_PROMETHEUS") == "1"
+PROMETHEUS_PREFIX = "geofence"
+
+_DISABLED_STAGE = contextlib.nullcontext()
+
+
+def metrics_path(path):
+    """Path of the metrics JSON written next to a GeoJSON output file"""
+    root, _ = os.path.splitext(path)
+    return root + '.metrics.json'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def _key(name, labels):
+    # Label values are text (as in Prometheus), so an int status and "error"
+    # under the same label still sort together
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items()))) if labels else (name, ())
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in labels)
+    return "{" + body + "}"
+
+
+class _Stage:
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics._count((self.key[0] + "_errors", self.key[1]), 1)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of stage timings, counters and gauges
+
+    Names take optional labels (``source="weather"``) that become Prometheus
+    labels. When disabled every call returns immediately and stage() hands
+    back a shared no-op context manager, so instrumentation can stay in
+    place in production.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = datetime.now().isoformat()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name, **labels):
+        """Context manager timing the enclosed block (errors are counted too)"""
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _Stage(self, _key(name, labels))
+
+    def timed(self, name):
+        """Decorator recording every call of a function as stage ``name``"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Stage(self, (name, ())):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration measured elsewhere (e.g. a source's elapsed time)"""
+        if self.enabled:
+            self._observe(_key(name, labels), seconds)
+
+    def count(self, name, value=1, **labels):
+        if self.enabled:
+            self._count(_key(name, labels), value)
+
+    def gauge(self, name, value, **labels):
+        if self.enabled:
+            with self._lock:
+                self.gauges[_key(name, labels)] = value
+
+    def _observe(self, key, seconds):
+        with self._lock:
+            stats = self.stages.get(key)
+            if stats is None:
+                self.stages[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def _count(self, key, value):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def cache_hit_rates(self):
+        """Hit rate per ``*_cache`` counter with a ``result`` label"""
+        totals = {}
+        with self._lock:
+            for (name, labels), value in self.counters.items():
+                if not name.endswith("_cache"):
+                    continue
+                result = dict(labels).get("result")
+                hits, total = totals.get(name, (0, 0))
+                totals[name] = (hits + (value if result == "hit" else 0), total + value)
+        return {name: round(hits / total, 4) for name, (hits, total) in totals.items() if total}
+
+    def snapshot(self):
+        with self._lock:
+            stages = [
+                {"name": name, "labels": dict(labels), "count": count,
+                 "total_seconds": round(total, 6), "max_seconds": round(slowest, 6)}
+                for (name, labels), (count, total, slowest) in self.stages.items()
+            ]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self.counters.items()]
+            gauges = [{"name": name, "labels": dict(labels), "value": value}
+                      for (name, labels), value in self.gauges.items()]
+        return {
+            "started_at": self.started_at,
+            "generated_at": datetime.now().isoformat(),
+            "peak_rss_mb": peak_rss_mb(),
+            "cache_hit_rates": self.cache_hit_rates(),
+            "stages": stages,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def prometheus(self):
+        """Render everything in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+
+        def family(name, kind, samples):
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f"{metric}{_label_text(labels)} {value}" for labels, value in samples)
+
+        if stages:
+            family("stage_seconds_total", "counter",
+                   [((("stage", n),) + l, round(s[1], 6)) for (n, l), s in stages])
+            family("stage_runs_total", "counter",
+                   [((("stage", n),) + l, s[0]) for (n, l), s in stages])
+        for name in sorted({n for (n, _), _ in counters}):
+            family(f"{name}_total", "counter", [(l, v) for (n, l), v in counters if n == name])
+        for name in sorted({n for (n, _), _ in gauges}):
+            family(name, "gauge", [(l, v) for (n, l), v in gauges if n == name])
+        rss = peak_rss_mb()
+        if rss is not None:
+            family("peak_rss_mb", "gauge", [((), rss)])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the snapshot as JSON; returns the path, or None when disabled"""
+        if not self.enabled:
+            return None
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def report(self, output_path):
+        """Write metrics next to ``output_path`` and optionally print Prometheus text"""
+        path = self.write(metrics_path(output_path))
+        if path and METRICS_PROMETHEUS:
+            print(self.prometheus(), end="")
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.gauges.clear()
+        self.started_at = datetime.now().isoformat()
+
+
+# Process-wide registry used by the geofencing modules and scripts
+metrics = Metrics()
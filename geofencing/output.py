@@ -0,0 +1,185 @@
+"""Streaming GeoJSON output shared by the generator scripts"""
+import contextlib
+import gzip
+import json
+import os
+
+from .columnar import ColumnarWriter
+
+try:
+    import orjson
+except ImportError:  # optional fast serializer
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional compressed companion format
+    brotli = None
+
+
+def quantize(coords, precision):
+    """Round a nested GeoJSON coordinate array to ``precision`` decimal floats
+
+    Integers come out as floats too, so 72 and 72.0 hash and compare alike.
+    """
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(float(c), precision) for c in coords]
+    return [quantize(c, precision) for c in coords]
+
+
+def quantize_feature(feature, precision):
+    """Return ``feature`` with its geometry coordinates rounded (a shallow copy)"""
+    geometry = feature.get('geometry')
+    if not geometry or 'coordinates' not in geometry:
+        return feature
+    return dict(feature, geometry=dict(
+        geometry, coordinates=quantize(geometry['coordinates'], precision)))
+
+
+def json_dumps(obj, compact):
+    """UTF-8 JSON bytes of ``obj``, minified (with orjson when installed) if ``compact``"""
+    if compact and orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    separators = (',', ':') if compact else (', ', ': ')
+    return json.dumps(obj, separators=separators, ensure_ascii=False).encode('utf-8')
+
+
+class _BrotliFile:
+    """Minimal file-like wrapper around a streaming brotli compressor"""
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._compressor = brotli.Compressor(quality=9)
+
+    def write(self, data):
+        self._file.write(self._compressor.process(data))
+
+    def close(self):
+        self._file.write(self._compressor.finish())
+        self._file.close()
+
+
+class GeoJSONWriter:
+    """Write a FeatureCollection one feature at a time
+
+    Features are serialized as they arrive, so memory stays flat regardless
+    of feature count. Compact mode drops whitespace and rounds coordinates
+    (6 decimals ≈ 10 cm). ``compress`` adds a ``.gz`` and/or ``.br``
+    companion file written in the same pass. Metadata is emitted after the
+    features so it can include the final count. Every file is written to a
+    ``.tmp`` sibling and moved into place on close, so readers never see a
+    truncated file; abort() drops the temporary files instead.
+    """
+
+    def __init__(self, path, metadata=None, compact=True, precision=6, compress=("gzip",)):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.metadata = metadata
+        self.compact = compact
+        self.precision = precision if compact else None
+        self.count = 0
+        self.bytes_written = 0
+        self._paths = [path]
+        self._streams = [open(path + '.tmp', 'wb')]
+        if isinstance(compress, str):
+            compress = (compress,)
+        for kind in compress or ():
+            if kind == 'gzip':
+                self._paths.append(path + '.gz')
+                self._streams.append(gzip.open(path + '.gz.tmp', 'wb', compresslevel=6))
+            elif kind == 'brotli' and brotli is not None:
+                self._paths.append(path + '.br')
+                self._streams.append(_BrotliFile(path + '.br.tmp'))
+            elif kind != 'brotli':
+                self.abort()
+                raise ValueError(f"Unknown compression: {kind}")
+        self._emit(b'{"type":"FeatureCollection","features":[' if compact
+                   else b'{"type": "FeatureCollection", "features": [\n')
+
+    def _emit(self, data):
+        self.bytes_written += len(data)
+        for stream in self._streams:
+            stream.write(data)
+
+    def write(self, feature):
+        if not isinstance(feature, dict):
+            # FeatureStore views become plain dicts only here
+            feature = dict(feature)
+        if self.precision is not None:
+            feature = quantize_feature(feature, self.precision)
+        separator = b'' if not self.count else (b',' if self.compact else b',\n')
+        self._emit(separator + json_dumps(feature, self.compact))
+        self.count += 1
+
+    def write_all(self, features):
+        for feature in features:
+            self.write(feature)
+        return self
+
+    def close(self):
+        if not self._streams:
+            return
+        tail = b']' if self.compact else b'\n]'
+        if self.metadata is not None:
+            metadata = self.metadata(self) if callable(self.metadata) else self.metadata
+            tail += (b',"metadata":' if self.compact else b',\n"metadata": ') + json_dumps(metadata, self.compact)
+        self._emit(tail + b'}' + (b'' if self.compact else b'\n'))
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+        for path in self._paths:
+            os.replace(path + '.tmp', path)
+
+    def abort(self):
+        """Discard everything written so far, leaving existing files untouched"""
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+        for path in self._paths:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def columnar_path(path):
+    """Path of the binary columnar export written next to a GeoJSON file"""
+    root, _ = os.path.splitext(path)
+    return root + '.bin'
+
+
+def open_writers(path, metadata=None, columnar=False, **options):
+    """GeoJSON writer for ``path`` plus, with ``columnar=True``, the columnar one next to it"""
+    writers = [GeoJSONWriter(path, metadata=metadata, **options)]
+    if columnar:
+        writers.append(ColumnarWriter(columnar_path(path), metadata=metadata))
+    return writers
+
+
+def write_feature_collection(path, features, metadata=None, columnar=False, **options):
+    """Stream ``features`` (any iterable) to ``path`` and return the feature count
+
+    With ``columnar=True`` the same features also go to a binary columnar
+    file (see :mod:`geofencing.columnar`) next to the GeoJSON.
+    """
+    writers = open_writers(path, metadata=metadata, columnar=columnar, **options)
+    try:
+        for feature in features:
+            for writer in writers:
+                writer.write(feature)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    for writer in writers:
+        writer.close()
+    return writers[0].count
@@ -0,0 +1,15 @@
+"""Pluggable hazard-source pipeline shared by all geofence datasets"""
+from .base import SOURCES, GeneratorSource, HazardSource, register_source
+from .scheduler import OutputStage, Scheduler
+from .server import GeofenceServer
+from . import sources  # noqa: F401  registers the built-in plugins
+
+__all__ = [
+    "GeneratorSource",
+    "GeofenceServer",
+    "HazardSource",
+    "OutputStage",
+    "SOURCES",
+    "Scheduler",
+    "register_source",
+]
@@ -0,0 +1,50 @@
+"""Build every geofence dataset in one process: python -m geofencing.pipeline"""
+import argparse
+import os
+
+from ..merge import DatasetMerger
+from .base import SOURCES
+from .scheduler import DEFAULT_DATA_DIR, OutputStage, Scheduler
+from .server import DEFAULT_HOST, DEFAULT_PORT, GeofenceServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", action="append", choices=list(SOURCES),
+                        help="only run these sources (repeatable)")
+    parser.add_argument("--skip", action="append", default=[], choices=list(SOURCES),
+                        help="leave these sources out (e.g. the slow elevation scan)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--dissolve", action="store_true", default=os.environ.get("DISSOLVE") == "1")
+    parser.add_argument("--merge", action="store_true",
+                        help="also keep the deduplicated unified_geofences.json up to date")
+    parser.add_argument("--forever", action="store_true",
+                        help="keep running, refreshing each source on its own interval")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep refreshing and serve the datasets over HTTP from memory")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    names = [name for name in (args.source or SOURCES) if name not in args.skip]
+    scheduler = Scheduler(
+        sources=[SOURCES[name]() for name in names],
+        output=OutputStage(args.data_dir, dissolve=args.dissolve)
+    )
+    if args.merge:
+        scheduler.listeners.append(DatasetMerger(args.data_dir).update)
+    print(f"🚀 Running {len(names)} hazard sources: {', '.join(names)}")
+    if args.serve:
+        server = GeofenceServer(scheduler, host=args.host, port=args.port)
+        print(f"📂 Loaded {server.load_snapshots()} datasets from {args.data_dir}")
+        server.refresh_in_background()
+        print(f"🌐 Serving geofences at {server.address}/geofences")
+        server.serve_forever()
+    elif args.forever:
+        scheduler.run_forever()
+    else:
+        scheduler.run_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Hazard source plugin interface and registry"""
+import importlib
+
+from ..properties import RISK_TTL_SECONDS
+from ..store import FeatureStore
+
+# name -> HazardSource subclass, in registration order
+SOURCES = {}
+
+
+def register_source(cls):
+    """Class decorator adding a HazardSource plugin to the registry"""
+    if not cls.name or not cls.dataset:
+        raise ValueError(f"{cls.__name__} must define name and dataset")
+    if cls.name in SOURCES:
+        raise ValueError(f"Duplicate hazard source: {cls.name}")
+    SOURCES[cls.name] = cls
+    return cls
+
+
+class HazardSource:
+    """A plugin producing the features of one hazard type
+
+    ``collect`` returns (or yields) GeoJSON features. It may instead be an
+    ``async def collect(self, client)`` taking the shared HTTP client.
+    """
+
+    name = None
+    # Output dataset (file stem under the data directory) the features go to
+    dataset = None
+    # Seconds between refreshes when the scheduler runs continuously
+    refresh_interval = 300
+    # Seconds a single collect() may take before its results are dropped
+    deadline = 30
+
+    def collect(self):
+        raise NotImplementedError
+
+
+class GeneratorSource(HazardSource):
+    """Adapter running one fetch method of an existing generator class
+
+    ``generator`` is a ``"module:Class"`` path, imported lazily so the
+    generator scripts can themselves import :mod:`geofencing`. The instance
+    is created on first use and kept for later refreshes, with its zone
+    buffer swapped for an empty store before each run.
+    """
+
+    generator = None
+    method = None
+
+    def __init__(self):
+        self._instance = None
+
+    def make_generator(self):
+        module_name, class_name = self.generator.split(':')
+        return getattr(importlib.import_module(module_name), class_name)()
+
+    def resident_generator(self):
+        """The kept generator instance, with an empty zone buffer"""
+        if self._instance is None:
+            self._instance = self.make_generator()
+        self._instance.features = FeatureStore(ttls=RISK_TTL_SECONDS)
+        return self._instance
+
+    def collect(self):
+        generator = self.resident_generator()
+        getattr(generator, self.method)()
+        return generator.features
@@ -0,0 +1,228 @@
+"""Scheduler running hazard source plugins into one shared output stage"""
+import concurrent.futures
+import os
+import queue
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from ..delta import describe_delta, write_incremental
+from ..dissolve import dissolve_features
+from ..fetch import SourceResult, fetch_sources
+from ..http_cache import default_cache
+from ..landmask import default_mask
+from ..metrics import metrics
+from ..properties import RISK_TTL_SECONDS
+from ..simplify import DEFAULT_TOLERANCE_M, simplify_features
+from ..store import FeatureStore
+from .base import SOURCES
+
+DEFAULT_DATA_DIR = "SIH MVP/src/data"
+
+
+class OutputStage:
+    """Post-process and stream each dataset through the shared writers"""
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, dissolve=False,
+                 simplify_tolerance_m=DEFAULT_TOLERANCE_M, columnar=True):
+        self.data_dir = data_dir
+        self.dissolve = dissolve
+        self.simplify_tolerance_m = simplify_tolerance_m
+        self.columnar = columnar
+
+    def path(self, dataset):
+        return os.path.join(self.data_dir, f"{dataset}.json")
+
+    def prepare(self, features):
+        """Drop out-of-country zones, then dissolve and simplify as configured
+
+        Only dissolved outlines are simplified; the sources' circles are
+        already sized by their chord-error budget.
+        """
+        mask = default_mask()
+        if mask is not None:
+            kept = mask.filter_features(features)
+            if len(kept) < len(features):
+                print(f"🗺️ Land mask: dropped {len(features) - len(kept)} zones outside India")
+            features = kept
+        if self.dissolve:
+            features = dissolve_features(features)
+            features = simplify_features(features, tolerance_m=self.simplify_tolerance_m)
+        return features
+
+    def write(self, dataset, features, sources):
+        """Write already prepared ``features`` as ``dataset``; returns (version, delta)"""
+        metadata = {
+            "generated_at": datetime.now().isoformat(),
+            "total_features": len(features),
+            "sources": list(sources),
+            "dissolved": self.dissolve,
+            "risk_categories": sorted(Counter(
+                (f.get('properties') or {}).get('risk', 'unknown') for f in features)),
+        }
+        return write_incremental(self.path(dataset), features, metadata=metadata,
+                                 columnar=self.columnar)
+
+
+class Scheduler:
+    """Run registered sources in parallel, each on its own refresh interval
+
+    Every source runs on its own worker thread, so a slow one (such as the
+    nationwide elevation scan) never holds back the others. The latest
+    features of every source are kept in memory; as soon as a source
+    finishes, the dataset it feeds is rebuilt from those buffers (in
+    registration order) and written once through the output stage, so
+    every feature is generated and serialized a single time. Each callable
+    in ``listeners`` is then called as
+    ``listener(dataset, version, features, metadata)`` with the prepared
+    features, e.g. to serve them from memory.
+
+    Zones of the risk types in ``ttls`` expire that many seconds after
+    their timestamp: each dataset's zones stay in a store with an expiry
+    queue, and a dataset is rewritten as soon as one of its zones runs
+    out, even when its sources are failing or not due yet.
+    """
+
+    def __init__(self, sources=None, output=None, cache=None, ttls=RISK_TTL_SECONDS):
+        if sources is None:
+            sources = [cls() for cls in SOURCES.values()]
+        self.sources = OrderedDict((source.name, source) for source in sources)
+        self.output = output or OutputStage()
+        self.cache = cache if cache is not None else default_cache()
+        self.latest = {name: [] for name in self.sources}
+        self.next_due = {name: 0.0 for name in self.sources}
+        self.errors = {}
+        self.listeners = []
+        self.ttls = ttls
+        # dataset -> FeatureStore of its live zones
+        self.stores = {}
+        # Sources currently running on a worker; their results arrive on _done
+        self.running = set()
+        self._done = queue.Queue()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(self.sources)), thread_name_prefix="source")
+
+    def datasets(self):
+        grouped = OrderedDict()
+        for source in self.sources.values():
+            grouped.setdefault(source.dataset, []).append(source.name)
+        return grouped
+
+    def due(self, now=None):
+        """Sources whose refresh interval has elapsed and that aren't running"""
+        now = time.monotonic() if now is None else now
+        return [name for name, at in self.next_due.items() if at <= now and name not in self.running]
+
+    def start(self, names):
+        """Start each of ``names`` that isn't running yet on its own worker thread"""
+        for name in names:
+            if name in self.running:
+                continue
+            self.running.add(name)
+            self._executor.submit(self._fetch, name)
+
+    def _fetch(self, name):
+        source = self.sources[name]
+        try:
+            result = fetch_sources([(name, source.collect, source.deadline)], cache=self.cache)[0]
+        except Exception as e:
+            result = SourceResult(name, [], str(e) or type(e).__name__)
+        self._done.put(result)
+
+    def _finish(self, result):
+        """Record a finished source's features; returns its dataset name"""
+        source = self.sources[result.name]
+        self.running.discard(result.name)
+        self.next_due[result.name] = time.monotonic() + source.refresh_interval
+        if result.error:
+            # Keep serving the previous features of a failed source
+            self.errors[result.name] = result.error
+            print(f"⚠️ Source {result.name} failed after {result.elapsed:.1f}s: {result.error}")
+        else:
+            self.errors.pop(result.name, None)
+            self.latest[result.name] = result.features
+        return source.dataset
+
+    def _rebuild(self, dataset):
+        """Rebuild ``dataset`` from its sources' latest features and write it"""
+        members = self.datasets()[dataset]
+        store = FeatureStore(ttls=self.ttls)
+        for name in members:
+            store.extend(self.latest[name])
+        self.stores[dataset] = store
+        return self._write(dataset, members)
+
+    def run_once(self, names=None):
+        """Refresh ``names`` (default: every source) and rewrite affected datasets
+
+        Sources run concurrently; each dataset is written as soon as all of
+        its refreshed sources have finished, without waiting for the others.
+        """
+        names = list(self.sources) if names is None else list(names)
+        if not names:
+            return {}
+        pending = Counter(self.sources[name].dataset for name in names)
+        self.start(names)
+        written = {}
+        while pending:
+            dataset = self._finish(self._done.get())
+            pending[dataset] -= 1
+            if not pending[dataset]:
+                del pending[dataset]
+                written[dataset] = self._rebuild(dataset)
+        metrics.report(self.output.path("pipeline"))
+        return written
+
+    def expire(self, now=None):
+        """Rewrite every dataset holding zones whose TTL has passed"""
+        now = time.time() if now is None else now
+        written = {}
+        for dataset, members in self.datasets().items():
+            store = self.stores.get(dataset)
+            if store is not None and store.next_expiry is not None and store.next_expiry <= now:
+                written[dataset] = self._write(dataset, members, now)
+        if written:
+            metrics.report(self.output.path("pipeline"))
+        return written
+
+    def next_expiry(self):
+        """Epoch seconds at which the next zone of any dataset expires, or None"""
+        times = [store.next_expiry for store in self.stores.values() if store.next_expiry is not None]
+        return min(times, default=None)
+
+    def _write(self, dataset, members, now=None):
+        """Drop expired zones, then prepare, write and publish ``dataset``"""
+        expired = self.stores[dataset].expire(now)
+        if expired:
+            metrics.count("expired_zones", expired, dataset=dataset)
+            print(f"⌛ {dataset}: {expired} zones expired")
+        features = self.output.prepare(self.stores[dataset])
+        version, delta = self.output.write(dataset, features, members)
+        print(f"📁 {dataset}: {len(features)} zones. {describe_delta(version, delta)}")
+        for listener in self.listeners:
+            try:
+                listener(dataset, version, features, {"sources": members})
+            except Exception as e:
+                print(f"⚠️ Listener failed for {dataset}: {e}")
+        return version, delta
+
+    def run_forever(self, poll_interval=1.0):
+        """Keep refreshing each source whenever its interval elapses
+
+        A source's dataset is rewritten the moment that source finishes;
+        other sources keep running on their own schedules meanwhile.
+        """
+        while True:
+            self.start(self.due())
+            self.expire()
+            idle = [at for name, at in self.next_due.items() if name not in self.running]
+            wait = min(idle, default=time.monotonic() + 60) - time.monotonic()
+            expiry = self.next_expiry()
+            if expiry is not None:
+                wait = min(wait, expiry - time.time())
+            try:
+                result = self._done.get(timeout=min(max(wait, poll_interval), 60))
+            except queue.Empty:
+                continue
+            self._rebuild(self._finish(result))
+            metrics.report(self.output.path("pipeline"))
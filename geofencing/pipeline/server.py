@@ -0,0 +1,237 @@
+"""Local HTTP service serving the latest geofence datasets from memory"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from ..delta import assign_ids, load_snapshot
+from ..index import polygon_parts
+from ..metrics import metrics
+from ..output import json_dumps, quantize_feature
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+def _feature_bbox(geometry):
+    """[min_lon, min_lat, max_lon, max_lat] of a (Multi)Polygon, NaN if empty"""
+    rings = [np.asarray(ring, dtype=float).reshape(-1, 2)
+             for part in polygon_parts(geometry) for ring in part[:1] if len(ring)]
+    if not rings:
+        return [np.nan] * 4
+    coords = np.concatenate(rings)
+    return [*coords.min(axis=0), *coords.max(axis=0)]
+
+
+def parse_filters(query):
+    """Normalize ``bbox``/``risk``/``severity`` query parameters; raises ValueError"""
+    params = parse_qs(query)
+    filters = {}
+    if params.get('bbox'):
+        bbox = [float(v) for v in params['bbox'][0].split(',')]
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        filters['bbox'] = bbox
+    for name in ('risk', 'severity'):
+        values = sorted({v for raw in params.get(name, []) for v in raw.split(',') if v})
+        if values:
+            filters[name] = values
+    return filters
+
+
+class ServedDataset:
+    """One published dataset version, with every feature pre-encoded
+
+    Features are serialized once at publish time; a request only selects
+    rows with the bbox/risk/severity arrays and joins their bytes.
+    """
+
+    def __init__(self, name, version, features, metadata=None):
+        features = list(assign_ids(features))
+        self.name = name
+        self.version = version
+        self.metadata = dict(metadata or {})
+        self.metadata.setdefault('generated_at', datetime.now().isoformat())
+        self.encoded = [json_dumps(quantize_feature(f, 6), True) for f in features]
+        self.bboxes = np.array([_feature_bbox(f.get('geometry')) for f in features],
+                               dtype=float).reshape(-1, 4)
+        properties = [f.get('properties') or {} for f in features]
+        self.risks = np.array([str(p.get('risk', 'unknown')) for p in properties], dtype=object)
+        self.severities = np.array([str(p.get('severity', '')) for p in properties], dtype=object)
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def select(self, filters):
+        """Indices of the features matching ``filters`` (see :func:`parse_filters`)"""
+        keep = np.ones(len(self), dtype=bool)
+        if 'bbox' in filters:
+            min_lon, min_lat, max_lon, max_lat = filters['bbox']
+            b = self.bboxes
+            keep &= (b[:, 0] <= max_lon) & (b[:, 2] >= min_lon) & (b[:, 1] <= max_lat) & (b[:, 3] >= min_lat)
+        if 'risk' in filters:
+            keep &= np.isin(self.risks, filters['risk'])
+        if 'severity' in filters:
+            keep &= np.isin(self.severities, filters['severity'])
+        return np.flatnonzero(keep)
+
+    def describe(self):
+        return dict(self.metadata, dataset=self.name, version=self.version,
+                    total_features=len(self))
+
+
+class GeofenceServer:
+    """Serve the scheduler's datasets over HTTP while it keeps refreshing them
+
+    Every dataset the scheduler writes is published in memory. Responses
+    carry an ``ETag`` built from the dataset versions and the filters, so
+    a client polling with ``If-None-Match`` gets a 304 until something
+    actually changed, and are gzipped when the client accepts it.
+    """
+
+    def __init__(self, scheduler, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.scheduler = scheduler
+        self.datasets = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        scheduler.listeners.append(self.publish)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.service = self
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def publish(self, dataset, version, features, metadata=None):
+        """Swap in a new version of ``dataset`` (unchanged versions are skipped)"""
+        current = self.datasets.get(dataset)
+        if current is not None and current.version == version:
+            return current
+        with metrics.stage("publish", dataset=dataset):
+            served = ServedDataset(dataset, version, features, metadata)
+        with self._lock:
+            self.datasets = dict(self.datasets, **{dataset: served})
+        return served
+
+    def load_snapshots(self):
+        """Publish the datasets already on disk so clients are served right away"""
+        for dataset, members in self.scheduler.datasets().items():
+            features, metadata = load_snapshot(self.scheduler.output.path(dataset))
+            if features:
+                self.publish(dataset, metadata.get('version', 0), features,
+                             dict(metadata, sources=metadata.get('sources', members)))
+        return len(self.datasets)
+
+    def refresh_in_background(self, poll_interval=1.0):
+        """Run the scheduler loop on a daemon thread"""
+        self._refresher = threading.Thread(target=self.scheduler.run_forever,
+                                           args=(poll_interval,), daemon=True,
+                                           name="geofence-refresh")
+        self._refresher.start()
+        return self._refresher
+
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "GeofenceServer/1.0"
+
+    def log_message(self, format, *args):
+        # Requests are counted in the metrics instead of logged one per line
+        pass
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        service = self.server.service
+        datasets = service.datasets
+        try:
+            if parts == ['healthz']:
+                status = self._send_json({"status": "ok", "datasets": len(datasets),
+                                          "errors": {k: str(v) for k, v in service.scheduler.errors.items()}})
+            elif parts == ['datasets']:
+                status = self._send_json([d.describe() for d in datasets.values()])
+            elif parts and parts[0] == 'geofences' and len(parts) <= 2:
+                selected = list(datasets.values()) if len(parts) == 1 else \
+                    [datasets[parts[1]]] if parts[1] in datasets else None
+                if selected is None:
+                    status = self._send_json({"error": f"unknown dataset {parts[1]}"}, 404)
+                else:
+                    status = self._send_geofences(selected, parse_filters(url.query))
+            else:
+                status = self._send_json({"error": "not found"}, 404)
+        except ValueError as e:
+            status = self._send_json({"error": str(e)}, 400)
+        metrics.count("served_requests", status=status)
+        metrics.observe("serve", time.perf_counter() - started)
+
+    def _send_geofences(self, selected, filters):
+        tag = hashlib.sha1(json.dumps(
+            [[d.name, d.version] for d in selected] + [filters], sort_keys=True
+        ).encode()).hexdigest()[:16]
+        # Weak, since the gzipped and plain bodies share the tag
+        etag = f'W/"{tag}"'
+        if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self._common_headers()
+            self.end_headers()
+            return 304
+
+        chunks, described = [], []
+        for dataset in selected:
+            indices = dataset.select(filters)
+            chunks.extend(dataset.encoded[i] for i in indices)
+            described.append(dict(dataset.describe(), selected_features=len(indices)))
+        metadata = {
+            "total_features": len(chunks),
+            "filters": filters,
+            "datasets": described,
+        }
+        body = (b'{"type":"FeatureCollection","metadata":' + json_dumps(metadata, True)
+                + b',"features":[' + b','.join(chunks) + b']}')
+        return self._send_body(body, etag=etag)
+
+    def _send_json(self, obj, status=200):
+        return self._send_body(json_dumps(obj, True), status=status)
+
+    def _send_body(self, body, status=200, etag=None):
+        gzipped = len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self._common_headers()
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def _common_headers(self):
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
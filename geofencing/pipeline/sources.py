@@ -0,0 +1,126 @@
+"""Built-in hazard source plugins backed by the generator scripts"""
+import importlib
+
+from .base import GeneratorSource, HazardSource, register_source
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+ENHANCED = "enhanced_multi_api_geofence:EnhancedMultiApiGeofence"
+COMPREHENSIVE = "comprehensive_india_geofence:ComprehensiveIndiaGeofence"
+
+
+@register_source
+class WeatherSource(GeneratorSource):
+    name = "weather"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = 10 * MINUTE
+    generator = ENHANCED
+
+    async def collect(self, client):
+        generator = self.resident_generator()
+        await generator.fetch_enhanced_weather_data_async(client)
+        return generator.features
+
+
+@register_source
+class TrafficSource(GeneratorSource):
+    name = "traffic"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = 5 * MINUTE
+    generator = ENHANCED
+    method = "fetch_traffic_incidents"
+
+
+@register_source
+class AirQualitySource(GeneratorSource):
+    name = "air_quality"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = 30 * MINUTE
+    generator = ENHANCED
+    method = "fetch_air_quality_data"
+
+
+@register_source
+class CrowdSource(GeneratorSource):
+    name = "crowd"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = 15 * MINUTE
+    generator = ENHANCED
+    method = "fetch_crowd_density_data"
+
+
+@register_source
+class SafetySource(GeneratorSource):
+    name = "safety"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = DAY
+    generator = ENHANCED
+    method = "fetch_crime_safety_data"
+
+
+@register_source
+class DisasterSource(GeneratorSource):
+    name = "disaster"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = HOUR
+    generator = ENHANCED
+    method = "fetch_natural_disaster_zones"
+
+
+@register_source
+class IndustrialSource(GeneratorSource):
+    name = "industrial"
+    dataset = "enhanced_multi_api_geofences"
+    refresh_interval = DAY
+    generator = ENHANCED
+    method = "fetch_industrial_hazard_zones"
+
+
+@register_source
+class WeatherAlertSource(GeneratorSource):
+    name = "weather_alerts"
+    dataset = "comprehensive_india_geofences"
+    refresh_interval = 10 * MINUTE
+    generator = COMPREHENSIVE
+    method = "fetch_sample_weather_data"
+
+
+@register_source
+class FireSource(GeneratorSource):
+    name = "fire"
+    dataset = "comprehensive_india_geofences"
+    refresh_interval = HOUR
+    generator = COMPREHENSIVE
+    method = "fetch_sample_fire_data"
+
+
+@register_source
+class ElevationHazardSource(GeneratorSource):
+    name = "elevation_hazards"
+    dataset = "comprehensive_india_geofences"
+    refresh_interval = DAY
+    generator = COMPREHENSIVE
+    method = "analyze_elevation_hazards"
+
+
+@register_source
+class DisasterAlertSource(GeneratorSource):
+    name = "disaster_alerts"
+    dataset = "comprehensive_india_geofences"
+    refresh_interval = HOUR
+    generator = COMPREHENSIVE
+    method = "generate_sample_disasters"
+
+
+@register_source
+class ElevationScanSource(HazardSource):
+    name = "elevation"
+    dataset = "india_elevation_geofences"
+    refresh_interval = 30 * DAY
+    # A full scan is slow on the public API; cached re-runs are fast
+    deadline = 2 * HOUR
+
+    def collect(self):
+        return importlib.import_module("generate_elevation_geofences").scan_elevation_features()
@@ -0,0 +1,62 @@
+"""Shared property conventions for generated geofences"""
+import time
+from datetime import datetime
+
+# Severity levels from least to most severe
+SEVERITY_LEVELS = ("low", "medium", "high", "extreme")
+SEVERITY_RANK = {level: rank for rank, level in enumerate(SEVERITY_LEVELS, 1)}
+
+
+def severity_rank(severity):
+    """Return 1-4 for known severities and 0 for missing/unknown ones"""
+    return SEVERITY_RANK.get(severity, 0)
+
+
+def max_severity(severities):
+    """Return the most severe of ``severities`` (None if none are known)"""
+    best = max(severities, key=severity_rank, default=None)
+    return best if severity_rank(best) else None
+
+# Seconds a transient zone stays live after its ``timestamp`` (an explicit
+# ``expires_at`` property wins); other risk types never expire
+RISK_TTL_SECONDS = {
+    "traffic_incident": 2 * 3600,
+    "crowd_density": 6 * 3600,
+    "weather_hazard": 12 * 3600,
+}
+
+
+def parse_epoch(value):
+    """Seconds since the epoch of an ISO timestamp (naive means local time); None if unparseable"""
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def zone_expiry(properties, ttls=RISK_TTL_SECONDS):
+    """Epoch seconds at which a zone with ``properties`` expires, or None if it never does
+
+    The same rule :class:`~geofencing.store.FeatureStore` applies: the
+    earlier of ``timestamp`` plus its risk type's TTL and ``expires_at``.
+    """
+    expiries = []
+    ttl = ttls.get(properties.get('risk'))
+    created = parse_epoch(properties.get('timestamp'))
+    if ttl is not None and created is not None:
+        expiries.append(created + ttl)
+    explicit = parse_epoch(properties.get('expires_at')) if 'expires_at' in properties else None
+    if explicit is not None:
+        expiries.append(explicit)
+    return min(expiries, default=None)
+
+
+def live_features(features, now=None, ttls=RISK_TTL_SECONDS):
+    """The GeoJSON features whose zones have not expired by ``now``"""
+    now = time.time() if now is None else now
+    live = []
+    for feature in features:
+        expiry = zone_expiry(feature.get('properties') or {}, ttls)
+        if expiry is None or expiry > now:
+            live.append(feature)
+    return live
@@ -0,0 +1,143 @@
+"""Multi-resolution (quadtree) elevation scan refining only near the threshold"""
+import math
+import warnings
+
+import numpy as np
+
+from .metrics import metrics
+
+
+class ScanResult:
+    """High-elevation points and whole cells found by :func:`quadtree_scan`
+
+    ``lats``/``lons``/``elevations`` are finest-level samples above the
+    threshold; ``boxes`` holds [min_lon, min_lat, max_lon, max_lat] of
+    coarser cells lying entirely above it, with their highest sample in
+    ``box_elevations``.
+    """
+
+    __slots__ = ("lats", "lons", "elevations", "boxes", "box_elevations", "resolution",
+                 "lookups")
+
+    def __init__(self, lats, lons, elevations, boxes, box_elevations, resolution, lookups):
+        self.lats = lats
+        self.lons = lons
+        self.elevations = elevations
+        self.boxes = boxes
+        self.box_elevations = box_elevations
+        self.resolution = resolution
+        self.lookups = lookups
+
+    def __len__(self):
+        return len(self.lats) + len(self.boxes)
+
+
+def _levels(coarse_step, min_step):
+    """Number of halvings from ``coarse_step`` down to (at most) ``min_step``"""
+    return max(0, math.ceil(math.log2(coarse_step / min_step) - 1e-9))
+
+
+def quadtree_scan(provider, min_lat, max_lat, min_lon, max_lon, threshold,
+                  coarse_step=1.44, min_step=0.09, spread_m=400, mask=None, progress=None):
+    """Sample coarsely, then subdivide only cells that may contain the threshold boundary
+
+    A cell is split into four while it is larger than the target resolution
+    and either its corner and centre samples straddle ``threshold`` or they
+    are rugged (standard deviation above ``spread_m``) with the threshold
+    within two standard deviations of the nearest sample, so a hidden peak
+    or valley could cross it. All samples lie on one lattice with spacing ``coarse_step /
+    2**levels``, so corners shared between cells are looked up once and
+    every level is sent to ``provider`` as a single batched call.
+
+    Cells left whole with every sample above the threshold are returned as
+    boxes. Their neighbours are either also above it or straddle it, so
+    the hazard edge is always traced by finest-level samples, which the
+    caller buffers like the uniform grid scan. The lattice is extended past
+    the bounding box to a whole number of coarse cells.
+
+    With a :class:`~geofencing.landmask.LandMask`, cells without any land
+    are dropped and off-land samples are never looked up; a cell whose
+    samples are all off land but which still contains land is subdivided.
+    ``progress(level, cells, new_lookups, splits)`` is called once per level.
+    """
+    levels = _levels(coarse_step, min_step)
+    unit = coarse_step / 2 ** levels
+    size = 2 ** levels
+    n_lat = math.ceil((max_lat - min_lat) / coarse_step - 1e-9)
+    n_lon = math.ceil((max_lon - min_lon) / coarse_step - 1e-9)
+
+    # Cells as (lattice row, lattice column) of their south-west corner
+    rows, cols = np.meshgrid(np.arange(n_lat) * size, np.arange(n_lon) * size, indexing="ij")
+    cells = np.stack([rows.ravel(), cols.ravel()], axis=1).astype(np.int64)
+    samples = {}
+    lookups = 0
+    points, boxes = {}, []
+
+    def lattice_coords(points):
+        return (np.round(min_lat + points[:, 0] * unit, 6),
+                np.round(min_lon + points[:, 1] * unit, 6))
+
+    for level in range(levels + 1):
+        step = size >> level
+        if mask is not None and len(cells):
+            cells = cells[mask.any_in_boxes(np.column_stack([
+                min_lon + cells[:, 1] * unit, min_lat + cells[:, 0] * unit,
+                min_lon + (cells[:, 1] + step) * unit, min_lat + (cells[:, 0] + step) * unit]))]
+        if not len(cells):
+            break
+        offsets = [(0, 0), (step, 0), (0, step), (step, step)]
+        if step > 1:
+            offsets.append((step // 2, step // 2))
+        corners = (cells[:, None, :] + np.array(offsets)[None, :, :]).reshape(-1, 2)
+
+        keys = [tuple(p) for p in corners.tolist()]
+        missing = sorted({k for k in keys if k not in samples})
+        fetched = 0
+        if missing:
+            lats, lons = lattice_coords(np.array(missing))
+            values = np.full(len(missing), np.nan)
+            wanted = mask.contains(lats, lons) if mask is not None else np.ones(len(missing), bool)
+            if wanted.any():
+                values[wanted] = provider.sample(lats[wanted], lons[wanted])
+            samples.update(zip(missing, values.tolist()))
+            fetched = int(wanted.sum())
+            lookups += fetched
+            metrics.count("elevation_lookups", fetched, scan="quadtree")
+        values = np.array([samples[k] for k in keys]).reshape(len(cells), len(offsets))
+
+        valid = ~np.isnan(values)
+        above = np.any(values > threshold, axis=1)
+        straddles = above & np.any(values <= threshold, axis=1)
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            spread = np.nan_to_num(np.nanstd(values, axis=1))
+            nearest = np.nan_to_num(np.nanmin(np.abs(values - threshold), axis=1), nan=np.inf)
+        rugged = (spread > spread_m) & (nearest < 2 * spread)
+        unknown = ~valid.any(axis=1) if mask is not None else False
+        split = (straddles | rugged | unknown) & (step > 1)
+        if progress:
+            progress(level, len(cells), fetched, int(split.sum()))
+
+        if step > 1:
+            uniform = ~split & above & np.all(~valid | (values > threshold), axis=1)
+            for (row, col), cell_values in zip(cells[uniform].tolist(), values[uniform]):
+                boxes.append((round(min_lon + col * unit, 6), round(min_lat + row * unit, 6),
+                              round(min_lon + (col + step) * unit, 6),
+                              round(min_lat + (row + step) * unit, 6),
+                              float(np.nanmax(cell_values))))
+        else:
+            # Corners are shared between neighbouring cells; keep each once
+            for key, value in zip(keys, values.ravel().tolist()):
+                if value > threshold:
+                    points[key] = value
+
+        half = step // 2
+        parents = cells[split]
+        cells = np.concatenate([parents + np.array(d) for d in ((0, 0), (half, 0), (0, half), (half, half))]) \
+            if len(parents) else parents
+
+    keys = np.array(sorted(points), dtype=np.int64).reshape(-1, 2)
+    lats, lons = lattice_coords(keys)
+    boxes = np.array(boxes, dtype=float).reshape(-1, 5)
+    return ScanResult(lats, lons, np.array([points[tuple(k)] for k in keys.tolist()], dtype=float),
+                      boxes[:, :4], boxes[:, 4], unit, lookups)
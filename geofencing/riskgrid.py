@@ -0,0 +1,272 @@
+"""Rasterized severity/risk-type grid for constant-time risk lookups and heatmap tiles
+
+    python -m geofencing.riskgrid [--resolution 0.01] [--tiles data/tiles/heatmap]
+
+Every zone is scan-line filled onto a lat/lon grid over India. Each cell
+keeps the worst severity rank (0 = no zone, 1 = low ... 4 = extreme) and a
+bitmask of the risk types covering it. The grid is saved as plain .npy
+files that :meth:`RiskGrid.load` memory-maps, so a lookup is one array
+index with no geometry work.
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from .index import load_feature_collection, polygon_parts, zone_paths
+from .landmask import DEFAULT_BOUNDS
+from .metrics import metrics
+from .properties import SEVERITY_LEVELS, severity_rank
+
+DEFAULT_RESOLUTION = 0.01
+DEFAULT_GRID_DIR = "data/risk_grid"
+DEFAULT_TILE_DIR = "data/tiles/heatmap"
+DEFAULT_ZOOMS = (4, 8)
+TILE_SIZE = 256
+
+# Palette index = severity rank: transparent, then low..extreme
+HEATMAP_COLORS = [(0, 0, 0), (250, 204, 21), (249, 115, 22), (220, 38, 38), (127, 29, 29)]
+HEATMAP_ALPHA = [0, 110, 140, 170, 200]
+
+
+def scanline_fill(rings, bounds, resolution, shape):
+    """Even-odd fill of ``rings`` at cell centres, clipped to the grid
+
+    Returns (row0, col0, mask) for the window covering the rings' bbox, or
+    None when it misses the grid. Every row crossing is found at once and
+    the inside spans are filled with a cumulative XOR along each row.
+    """
+    min_lat, _, min_lon, _ = bounds
+    coords = np.concatenate(rings)
+    r0 = max(int(math.floor((coords[:, 1].min() - min_lat) / resolution - 0.5)) + 1, 0)
+    r1 = min(int(math.floor((coords[:, 1].max() - min_lat) / resolution - 0.5)) + 1, shape[0])
+    c0 = max(int(math.floor((coords[:, 0].min() - min_lon) / resolution - 0.5)) + 1, 0)
+    c1 = min(int(math.floor((coords[:, 0].max() - min_lon) / resolution - 0.5)) + 1, shape[1])
+    if r0 >= r1 or c0 >= c1:
+        return None
+
+    x0 = np.concatenate([ring[:-1, 0] for ring in rings])
+    y0 = np.concatenate([ring[:-1, 1] for ring in rings])
+    x1 = np.concatenate([ring[1:, 0] for ring in rings])
+    y1 = np.concatenate([ring[1:, 1] for ring in rings])
+    ys = (min_lat + (np.arange(r0, r1) + 0.5) * resolution)[:, None]
+    crosses = (y0 > ys) != (y1 > ys)
+    rows, edges = np.nonzero(crosses)
+    y = ys[rows, 0]
+    x_at = x0[edges] + (y - y0[edges]) * (x1[edges] - x0[edges]) / (y1[edges] - y0[edges])
+    # A crossing at x flips every cell whose centre lies to its right
+    cols = np.floor((x_at - min_lon) / resolution - 0.5).astype(np.int64) + 1 - c0
+    flips = np.zeros((r1 - r0, c1 - c0 + 1), dtype=np.uint8)
+    np.add.at(flips, (rows, np.clip(cols, 0, c1 - c0)), 1)
+    mask = (np.cumsum(flips, axis=1, dtype=np.uint32) & 1).astype(bool)[:, :-1]
+    return r0, c0, mask
+
+
+def write_png(path, pixels, palette, alpha):
+    """Write an 8-bit palette PNG (``pixels`` are palette indices)"""
+    height, width = pixels.shape
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), pixels.astype(np.uint8)]).tobytes()
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)))
+        f.write(chunk(b'PLTE', bytes(c for color in palette for c in color)))
+        f.write(chunk(b'tRNS', bytes(alpha)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def tile_range(bounds, zoom):
+    """(x0, x1, y0, y1) inclusive XYZ tile range covering ``bounds`` at ``zoom``"""
+    min_lat, max_lat, min_lon, max_lon = bounds
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180) / 360 * n)))
+
+    def tile_y(lat):
+        lat = math.radians(lat)
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)))
+
+    return tile_x(min_lon), tile_x(max_lon), tile_y(max_lat), tile_y(min_lat)
+
+
+def tile_pixel_coords(zoom, x, y, size=TILE_SIZE):
+    """Lat/lon of every pixel centre of an XYZ tile, as (size, size) arrays"""
+    n = 2 ** zoom
+    offsets = (np.arange(size) + 0.5) / size
+    lons = (x + offsets) / n * 360 - 180
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return np.repeat(lats[:, None], size, axis=1), np.repeat(lons[None, :], size, axis=0)
+
+
+class RiskGrid:
+    """Worst severity rank and risk-type bitmask per lat/lon cell
+
+    ``risk_names[i]`` is the risk type of bit ``i`` in :attr:`risks`.
+    """
+
+    def __init__(self, severity, risks, risk_names, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION):
+        self.severity = severity
+        self.risks = risks
+        self.risk_names = list(risk_names)
+        self.bounds = tuple(bounds)
+        self.resolution = resolution
+
+    @classmethod
+    def empty(cls, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION):
+        min_lat, max_lat, min_lon, max_lon = bounds
+        shape = (int(math.ceil((max_lat - min_lat) / resolution - 1e-9)),
+                 int(math.ceil((max_lon - min_lon) / resolution - 1e-9)))
+        return cls(np.zeros(shape, dtype=np.uint8), np.zeros(shape, dtype=np.uint32), [],
+                   bounds, resolution)
+
+    @classmethod
+    def from_features(cls, features, bounds=DEFAULT_BOUNDS, resolution=DEFAULT_RESOLUTION):
+        grid = cls.empty(bounds, resolution)
+        grid.add_features(features)
+        return grid
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        grid = cls.empty(**kwargs)
+        for path in paths:
+            grid.add_features(load_feature_collection(path).get('features', []))
+        return grid
+
+    @property
+    def shape(self):
+        return self.severity.shape
+
+    def risk_bit(self, risk):
+        """Bit value of ``risk``, registering new risk types as they appear"""
+        if risk not in self.risk_names:
+            if len(self.risk_names) >= 32:
+                raise ValueError(f"More than 32 risk types; cannot add {risk!r}")
+            self.risk_names.append(risk)
+        return np.uint32(1 << self.risk_names.index(risk))
+
+    @metrics.timed("rasterize")
+    def add_features(self, features):
+        """Paint every (Multi)Polygon zone onto the grid; returns how many touched it"""
+        painted = 0
+        for feature in features:
+            properties = feature.get('properties') or {}
+            rank = np.uint8(severity_rank(properties.get('severity')))
+            bit = self.risk_bit(properties.get('risk', 'unknown'))
+            touched = False
+            for part in polygon_parts(feature.get('geometry')):
+                rings = [np.asarray(ring, dtype=float)[:, :2] for ring in part if len(ring) >= 3]
+                window = scanline_fill(rings, self.bounds, self.resolution, self.shape) if rings else None
+                if window is None:
+                    continue
+                r0, c0, mask = window
+                rows, cols = slice(r0, r0 + mask.shape[0]), slice(c0, c0 + mask.shape[1])
+                np.maximum(self.severity[rows, cols], mask * rank, out=self.severity[rows, cols])
+                self.risks[rows, cols] |= mask * bit
+                touched = True
+            painted += touched
+        metrics.count("zones_rasterized", painted)
+        return painted
+
+    def _cells(self, lats, lons):
+        min_lat, _, min_lon, _ = self.bounds
+        rows = np.floor((np.asarray(lats, dtype=float) - min_lat) / self.resolution).astype(np.int64)
+        cols = np.floor((np.asarray(lons, dtype=float) - min_lon) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        return rows, cols, inside
+
+    def lookup(self, lats, lons):
+        """(severity rank, risk bitmask) arrays for many points; 0 outside the grid"""
+        rows, cols, inside = self._cells(lats, lons)
+        severity = np.zeros(rows.shape, dtype=np.uint8)
+        risks = np.zeros(rows.shape, dtype=np.uint32)
+        severity[inside] = self.severity[rows[inside], cols[inside]]
+        risks[inside] = self.risks[rows[inside], cols[inside]]
+        return severity, risks
+
+    def severity_at(self, lat, lon):
+        """Worst severity name at a point, or None"""
+        rank = int(self.lookup([lat], [lon])[0][0])
+        return SEVERITY_LEVELS[rank - 1] if rank else None
+
+    def risks_at(self, lat, lon):
+        """Risk types covering a point"""
+        bits = int(self.lookup([lat], [lon])[1][0])
+        return [name for i, name in enumerate(self.risk_names) if bits >> i & 1]
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "severity.npy"), self.severity)
+        np.save(os.path.join(directory, "risks.npy"), self.risks)
+        meta = {"bounds": self.bounds, "resolution": self.resolution, "shape": self.shape,
+                "risk_names": self.risk_names, "severity_levels": SEVERITY_LEVELS}
+        with open(os.path.join(directory, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Open a saved grid; arrays are memory-mapped unless ``mmap_mode`` is None"""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        severity = np.load(os.path.join(directory, "severity.npy"), mmap_mode=mmap_mode)
+        risks = np.load(os.path.join(directory, "risks.npy"), mmap_mode=mmap_mode)
+        return cls(severity, risks, meta['risk_names'], meta['bounds'], meta['resolution'])
+
+    def heatmap_tile(self, zoom, x, y):
+        """Severity ranks sampled at the pixel centres of one XYZ tile"""
+        lats, lons = tile_pixel_coords(zoom, x, y)
+        return self.lookup(lats, lons)[0]
+
+    @metrics.timed("heatmap_tiles")
+    def write_heatmap_tiles(self, directory, zooms=DEFAULT_ZOOMS):
+        """Write ``{z}/{x}/{y}.png`` severity heatmap tiles; tiles without any zone are skipped"""
+        written = 0
+        for zoom in range(zooms[0], zooms[1] + 1):
+            x0, x1, y0, y1 = tile_range(self.bounds, zoom)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    pixels = self.heatmap_tile(zoom, x, y)
+                    if not pixels.any():
+                        continue
+                    path = os.path.join(directory, str(zoom), str(x), f"{y}.png")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    write_png(path, pixels, HEATMAP_COLORS, HEATMAP_ALPHA)
+                    written += 1
+        metrics.count("heatmap_tiles", written)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasterize the generated geofences into a severity grid")
+    parser.add_argument("inputs", nargs="*",
+                        help="FeatureCollection files (default: the unified dataset, else every generated one)")
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION, help="cell size in degrees")
+    parser.add_argument("--output", default=DEFAULT_GRID_DIR, help="directory for the .npy grid")
+    parser.add_argument("--tiles", default=DEFAULT_TILE_DIR, help="heatmap tile directory ('' to skip)")
+    parser.add_argument("--zooms", type=int, nargs=2, default=DEFAULT_ZOOMS, metavar=("MIN", "MAX"))
+    args = parser.parse_args()
+
+    paths = args.inputs or zone_paths()
+    started = time.perf_counter()
+    grid = RiskGrid.from_files(paths, resolution=args.resolution)
+    grid.save(args.output)
+    covered = int(np.count_nonzero(grid.severity))
+    print(f"🧮 Rasterized {len(paths)} datasets onto {grid.shape[0]}x{grid.shape[1]} cells "
+          f"({covered} at risk) in {time.perf_counter() - started:.1f}s")
+    print(f"📁 Saved to: {args.output}")
+    if args.tiles:
+        count = grid.write_heatmap_tiles(args.tiles, args.zooms)
+        print(f"🗺️ {count} heatmap tiles (z{args.zooms[0]}-z{args.zooms[1]}) in {args.tiles}")
+
+
+if __name__ == "__main__":
+    main()
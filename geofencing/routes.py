@@ -0,0 +1,191 @@
+"""Corridor risk of planned routes and recorded GPS trails against generated geofences"""
+import numpy as np
+
+from .geometry import EARTH_RADIUS_KM, KM_PER_DEGREE
+
+
+def route_distances(lats, lons):
+    """Cumulative great-circle distance in km at every vertex of a polyline"""
+    lat, lon = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = (np.sin(np.diff(lat) / 2) ** 2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    steps = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def _linear_interval(a, b, lo, hi):
+    """Values of t with lo <= a + b*t <= hi, as (start, end); empty when start > end"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t0, t1 = (lo - a) / b, (hi - a) / b
+    flat = b == 0
+    inside = (lo <= a) & (a <= hi)
+    start = np.where(flat, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1))
+    end = np.where(flat, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1))
+    return start, end
+
+
+def _disk_interval(cx, cy, dx, dy, radius):
+    """Values of t with |t*(dx, dy) - (cx, cy)| <= radius, as (start, end)"""
+    qa = dx * dx + dy * dy
+    qb = -2 * (cx * dx + cy * dy)
+    qc = cx * cx + cy * cy - radius * radius
+    disc = qb * qb - 4 * qa * qc
+    root = np.sqrt(np.maximum(disc, 0))
+    hit = disc >= 0
+    return (np.where(hit, (-qb - root) / (2 * qa), np.inf),
+            np.where(hit, (-qb + root) / (2 * qa), -np.inf))
+
+
+def _capsule_intervals(ax, ay, bx, by, dx, dy, radius):
+    """Part of each segment t*(dx, dy), 0 <= t <= 1, within ``radius`` of edge AB
+
+    The capsule around an edge is convex, so its intersection with the
+    segment's line is one interval: the hull of the intervals cut by the
+    two end disks and the rectangle between them.
+    """
+    ex, ey = bx - ax, by - ay
+    length = np.hypot(ex, ey)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ux, uy = ex / length, ey / length
+    # Position along the edge (0..length) and signed offset from it (-r..r)
+    along = _linear_interval(-(ax * ux + ay * uy), dx * ux + dy * uy, 0.0, length)
+    across = _linear_interval(ax * uy - ay * ux, -(dx * uy - dy * ux), -radius, radius)
+    rect_start = np.maximum(along[0], across[0])
+    rect_end = np.minimum(along[1], across[1])
+    empty = (length == 0) | ~(rect_start <= rect_end)
+    rect_start, rect_end = np.where(empty, np.inf, rect_start), np.where(empty, -np.inf, rect_end)
+
+    start_a, end_a = _disk_interval(ax, ay, dx, dy, radius)
+    start_b, end_b = _disk_interval(bx, by, dx, dy, radius)
+    start = np.maximum(np.minimum(np.minimum(start_a, start_b), rect_start), 0.0)
+    end = np.minimum(np.maximum(np.maximum(end_a, end_b), rect_end), 1.0)
+    return start, end
+
+
+def route_zones(index, lats, lons, buffer_km=0.0):
+    """Return every stretch of a route inside (or within ``buffer_km`` of) a zone
+
+    Route segments are matched to zone parts through the index grid by
+    their (buffered) bounding boxes, and only those pairs are intersected
+    exactly, so the cost follows the number of nearby (segment, zone)
+    pairs rather than segments x zones. Each segment is intersected in a
+    flat projection centred on it; distances along the route are
+    great-circle.
+
+    Returns one dict per continuous pass, ordered by entry distance:
+    ``feature`` (index into ``index.features``), ``properties``,
+    ``entry_km``/``exit_km`` along the route and the ``entry``/``exit``
+    points as [lon, lat].
+    """
+    lats = np.asarray(lats, dtype=float).reshape(-1)
+    lons = np.asarray(lons, dtype=float).reshape(-1)
+    # Repeated vertices (a GPS trail standing still) make zero-length segments
+    moved = np.r_[True, (np.diff(lats) != 0) | (np.diff(lons) != 0)]
+    lats, lons = lats[moved], lons[moved]
+    if lats.size < 2 or not len(index.bboxes):
+        return []
+    distances = route_distances(lats, lons)
+
+    lat0, lon0, lat1, lon1 = lats[:-1], lons[:-1], lats[1:], lons[1:]
+    km_per_lon = KM_PER_DEGREE * np.cos(np.radians((lat0 + lat1) / 2))
+    pad_lat = buffer_km / KM_PER_DEGREE
+    pad_lon = buffer_km / (KM_PER_DEGREE * np.cos(np.radians(np.maximum(np.abs(lat0), np.abs(lat1)))))
+    boxes = np.column_stack([np.minimum(lon0, lon1) - pad_lon, np.minimum(lat0, lat1) - pad_lat,
+                             np.maximum(lon0, lon1) + pad_lon, np.maximum(lat0, lat1) + pad_lat])
+    segments, parts = index.candidate_box_pairs(boxes)
+    if not segments.size:
+        return []
+
+    # Segments whose (buffered) box lies in the inner box of a convex part
+    # are inside it end to end; no edge needs testing
+    inner, box = index.inner_boxes[parts], boxes[segments]
+    whole = ((inner[:, 0] < box[:, 0]) & (box[:, 2] < inner[:, 2])
+             & (inner[:, 1] < box[:, 1]) & (box[:, 3] < inner[:, 3]))
+    full_pairs = np.flatnonzero(whole)
+    pairs = np.flatnonzero(~whole)
+    inside = index.contains_pairs(np.arange(pairs.size), parts[pairs],
+                                  lon0[segments[pairs]], lat0[segments[pairs]])
+
+    # Edges near each segment (by bbox, through the index's edge grid),
+    # attached to their (segment, part) pair, in km relative to the
+    # segment start
+    offsets, ex0, ey0, ex1, ey1 = index.edges()
+    edge_segments, edges = index.candidate_edge_pairs(boxes)
+    stride = len(index.bboxes)
+    edge_parts = np.searchsorted(offsets, edges, side='right') - 1
+    pair_keys = segments[pairs] * stride + parts[pairs]
+    edge_keys = edge_segments * stride + edge_parts
+    rows = np.minimum(np.searchsorted(pair_keys, edge_keys), max(pairs.size - 1, 0))
+    # Edges of parts already inside end to end have no pair left
+    known = pair_keys[rows] == edge_keys if pairs.size else np.zeros(edges.size, dtype=bool)
+    rows, edges = rows[known], edges[known]
+    seg = segments[pairs[rows]]
+    kx = km_per_lon[seg]
+    ax, ay = (ex0[edges] - lon0[seg]) * kx, (ey0[edges] - lat0[seg]) * KM_PER_DEGREE
+    bx, by = (ex1[edges] - lon0[seg]) * kx, (ey1[edges] - lat0[seg]) * KM_PER_DEGREE
+    dx, dy = (lon1[seg] - lon0[seg]) * kx, (lat1[seg] - lat0[seg]) * KM_PER_DEGREE
+
+    # Boundary crossings along the segment; the side test is half-open so
+    # a vertex lying exactly on the segment is counted once
+    side_a = dx * ay - dy * ax > 0
+    side_b = dx * by - dy * bx > 0
+    den = dx * (by - ay) - dy * (bx - ax)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (ax * (by - ay) - ay * (bx - ax)) / den
+    crossing = (side_a != side_b) & (t > 0) & (t < 1)
+    crossings = np.bincount(rows[crossing], minlength=pairs.size)
+
+    # Each pair's boundary events (start if inside, crossings, end if
+    # inside) come in even numbers, so after sorting by (pair, t)
+    # consecutive events pair up into inside intervals
+    ends_inside = inside ^ (crossings % 2 == 1)
+    event_pair = np.concatenate([np.flatnonzero(inside), rows[crossing], np.flatnonzero(ends_inside)])
+    event_t = np.concatenate([np.zeros(inside.sum()), t[crossing], np.ones(ends_inside.sum())])
+    order = np.lexsort((event_t, event_pair))
+    interval_pair = np.concatenate([full_pairs, pairs[event_pair[order][0::2]]])
+    interval_start = np.concatenate([np.zeros(full_pairs.size), event_t[order][0::2]])
+    interval_end = np.concatenate([np.ones(full_pairs.size), event_t[order][1::2]])
+
+    if buffer_km > 0:
+        start, end = _capsule_intervals(ax, ay, bx, by, dx, dy, buffer_km)
+        near = start <= end
+        interval_pair = np.concatenate([interval_pair, pairs[rows[near]]])
+        interval_start = np.concatenate([interval_start, start[near]])
+        interval_end = np.concatenate([interval_end, end[near]])
+    if not interval_pair.size:
+        return []
+
+    # Route distances, then merge overlapping or touching stretches per feature
+    seg = segments[interval_pair]
+    length = distances[seg + 1] - distances[seg]
+    entry = distances[seg] + interval_start * length
+    exit_ = distances[seg] + interval_end * length
+    feature = index.part_feature[parts[interval_pair]]
+    order = np.lexsort((entry, feature))
+    feature, entry, exit_ = feature[order], entry[order], exit_[order]
+    # Running max of exits within each feature (features offset apart)
+    span = distances[-1] + 1.0
+    reach = np.maximum.accumulate(exit_ + feature * span) - feature * span
+    new = np.r_[True, (feature[1:] != feature[:-1]) | (entry[1:] > reach[:-1] + 1e-9)]
+    starts = np.flatnonzero(new)
+    pass_feature = feature[starts].tolist()
+    pass_entry = entry[starts]
+    pass_exit = np.maximum.reduceat(exit_, starts)
+
+    entry_points = np.column_stack([np.interp(pass_entry, distances, lons),
+                                    np.interp(pass_entry, distances, lats)]).round(6).tolist()
+    exit_points = np.column_stack([np.interp(pass_exit, distances, lons),
+                                   np.interp(pass_exit, distances, lats)]).round(6).tolist()
+    passes = [
+        {
+            "feature": fid,
+            "properties": index.features[fid].get('properties', {}),
+            "entry_km": round(float(a), 3),
+            "exit_km": round(float(b), 3),
+            "entry": entry_points[i],
+            "exit": exit_points[i],
+        }
+        for i, (fid, a, b) in enumerate(zip(pass_feature, pass_entry.tolist(), pass_exit.tolist()))
+    ]
+    passes.sort(key=lambda p: (p["entry_km"], p["feature"]))
+    return passes
@@ -0,0 +1,195 @@
+"""Batch risk scoring of tourist GPS pings against generated geofences
+
+    python -m geofencing.scoring pings.csv --output scores.jsonl [--workers 4]
+
+Pings are (tourist_id, lat, lon, t) records from a CSV file with a header
+row, a JSONL file, or any in-process iterable. Each ping gets the zones
+containing it and a score: the rank of the worst severity among them
+(1 = low ... 4 = extreme, 0 = outside every zone).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from .index import GeofenceIndex, load_feature_collection, zone_paths
+from .metrics import metrics
+from .output import json_dumps
+from .properties import SEVERITY_LEVELS, severity_rank
+
+# Pings scored per vectorized batch (and per task sent to a worker process)
+CHUNK_SIZE = 100_000
+
+
+def read_pings(path):
+    """Yield (tourist_id, lat, lon, t) from a CSV (with header) or JSONL file; "-" is stdin"""
+    f = sys.stdin if path == "-" else open(path, newline='')
+    try:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            yield row['tourist_id'], float(row['lat']), float(row['lon']), row.get('t')
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def chunked(records, size=CHUNK_SIZE):
+    """Group records into (ids, lats, lons, times) column batches of up to ``size`` pings"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        ids, lats, lons, times = zip(*batch)
+        yield ids, np.array(lats, dtype=float), np.array(lons, dtype=float), times
+
+
+class RiskScorer:
+    """Score pings by the worst severity of the geofences containing them
+
+    Containment goes through :class:`~geofencing.index.GeofenceIndex`, so
+    a batch costs one grid lookup and bbox filter per ping plus ray casting
+    of the surviving (ping, zone) pairs, all vectorized.
+    """
+
+    def __init__(self, features, cell_size=None):
+        self.index = GeofenceIndex(features, cell_size=cell_size)
+        properties = [f.get('properties') or {} for f in self.index.features]
+        self.ranks = np.array([severity_rank(p.get('severity')) for p in properties], dtype=np.int8)
+        self.zones = [
+            {"id": f.get('id', i), "risk": p.get('risk', 'unknown'), "severity": p.get('severity')}
+            for i, (f, p) in enumerate(zip(self.index.features, properties))
+        ]
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        features = []
+        for path in paths:
+            features.extend(load_feature_collection(path).get('features', []))
+        return cls(features, **kwargs)
+
+    def score_arrays(self, lats, lons):
+        """Return (scores, points, zones) for many pings
+
+        ``scores`` holds the worst severity rank per ping and ``points``/
+        ``zones`` the (ping, zone index) containment pairs, sorted by ping.
+        """
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        scores = np.zeros(lats.size, dtype=np.int8)
+        points, zones = self.index.match_pairs(lats, lons)
+        if points.size:
+            starts = np.flatnonzero(np.r_[True, points[1:] != points[:-1]])
+            scores[points[starts]] = np.maximum.reduceat(self.ranks[zones], starts)
+        return scores, points, zones
+
+    def score(self, records, chunk_size=CHUNK_SIZE, workers=1):
+        """Yield one result dict per ping, in input order
+
+        With ``workers`` > 1 the batches are scored in a process pool (each
+        worker builds its own index once); at most two batches per worker
+        are in flight, so arbitrarily long streams use bounded memory.
+        """
+        batches = chunked(records, chunk_size)
+        if workers <= 1:
+            for ids, lats, lons, times in batches:
+                yield from self._results(ids, lats, lons, times, *self._score_batch(lats, lons))
+            return
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(self.index.features,)) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append((batch, pool.submit(_score_in_worker, batch[1], batch[2])))
+                if len(pending) >= 2 * workers:
+                    batch, future = pending.popleft()
+                    yield from self._results(*batch, *future.result())
+            while pending:
+                batch, future = pending.popleft()
+                yield from self._results(*batch, *future.result())
+
+    def _score_batch(self, lats, lons):
+        with metrics.stage("score"):
+            result = self.score_arrays(lats, lons)
+        metrics.count("pings_scored", lats.size)
+        return result
+
+    def _results(self, ids, lats, lons, times, scores, points, zones):
+        bounds = np.searchsorted(points, np.arange(len(ids) + 1)).tolist()
+        zones = zones.tolist()
+        lats, lons, scores = lats.tolist(), lons.tolist(), scores.tolist()
+        for i, tourist_id in enumerate(ids):
+            score = scores[i]
+            yield {
+                "tourist_id": tourist_id,
+                "lat": lats[i],
+                "lon": lons[i],
+                "t": times[i],
+                "score": score,
+                "severity": SEVERITY_LEVELS[score - 1] if score else None,
+                "zones": [self.zones[z] for z in zones[bounds[i]:bounds[i + 1]]],
+            }
+
+
+_worker_scorer = None
+
+
+def _init_worker(features):
+    global _worker_scorer
+    _worker_scorer = RiskScorer(features)
+
+
+def _score_in_worker(lats, lons):
+    return _worker_scorer.score_arrays(lats, lons)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score tourist GPS pings against the generated geofences")
+    parser.add_argument("pings", help="CSV (tourist_id,lat,lon,t header) or JSONL file, - for stdin")
+    parser.add_argument("--zones", nargs="+",
+                        help="GeoJSON FeatureCollection files to score against "
+                             "(default: the unified dataset, else every generated one)")
+    parser.add_argument("--output", default="-", help="JSONL output file (default stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="score batches in this many processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--matched-only", action="store_true", help="only write pings inside a zone")
+    args = parser.parse_args()
+
+    zone_files = zone_paths()
+    if args.zones:
+        zone_files = [path for path in args.zones if os.path.exists(path)]
+        for path in sorted(set(args.zones) - set(zone_files)):
+            print(f"⚠️ Skipping missing zone file {path}", file=sys.stderr)
+    scorer = RiskScorer.from_files(zone_files)
+    print(f"🗺️ Loaded {len(scorer.index)} zones from {len(zone_files)} files", file=sys.stderr)
+
+    started = time.perf_counter()
+    total = matched = 0
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb')
+    try:
+        for result in scorer.score(read_pings(args.pings), args.chunk_size, args.workers):
+            total += 1
+            if result["score"] or result["zones"]:
+                matched += 1
+            elif args.matched_only:
+                continue
+            out.write(json_dumps(result, True) + b'\n')
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {total} pings ({matched} inside zones) in {elapsed:.2f}s "
+          f"({total / max(elapsed, 1e-9):,.0f} pings/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
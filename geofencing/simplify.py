@@ -0,0 +1,87 @@
+"""Polygon simplification for generated geofences"""
+import numpy as np
+
+from .geometry import KM_PER_DEGREE
+from .metrics import metrics
+from .store import FeatureStore
+
+try:
+    import shapely
+    from shapely.geometry import mapping, shape
+except ImportError:  # optional; simplify_features needs it
+    shapely = None
+
+DEFAULT_TOLERANCE_M = 50
+
+
+def _simplify_geometries(geometries, tolerance):
+    """Topology-preserving simplify of a shapely geometry array, in degrees of latitude
+
+    Longitudes are first scaled by cos(latitude) at the middle of each
+    geometry's bounds, so the tolerance spans the same ground distance east-
+    west as north-south; the scaling is undone afterwards.
+    """
+    bounds = shapely.bounds(geometries)
+    scale = np.cos(np.radians(np.nan_to_num((bounds[:, 1] + bounds[:, 3]) / 2)))
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    coords[:, 0] *= scale[index]
+    geometries = shapely.simplify(shapely.set_coordinates(geometries, coords),
+                                  tolerance, preserve_topology=True)
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    coords[:, 0] /= scale[index]
+    return shapely.set_coordinates(geometries, coords)
+
+
+def _simplify_store(store, tolerance):
+    """Simplify a FeatureStore in one shapely call over its ragged arrays"""
+    if not len(store):
+        return store.take([])
+    geometries = shapely.from_ragged_array(
+        shapely.GeometryType.MULTIPOLYGON, store.coords.view(),
+        (store.ring_offsets.view(), store.part_offsets.view(), store.feature_offsets.view()))
+    geometries = _simplify_geometries(geometries, tolerance)
+    _, coords, (ring_offsets, part_offsets, feature_offsets) = shapely.to_ragged_array(geometries)
+    return store.with_rings(coords, ring_offsets, part_offsets, feature_offsets)
+
+
+@metrics.timed("simplify")
+def simplify_features(features, tolerance_m=DEFAULT_TOLERANCE_M):
+    """Simplify every polygon so no vertex moves more than ``tolerance_m`` metres
+
+    Meant for dissolved outlines: circles from
+    :func:`~geofencing.geometry.adaptive_circle_rings` already have the
+    fewest vertices their chord-error budget allows, so callers only
+    simplify after dissolving. Uses shapely's vectorized topology-preserving
+    simplify over the whole geometry array (a
+    :class:`~geofencing.store.FeatureStore` goes through its ragged arrays
+    without building dicts), so like dissolving it requires shapely.
+    """
+    if shapely is None:
+        raise RuntimeError("Simplifying geofences requires shapely (pip install shapely)")
+    if not tolerance_m:
+        return features if isinstance(features, FeatureStore) else list(features)
+    tolerance = tolerance_m / 1000 / KM_PER_DEGREE
+    if isinstance(features, FeatureStore):
+        return _simplify_store(features, tolerance)
+    features = list(features)
+    polygonal = [i for i, f in enumerate(features)
+                 if f.get('geometry') and f['geometry'].get('type') in ('Polygon', 'MultiPolygon')]
+
+    geometries = np.array([shape(features[i]['geometry']) for i in polygonal], dtype=object)
+    simplified = [mapping(g) for g in _simplify_geometries(geometries, tolerance)]
+    for i, geometry in zip(polygonal, simplified):
+        features[i] = dict(features[i], geometry=geometry)
+    return features
+
+
+def vertex_count(features):
+    """Total number of ring vertices across ``features``"""
+    if isinstance(features, FeatureStore):
+        return features.coords.size
+    total = 0
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        parts = [geometry.get('coordinates', [])] if geometry.get('type') == 'Polygon' \
+            else geometry.get('coordinates', []) if geometry.get('type') == 'MultiPolygon' else []
+        total += sum(len(ring) for rings in parts for ring in rings)
+    return total
@@ -0,0 +1,521 @@
+"""Compact array-backed feature store used while generators collect zones
+
+Zones are kept as contiguous float64 coordinates plus offset arrays
+(feature -> polygon parts -> rings -> vertices) and interned property
+columns, instead of one nested dict/list tree per zone. GeoJSON dicts are
+only built at the serialization boundary, through :class:`FeatureView`.
+
+A store built with ``ttls`` (seconds per risk type) also gives each
+transient zone an expiry time and keeps those in a priority queue;
+:meth:`FeatureStore.expire` drops the zones that ran out.
+"""
+import heapq
+import json
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+from .geometry import DEFAULT_MAX_CHORD_ERROR_M, adaptive_circle_rings, circle_rings
+from .index import polygon_parts
+from .properties import parse_epoch
+
+GEOMETRY_TYPES = (None, "Polygon", "MultiPolygon")
+_GEOMETRY_CODES = {name: code for code, name in enumerate(GEOMETRY_TYPES)}
+
+
+def _epoch(value):
+    """Seconds since the epoch of an ISO timestamp; NaN if unparseable"""
+    seconds = parse_epoch(value)
+    return np.nan if seconds is None else seconds
+
+
+class _Encoded(str):
+    """JSON text of an unhashable property value, decoded afresh on every read"""
+
+
+def _intern_key(value):
+    try:
+        hash(value)
+    except TypeError:
+        return _Encoded(json.dumps(value, sort_keys=True, separators=(',', ':'), default=str))
+    # Keep True and 1 (and 1.0) apart, they hash alike
+    return (type(value), value)
+
+
+class _Buffer:
+    """Growable contiguous NumPy buffer with amortized O(1) appends"""
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, width=None, capacity=64):
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.empty(shape, dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        if needed > len(self.data):
+            capacity = max(needed, 2 * len(self.data))
+            grown = np.empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def append(self, value):
+        self._reserve(1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        self._reserve(len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def view(self):
+        return self.data[:self.size]
+
+    @classmethod
+    def of(cls, values, dtype, width=None):
+        """A buffer holding a copy of ``values``"""
+        buffer = cls(dtype, width, capacity=max(64, len(values)))
+        buffer.extend(values)
+        return buffer
+
+    def nbytes(self):
+        return self.data.nbytes
+
+
+class FeatureView(Mapping):
+    """Read-only GeoJSON-like view of one feature in a :class:`FeatureStore`
+
+    Behaves as a ``{"type", "geometry", "properties"}`` mapping, so code
+    written for GeoJSON dicts (``feature.get('geometry')``,
+    ``dict(feature, id=...)``) works unchanged; the nested dicts and lists
+    are built on access and not kept.
+    """
+
+    __slots__ = ("store", "index")
+    _KEYS = ("type", "geometry", "properties")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return 'Feature'
+        if key == 'geometry':
+            return self.store.geometry(self.index)
+        if key == 'properties':
+            return self.store.properties(self.index)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    @property
+    def rings(self):
+        """Rings of every polygon part as [lon, lat] array views"""
+        return self.store.rings(self.index)
+
+    def value(self, name, default=None):
+        """Read one property without building the whole properties dict"""
+        return self.store.property_value(self.index, name, default)
+
+    def to_geojson(self):
+        return {"type": "Feature", "geometry": self['geometry'], "properties": self['properties']}
+
+    def __repr__(self):
+        return f"<FeatureView {self.index} of {len(self.store)}>"
+
+
+class FeatureStore:
+    """Append-only collection of polygon features in contiguous arrays
+
+    Supports the list operations the generators use (``append``,
+    ``extend``, ``len``, iteration and indexing, yielding
+    :class:`FeatureView` objects). Property values are interned per key,
+    so repeated strings such as risk, severity, source or city are stored
+    once; key order per feature is kept as an interned schema.
+
+    A zone with an ``expires_at`` property expires then. With ``ttls``
+    ({risk: seconds}), a zone of a listed risk type also expires that long
+    after its ``timestamp`` property (or after it was added, if it has
+    none), whichever comes first.
+    Expiry times sit in a min-heap, so :meth:`expire` costs nothing until
+    a zone is due and then removes every due zone in one vectorized pass.
+    """
+
+    def __init__(self, features=None, ttls=None):
+        self.coords = _Buffer(np.float64, 2)
+        self.ring_offsets = _Buffer(np.int64)
+        self.part_offsets = _Buffer(np.int64)
+        self.feature_offsets = _Buffer(np.int64)
+        self.geometry_types = _Buffer(np.int8)
+        self.schema_ids = _Buffer(np.int32)
+        for offsets in (self.ring_offsets, self.part_offsets, self.feature_offsets):
+            offsets.append(0)
+        self.schemas = []
+        self._schema_lookup = {}
+        self.columns = {}
+        self.values = {}
+        self._value_lookup = {}
+        self.ttls = dict(ttls or {})
+        self.expires_at = _Buffer(np.float64)
+        self._expiry_queue = []
+        # Per property key, values[key] already decoded to TTLs / epoch seconds
+        self._decoded_cache = {}
+        if features is not None:
+            self.extend(features)
+
+    def __len__(self):
+        return self.geometry_types.size
+
+    def __iter__(self):
+        return (FeatureView(self, i) for i in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FeatureView(self, i) for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("feature index out of range")
+        return FeatureView(self, index)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    # -- writing ---------------------------------------------------------
+
+    def _intern_schema(self, keys):
+        schema_id = self._schema_lookup.get(keys)
+        if schema_id is None:
+            schema_id = self._schema_lookup[keys] = len(self.schemas)
+            self.schemas.append(keys)
+        return schema_id
+
+    def _column(self, key, filled):
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = _Buffer(np.int32, capacity=max(64, filled + 1))
+            # The first ``filled`` features lack this key
+            column.extend(np.full(filled, -1, dtype=np.int32))
+            self.values[key] = []
+            self._value_lookup[key] = {}
+        return column
+
+    def _intern_value(self, key, value):
+        lookup = self._value_lookup[key]
+        ikey = _intern_key(value)
+        code = lookup.get(ikey)
+        if code is None:
+            code = lookup[ikey] = len(self.values[key])
+            self.values[key].append(ikey if isinstance(ikey, _Encoded) else value)
+        return code
+
+    def _add_properties(self, index, properties):
+        if properties is None:
+            self.schema_ids.append(-1)
+        else:
+            self.schema_ids.append(self._intern_schema(tuple(properties)))
+            for key, value in properties.items():
+                self._column(key, index).append(self._intern_value(key, value))
+        for key, column in self.columns.items():
+            if column.size <= index:
+                column.append(-1)
+
+    def _add_rings(self, parts, geometry_type):
+        for rings in parts:
+            for ring in rings:
+                self.coords.extend(ring)
+                self.ring_offsets.append(self.coords.size)
+            self.part_offsets.append(self.ring_offsets.size - 1)
+        self.feature_offsets.append(self.part_offsets.size - 1)
+        self.geometry_types.append(_GEOMETRY_CODES[geometry_type])
+
+    def append(self, feature):
+        """Add one GeoJSON feature (dict or view) with Polygon/MultiPolygon geometry"""
+        geometry = feature.get('geometry')
+        geometry_type = geometry.get('type') if geometry else None
+        if geometry_type not in _GEOMETRY_CODES:
+            raise ValueError(f"FeatureStore only holds polygon features, got {geometry_type}")
+        parts = [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings]
+                 for rings in polygon_parts(geometry)]
+        self._add_rings(parts, geometry_type)
+        self._add_properties(len(self) - 1, feature.get('properties'))
+        self._stamp(len(self) - 1)
+
+    def add_circle(self, lat, lon, radius_km=20, properties=None, num_points=None,
+                   max_error_m=DEFAULT_MAX_CHORD_ERROR_M, geodesic=False):
+        """Add a circular zone; same arguments as :func:`~geofencing.geometry.circle_feature`"""
+        self.add_circles([lat], [lon], radius_km, [properties], num_points=num_points,
+                         max_error_m=max_error_m, geodesic=geodesic)
+
+    def add_circles(self, lats, lons, radii_km, properties=None, num_points=None,
+                    max_error_m=DEFAULT_MAX_CHORD_ERROR_M, geodesic=False):
+        """Add many circular zones in one vectorized pass"""
+        if num_points:
+            rings = circle_rings(lats, lons, radii_km, num_points=num_points, geodesic=geodesic)
+        else:
+            rings = adaptive_circle_rings(lats, lons, radii_km, max_error_m=max_error_m,
+                                          geodesic=geodesic)
+        if not len(rings):
+            return
+        # One ring per part and one part per feature, appended in bulk
+        start = len(self)
+        n = len(rings)
+        sizes = np.fromiter((len(ring) for ring in rings), dtype=np.int64, count=n)
+        self.coords.extend(np.concatenate(list(rings)))
+        self.ring_offsets.extend(self.ring_offsets.view()[-1] + np.cumsum(sizes))
+        self.part_offsets.extend(self.part_offsets.view()[-1] + np.arange(1, n + 1))
+        self.feature_offsets.extend(self.feature_offsets.view()[-1] + np.arange(1, n + 1))
+        self.geometry_types.extend(np.full(n, _GEOMETRY_CODES["Polygon"]))
+        for i in range(n):
+            self._add_properties(start + i, (properties[i] if properties is not None else None) or {})
+        self._stamp(start)
+
+    def extend(self, features):
+        """Add every feature of an iterable; another store is merged array-wise"""
+        if isinstance(features, FeatureStore):
+            self._merge(features)
+            return
+        for feature in features:
+            self.append(feature)
+
+    def _merge(self, other):
+        """Append all of ``other`` without building any dicts"""
+        start = len(self)
+        features = slice(0, len(other))
+        f_off = other.feature_offsets.view()
+        p_off = other.part_offsets.view()
+        r_off = other.ring_offsets.view()
+        p0, p1 = f_off[features.start], f_off[features.stop]
+        r0, r1 = p_off[p0], p_off[p1]
+        c0, c1 = r_off[r0], r_off[r1]
+
+        self.coords.extend(other.coords.view()[c0:c1])
+        self.ring_offsets.extend(r_off[r0 + 1:r1 + 1] - c0 + self.ring_offsets.view()[-1])
+        self.part_offsets.extend(p_off[p0 + 1:p1 + 1] - r0 + self.part_offsets.view()[-1])
+        self.feature_offsets.extend(f_off[features.start + 1:features.stop + 1] - p0
+                                    + self.feature_offsets.view()[-1])
+        self.geometry_types.extend(other.geometry_types.view()[features])
+
+        schema_map = np.array([self._intern_schema(keys) for keys in other.schemas] + [-1],
+                              dtype=np.int32)
+        self.schema_ids.extend(schema_map[other.schema_ids.view()[features]])
+        for key, column in other.columns.items():
+            target = self._column(key, start)
+            code_map = np.array([self._intern_value(key, json.loads(v) if isinstance(v, _Encoded) else v)
+                                 for v in other.values[key]] + [-1], dtype=np.int32)
+            target.extend(code_map[column.view()[features]])
+        for key, column in self.columns.items():
+            if column.size < len(self):
+                column.extend(np.full(len(self) - column.size, -1, dtype=np.int32))
+        self._stamp(start, other.expires_at.view()[features])
+
+    def take(self, indices):
+        """Return a new store holding the features at ``indices``, in that order"""
+        indices = np.asarray(indices, dtype=np.int64)
+        result = FeatureStore(ttls=self.ttls)
+        for i in indices.tolist():
+            result._add_rings(self.rings(i), GEOMETRY_TYPES[self.geometry_types.data[i]])
+            result._add_properties(len(result) - 1, self.properties(i))
+        result._stamp(0, self.expires_at.view()[indices])
+        return result
+
+    def map_rings(self, func):
+        """Return a new store with ``func(ring) -> ring`` applied to every ring"""
+        result = FeatureStore(ttls=self.ttls)
+        for i in range(len(self)):
+            parts = [[func(ring) for ring in rings] for rings in self.rings(i)]
+            result._add_rings(parts, GEOMETRY_TYPES[self.geometry_types.data[i]])
+            result._add_properties(i, self.properties(i))
+        result._stamp(0, self.expires_at.view())
+        return result
+
+    def with_rings(self, coords, ring_offsets, part_offsets, feature_offsets):
+        """Return a copy of the store whose geometry is replaced by the given arrays
+
+        The offsets follow the store's own layout (ring -> coords, part ->
+        rings, feature -> parts) and must describe ``len(self)`` features;
+        properties and expiries are kept.
+        """
+        result = FeatureStore(ttls=self.ttls)
+        result._merge(self)
+        result.coords = _Buffer.of(np.asarray(coords, dtype=np.float64)[:, :2], np.float64, 2)
+        result.ring_offsets = _Buffer.of(ring_offsets, np.int64)
+        result.part_offsets = _Buffer.of(part_offsets, np.int64)
+        result.feature_offsets = _Buffer.of(feature_offsets, np.int64)
+        return result
+
+    # -- expiry ----------------------------------------------------------
+
+    def _decoded(self, key, start, decode, default):
+        """``decode`` of property ``key`` for features ``start:`` (``default`` where missing)
+
+        Each interned value is decoded once; the results are cached in a
+        buffer parallel to ``values[key]``.
+        """
+        codes = self._column_codes(key, start)
+        cache = self._decoded_cache.get(key)
+        if cache is None:
+            cache = self._decoded_cache[key] = _Buffer(np.float64)
+        values = self.values.get(key, [])
+        if cache.size < len(values):
+            cache.extend([decode(v) for v in values[cache.size:]])
+        if not cache.size:
+            return np.full(len(codes), default, dtype=np.float64)
+        return np.where(codes >= 0, cache.view()[np.maximum(codes, 0)], default)
+
+    def _column_codes(self, key, start):
+        column = self.columns.get(key)
+        if column is None:
+            return np.full(len(self) - start, -1, dtype=np.int32)
+        return column.view()[start:]
+
+    def _stamp(self, start, inherited=None):
+        """Set the expiry times of features ``start:`` and queue the finite ones"""
+        count = len(self) - start
+        expires = np.full(count, np.inf) if inherited is None else np.array(inherited, dtype=np.float64)
+        if self.ttls:
+            ttl = self._decoded('risk', start, lambda v: self.ttls.get(v, np.inf), np.inf)
+            finite = np.isfinite(ttl)
+            if finite.any():
+                created = self._decoded('timestamp', start, _epoch, np.nan)
+                created = np.where(np.isnan(created), time.time(), created)
+                expires = np.where(finite, np.minimum(expires, created + ttl), expires)
+        # An explicit expires_at applies with or without TTLs
+        expires = np.fmin(expires, self._decoded('expires_at', start, _epoch, np.inf))
+        self.expires_at.extend(expires)
+        finite = np.flatnonzero(np.isfinite(expires))
+        if finite.size:
+            entries = list(zip(expires[finite].tolist(), (start + finite).tolist()))
+            if finite.size > len(self._expiry_queue):
+                self._expiry_queue.extend(entries)
+                heapq.heapify(self._expiry_queue)
+            else:
+                for entry in entries:
+                    heapq.heappush(self._expiry_queue, entry)
+
+    @property
+    def next_expiry(self):
+        """Epoch seconds at which the next zone expires, or None"""
+        return self._expiry_queue[0][0] if self._expiry_queue else None
+
+    def expire(self, now=None):
+        """Remove every zone whose expiry time has passed; returns how many were removed"""
+        now = time.time() if now is None else now
+        queue = self._expiry_queue
+        if not queue or queue[0][0] > now:
+            return 0
+        keep = np.ones(len(self), dtype=bool)
+        while queue and queue[0][0] <= now:
+            keep[heapq.heappop(queue)[1]] = False
+        self._compact(keep)
+        return int(len(keep) - keep.sum())
+
+    def _compact(self, keep):
+        """Drop the features where ``keep`` is False, in place and array-wise
+
+        Interned values and schemas only used by dropped features are
+        released too, so memory follows the features still held.
+        """
+        f_off = self.feature_offsets.view()
+        parts = np.diff(f_off)
+        rings = np.diff(self.part_offsets.view())
+        coords = np.diff(self.ring_offsets.view())
+        keep_parts = np.repeat(keep, parts)
+        keep_rings = np.repeat(keep_parts, rings)
+        keep_coords = np.repeat(keep_rings, coords)
+
+        self.coords = _Buffer.of(self.coords.view()[keep_coords], np.float64, 2)
+        self.ring_offsets = _Buffer.of(np.r_[0, np.cumsum(coords[keep_rings])], np.int64)
+        self.part_offsets = _Buffer.of(np.r_[0, np.cumsum(rings[keep_parts])], np.int64)
+        self.feature_offsets = _Buffer.of(np.r_[0, np.cumsum(parts[keep])], np.int64)
+        self.geometry_types = _Buffer.of(self.geometry_types.view()[keep], np.int8)
+        self.expires_at = _Buffer.of(self.expires_at.view()[keep], np.float64)
+
+        schema_ids = self.schema_ids.view()[keep]
+        used = np.unique(schema_ids[schema_ids >= 0])
+        remap = np.full(len(self.schemas) + 1, -1, dtype=np.int32)
+        remap[used] = np.arange(used.size)
+        self.schema_ids = _Buffer.of(remap[schema_ids], np.int32)
+        self.schemas = [self.schemas[i] for i in used.tolist()]
+        self._schema_lookup = {keys: i for i, keys in enumerate(self.schemas)}
+
+        for key in list(self.columns):
+            codes = self.columns[key].view()[keep]
+            used = np.unique(codes[codes >= 0])
+            if not used.size:
+                del self.columns[key], self.values[key], self._value_lookup[key]
+                continue
+            remap = np.full(len(self.values[key]) + 1, -1, dtype=np.int32)
+            remap[used] = np.arange(used.size)
+            self.columns[key] = _Buffer.of(remap[codes], np.int32)
+            self.values[key] = [self.values[key][i] for i in used.tolist()]
+            self._value_lookup[key] = {v if isinstance(v, _Encoded) else _intern_key(v): code
+                                       for code, v in enumerate(self.values[key])}
+        self._decoded_cache = {}
+
+        # Positions shift down monotonically, so the heap order still holds
+        positions = np.cumsum(keep) - 1
+        self._expiry_queue = [(at, int(positions[i])) for at, i in self._expiry_queue]
+
+    # -- reading ---------------------------------------------------------
+
+    def rings(self, index):
+        """Return the rings of feature ``index`` as a list of parts of array views"""
+        f_off = self.feature_offsets.data
+        p_off = self.part_offsets.data
+        r_off = self.ring_offsets.data
+        coords = self.coords.data
+        return [[coords[r_off[r]:r_off[r + 1]] for r in range(p_off[p], p_off[p + 1])]
+                for p in range(f_off[index], f_off[index + 1])]
+
+    def geometry(self, index):
+        geometry_type = GEOMETRY_TYPES[self.geometry_types.data[index]]
+        if geometry_type is None:
+            return None
+        parts = [[ring.tolist() for ring in rings] for rings in self.rings(index)]
+        return {"type": geometry_type,
+                "coordinates": parts[0] if geometry_type == "Polygon" else parts}
+
+    def _value(self, key, code):
+        value = self.values[key][code]
+        return json.loads(value) if isinstance(value, _Encoded) else value
+
+    def properties(self, index):
+        schema_id = self.schema_ids.data[index]
+        if schema_id < 0:
+            return None
+        return {key: self._value(key, self.columns[key].data[index])
+                for key in self.schemas[schema_id]}
+
+    def property_value(self, index, name, default=None):
+        column = self.columns.get(name)
+        if column is None or column.data[index] < 0:
+            return default
+        return self._value(name, column.data[index])
+
+    def codes(self, name):
+        """Return (int32 codes, values) of property ``name``; -1 marks missing"""
+        if name not in self.columns:
+            return np.full(len(self), -1, dtype=np.int32), []
+        return self.columns[name].view(), [
+            json.loads(v) if isinstance(v, _Encoded) else v for v in self.values[name]]
+
+    def to_features(self):
+        """Materialize every feature as a GeoJSON dict"""
+        return [view.to_geojson() for view in self]
+
+    def nbytes(self):
+        """Approximate bytes held by the arrays (excluding interned values)"""
+        buffers = [self.coords, self.ring_offsets, self.part_offsets, self.feature_offsets,
+                   self.geometry_types, self.schema_ids, self.expires_at, *self.columns.values()]
+        return sum(buffer.nbytes() for buffer in buffers)
@@ -0,0 +1,418 @@
+"""Mapbox Vector Tile pyramid of the generated geofences
+
+    python -m geofencing.tiles [--output data/tiles/geofences.mbtiles] [--min-zoom 3] [--max-zoom 14]
+
+Zones are projected to Web Mercator once, simplified once per zoom and
+clipped to every tile they touch, so a client fetches only the visible
+tiles instead of the whole nationwide FeatureCollection. At low zooms,
+zones smaller than a few pixels are merged per risk type into one
+``aggregated`` feature per cluster cell, and tiles still holding more than
+MAX_TILE_FEATURES zones are dissolved per risk type and severity, which
+keeps tile sizes bounded however many zones the datasets hold. Output is an MBTiles file or a
+``{z}/{x}/{y}.pbf`` directory tree that any static file server can serve.
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import shutil
+import sqlite3
+import struct
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from .index import load_feature_collection, zone_paths
+from .landmask import DEFAULT_BOUNDS
+from .metrics import metrics
+from .properties import max_severity
+
+try:
+    import shapely
+    from shapely.geometry import shape
+except ImportError:  # optional dependency, only needed for this stage
+    shapely = None
+
+DEFAULT_MIN_ZOOM = 3
+DEFAULT_MAX_ZOOM = 14
+DEFAULT_OUTPUT = "data/tiles/geofences.mbtiles"
+LAYER_NAME = "geofences"
+
+# Tile geometry is in integer units of EXTENT per tile side (256 px tiles,
+# so 16 units per pixel); BUFFER units outside the tile are kept so fills
+# and outlines don't show seams at tile edges
+EXTENT = 4096
+BUFFER = 64
+SIMPLIFY_UNITS = 8
+# Zones smaller than MIN_FEATURE_UNITS across are aggregated per risk type
+# into one disc cluster per CLUSTER_UNITS square
+MIN_FEATURE_UNITS = 64
+CLUSTER_UNITS = 512
+# Tiles with more zones than this are coalesced per risk type and severity
+MAX_TILE_FEATURES = 200
+
+MAX_LATITUDE = 85.0511287798
+
+
+def mercator(coords):
+    """Lon/lat (n, 2) array -> Web Mercator x/y in [0, 1], y pointing south"""
+    lon = coords[:, 0]
+    lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    return np.column_stack([(lon + 180.0) / 360.0, (1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0])
+
+
+# -- protobuf / MVT encoding ------------------------------------------------
+
+def _encode_varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+# Nearly every tag index, command and coordinate delta is below 2**14
+_SMALL_VARINTS = [_encode_varint(v) for v in range(1 << 14)]
+
+
+def _varint(value):
+    return _SMALL_VARINTS[value] if value < 16384 else _encode_varint(value)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, wire_type, payload):
+    """One protobuf field; ``payload`` is an int for varints, bytes otherwise"""
+    key = _varint(number << 3 | wire_type)
+    if wire_type == 0:
+        return key + _varint(payload)
+    if wire_type == 1:
+        return key + payload
+    return key + _varint(len(payload)) + payload
+
+
+def _packed(number, values):
+    return _field(number, 2, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _field(7, 0, int(value))
+    if isinstance(value, int):
+        return _field(6, 0, _zigzag(value)) if value < 0 else _field(5, 0, value)
+    if isinstance(value, float):
+        return _field(3, 1, struct.pack('<d', value))
+    return _field(1, 2, str(value).encode('utf-8'))
+
+
+def polygon_commands(rings):
+    """MVT geometry commands for integer tile-coordinate rings (closing point omitted)"""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for ring in rings:
+        deltas = np.diff(ring, axis=0, prepend=cursor[None, :])
+        params = ((deltas << 1) ^ (deltas >> 63)).ravel().tolist()
+        commands += [1 | 1 << 3, params[0], params[1], 2 | (len(ring) - 1) << 3]
+        commands += params[2:]
+        commands.append(7 | 1 << 3)
+        cursor = ring[-1]
+    return commands
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """Encode one MVT layer from (id, properties, rings) tuples; an id of None is left out"""
+    keys, values = {}, {}
+    encoded = []
+    for feature_id, properties, rings in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None or not isinstance(value, (str, int, float, bool)):
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        body = (b'' if feature_id is None else _field(1, 0, feature_id)) + _packed(2, tags) \
+            + _field(3, 0, 3) + _packed(4, polygon_commands(rings))
+        encoded.append(_field(2, 2, body))
+    layer = (_field(15, 0, 2) + _field(1, 2, name.encode('utf-8')) + b''.join(encoded)
+             + b''.join(_field(3, 2, k.encode('utf-8')) for k in keys)
+             + b''.join(_field(4, 2, _encode_value(v)) for _, v in values)
+             + _field(5, 0, extent))
+    return _field(3, 2, layer)
+
+
+# -- tiling ------------------------------------------------------------------
+
+def _tile_rings(polygon, origin, scale):
+    """Integer tile-coordinate rings of a polygon, exterior first and oriented for MVT
+
+    Rings that collapse when snapped to the grid are dropped (with their
+    holes, for an exterior).
+    """
+    rings = []
+    for i, ring in enumerate([polygon.exterior, *polygon.interiors]):
+        coords = np.rint((np.asarray(ring.coords)[:-1, :2] - origin) * scale).astype(np.int64)
+        coords = coords[np.r_[True, np.any(coords[1:] != coords[:-1], axis=1)]]
+        if len(coords) > 1 and np.array_equal(coords[0], coords[-1]):
+            coords = coords[:-1]
+        if len(coords) < 3:
+            if i == 0:
+                return []
+            continue
+        x, y = coords[:, 0], coords[:, 1]
+        area = int(x[:-1] @ y[1:] - x[1:] @ y[:-1] + x[-1] * y[0] - x[0] * y[-1])
+        if area == 0:
+            if i == 0:
+                return []
+            continue
+        # Exterior rings have positive area in tile coordinates (y down),
+        # holes negative
+        if (area > 0) != (i == 0):
+            coords = coords[::-1]
+        rings.append(coords)
+    return rings
+
+
+def _aggregate_properties(risk, members):
+    """Properties of one feature standing in for several zones (``members`` are their properties)"""
+    count = sum(p.get('zone_count', 1) for p in members)
+    name = members[0].get('name') if count == 1 else None
+    return {
+        "risk": risk,
+        "severity": max_severity(p.get('severity') for p in members),
+        "name": name or f"{count} {risk.replace('_', ' ')} zones",
+        "zone_count": count,
+        "aggregated": True,
+    }
+
+
+def _aggregate(members, geometries, properties, scale):
+    """One disc-cluster feature per (cluster cell, risk) for zones too small to draw"""
+    centroids = shapely.get_coordinates(shapely.centroid(geometries[members]))
+    risks = [properties[i].get('risk', 'unknown') for i in members]
+    groups = defaultdict(list)
+    cells = np.floor(centroids * scale / CLUSTER_UNITS).astype(np.int64)
+    for row, (cell, risk) in enumerate(zip(map(tuple, cells.tolist()), risks)):
+        groups[(cell, risk)].append(row)
+
+    radius = MIN_FEATURE_UNITS / 2 / scale
+    return [
+        (shapely.buffer(shapely.multipoints(centroids[rows]), radius, quad_segs=4),
+         _aggregate_properties(risk, [properties[members[row]] for row in rows]))
+        for (_, risk), rows in groups.items()
+    ]
+
+
+def _coalesce(clipped, scale):
+    """Union a dense tile's (geometry, properties, id) entries per risk and severity
+
+    Each group is unioned by buffering its overlapping parts by zero (much
+    faster than a cascaded union for many small overlapping zones) and
+    simplified again; coalesced features carry no id.
+    """
+    groups = defaultdict(list)
+    for geometry, props, _ in clipped:
+        groups[(props.get('risk', 'unknown'), props.get('severity'))].append((geometry, props))
+    coalesced = []
+    for (risk, _), members in groups.items():
+        parts = shapely.get_parts(np.array([g for g, _ in members], dtype=object))
+        polygons = parts[shapely.get_type_id(parts) == 3]
+        merged = shapely.buffer(shapely.multipolygons(polygons), 0)
+        coalesced.append((shapely.simplify(merged, SIMPLIFY_UNITS / scale),
+                          _aggregate_properties(risk, [p for _, p in members]), None))
+    return coalesced
+
+
+class TilePyramid:
+    """Build MVT tiles for a list of GeoJSON features, one zoom at a time"""
+
+    def __init__(self, features, min_zoom=DEFAULT_MIN_ZOOM, max_zoom=DEFAULT_MAX_ZOOM):
+        if shapely is None:
+            raise RuntimeError("Building vector tiles requires shapely (pip install shapely)")
+        features = [f for f in features if f.get('geometry')]
+        self.min_zoom, self.max_zoom = min_zoom, max_zoom
+        self.properties = [dict(f.get('properties') or {}) for f in features]
+        geometries = shapely.make_valid(np.array([shape(f['geometry']) for f in features], dtype=object))
+        self.geometries = shapely.transform(geometries, mercator)
+
+    def zoom_features(self, zoom):
+        """(geometry, properties, feature id) for one zoom, small zones aggregated"""
+        scale = 2 ** zoom * EXTENT
+        simplified = shapely.simplify(self.geometries, SIMPLIFY_UNITS / scale, preserve_topology=True)
+        bounds = shapely.bounds(simplified)
+        size = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]) * scale
+        small = np.flatnonzero(size < MIN_FEATURE_UNITS)
+        result = [(simplified[i], self.properties[i], i + 1)
+                  for i in np.flatnonzero(size >= MIN_FEATURE_UNITS).tolist()]
+        if small.size:
+            clusters = _aggregate(small, self.geometries, self.properties, scale)
+            first_id = len(self.properties) + 1
+            result += [(geometry, props, first_id + i) for i, (geometry, props) in enumerate(clusters)]
+        return result
+
+    def tiles(self, zoom):
+        """Yield (x, y, encoded tile) for every non-empty tile at ``zoom``"""
+        n = 2 ** zoom
+        scale = n * EXTENT
+        pad = BUFFER / EXTENT
+        features = self.zoom_features(zoom)
+        if not features:
+            return
+        bounds = shapely.bounds(np.array([g for g, _, _ in features], dtype=object)) * n
+        x0 = np.clip(np.floor(bounds[:, 0] - pad), 0, n - 1).astype(int).tolist()
+        x1 = np.clip(np.floor(bounds[:, 2] + pad), 0, n - 1).astype(int).tolist()
+        y0 = np.clip(np.floor(bounds[:, 1] - pad), 0, n - 1).astype(int).tolist()
+        y1 = np.clip(np.floor(bounds[:, 3] + pad), 0, n - 1).astype(int).tolist()
+        buckets = defaultdict(list)
+        for i in range(len(features)):
+            for x in range(x0[i], x1[i] + 1):
+                for y in range(y0[i], y1[i] + 1):
+                    buckets[(x, y)].append(i)
+
+        for (x, y), members in sorted(buckets.items()):
+            geometries = shapely.clip_by_rect(
+                np.array([features[i][0] for i in members], dtype=object),
+                (x - pad) / n, (y - pad) / n, (x + 1 + pad) / n, (y + 1 + pad) / n)
+            clipped = [(geometry, *features[i][1:]) for i, geometry in zip(members, geometries)
+                       if not geometry.is_empty]
+            if len(clipped) > MAX_TILE_FEATURES:
+                clipped = _coalesce(clipped, scale)
+            origin = np.array([x / n, y / n])
+            encoded = []
+            for geometry, props, feature_id in clipped:
+                rings = []
+                for polygon in shapely.get_parts(geometry):
+                    if polygon.geom_type == 'Polygon':
+                        rings += _tile_rings(polygon, origin, scale)
+                if rings:
+                    encoded.append((feature_id, props, rings))
+            if encoded:
+                yield x, y, encode_layer(LAYER_NAME, encoded)
+
+    def fields(self):
+        """Attribute names and types for the TileJSON ``vector_layers`` entry"""
+        names = {"String": str, "Number": (int, float), "Boolean": bool}
+        fields = {"zone_count": "Number", "aggregated": "Boolean"}
+        for props in self.properties:
+            for key, value in props.items():
+                for kind, types in names.items():
+                    if isinstance(value, types) and key not in fields:
+                        fields[key] = kind
+                        break
+        return fields
+
+
+class MBTilesWriter:
+    """Write gzipped tiles into an MBTiles (SQLite) file, swapped in atomically on close"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.db = sqlite3.connect(self.tmp_path)
+        self.db.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        """)
+
+    def add(self, zoom, x, y, data):
+        # MBTiles rows are numbered from the south (TMS)
+        self.db.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                        (zoom, x, 2 ** zoom - 1 - y, gzip.compress(data, 6)))
+
+    def close(self, metadata):
+        self.db.executemany("INSERT INTO metadata VALUES (?, ?)",
+                            [(k, v if isinstance(v, str) else json.dumps(v)) for k, v in metadata.items()])
+        self.db.commit()
+        self.db.close()
+        os.replace(self.tmp_path, self.path)
+
+
+class DirectoryWriter:
+    """Write uncompressed ``{z}/{x}/{y}.pbf`` tiles plus ``metadata.json``, replacing the old tree on close"""
+
+    def __init__(self, path):
+        self.path = path.rstrip('/')
+        self.tmp_path = self.path + '.tmp'
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def add(self, zoom, x, y, data):
+        directory = os.path.join(self.tmp_path, str(zoom), str(x))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{y}.pbf"), 'wb') as f:
+            f.write(data)
+
+    def close(self, metadata):
+        os.makedirs(self.tmp_path, exist_ok=True)
+        with open(os.path.join(self.tmp_path, "metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+
+
+@metrics.timed("vector_tiles")
+def write_tiles(features, output, min_zoom=DEFAULT_MIN_ZOOM, max_zoom=DEFAULT_MAX_ZOOM, name=LAYER_NAME):
+    """Build the pyramid into ``output`` (``.mbtiles`` file or directory); returns tiles per zoom"""
+    pyramid = TilePyramid(features, min_zoom, max_zoom)
+    writer = MBTilesWriter(output) if output.endswith('.mbtiles') else DirectoryWriter(output)
+    counts = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        with metrics.stage("tile_zoom", zoom=zoom):
+            counts[zoom] = 0
+            for x, y, data in pyramid.tiles(zoom):
+                writer.add(zoom, x, y, data)
+                counts[zoom] += 1
+        metrics.count("vector_tiles", counts[zoom], zoom=zoom)
+
+    min_lat, max_lat, min_lon, max_lon = DEFAULT_BOUNDS
+    writer.close({
+        "name": name,
+        "format": "pbf",
+        "type": "overlay",
+        "version": "1",
+        "minzoom": str(min_zoom),
+        "maxzoom": str(max_zoom),
+        "bounds": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+        "center": f"{(min_lon + max_lon) / 2},{(min_lat + max_lat) / 2},{min_zoom + 2}",
+        "json": json.dumps({"vector_layers": [{
+            "id": LAYER_NAME, "minzoom": min_zoom, "maxzoom": max_zoom, "fields": pyramid.fields(),
+        }]}),
+    })
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a vector tile pyramid of the generated geofences")
+    parser.add_argument("inputs", nargs="*",
+                        help="FeatureCollection files (default: the unified dataset, else every generated one)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="MBTiles file (*.mbtiles) or directory for {z}/{x}/{y}.pbf tiles")
+    parser.add_argument("--min-zoom", type=int, default=DEFAULT_MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=DEFAULT_MAX_ZOOM)
+    args = parser.parse_args()
+
+    paths = args.inputs or zone_paths()
+    features = []
+    for path in paths:
+        for feature in load_feature_collection(path).get('features', []):
+            dataset = os.path.splitext(os.path.basename(path))[0]
+            features.append(dict(feature, properties=dict(feature.get('properties') or {}, dataset=dataset)))
+
+    started = time.perf_counter()
+    counts = write_tiles(features, args.output, args.min_zoom, args.max_zoom)
+    print(f"🧱 {sum(counts.values())} vector tiles (z{args.min_zoom}-z{args.max_zoom}) "
+          f"from {len(features)} zones in {time.perf_counter() - started:.1f}s")
+    for zoom, count in counts.items():
+        print(f"   z{zoom}: {count} tiles")
+    print(f"📁 Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from geofencing.columnar import ColumnarGeofences, ColumnarWriter, write_columnar
+from geofencing.geometry import circle_features
+
+
+def sample_features():
+    features = list(circle_features([20.0, 28.61, 12.97], [78.0, 77.21, 77.59], [5, 20, 1.5],
+                                    properties=[{"risk": "flood", "severity": "high", "aqi": 150},
+                                                {"risk": "fire", "city": "Delhi", "elevation": 216.5},
+                                                {"risk": "flood", "source": "IMD", "aqi": "N/A"}]))
+    features.append({"type": "Feature", "geometry": {"type": "MultiPolygon", "coordinates": [
+        [[[70, 20], [71, 20], [71, 21], [70, 20]]],
+        [[[72, 20], [74, 20], [74, 22], [72, 22], [72, 20]],
+         [[72.5, 20.5], [73, 20.5], [73, 21], [72.5, 20.5]]],
+    ]}, "properties": {"risk": "landslide", "severity": "extreme", "confidence": 0.8}})
+    features.append({"type": "Feature", "geometry": None, "properties": {"risk": "unknown"}})
+    return features
+
+
+def parts_of(geometry):
+    if geometry is None:
+        return []
+    return [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 4096])
+def test_round_trip(tmp_path, chunk_size):
+    path = str(tmp_path / "zones.col")
+    features = sample_features()
+    assert write_columnar(path, features, metadata={"version": 3}, chunk_size=chunk_size) == len(features)
+    reader = ColumnarGeofences(path)
+
+    assert len(reader) == len(features)
+    assert reader.metadata == {"version": 3}
+    for i, feature in enumerate(features):
+        expected = parts_of(feature["geometry"])
+        actual = reader.rings(i)
+        assert len(actual) == len(expected)
+        for rings, expected_rings in zip(actual, expected):
+            assert len(rings) == len(expected_rings)
+            for ring, expected_ring in zip(rings, expected_rings):
+                np.testing.assert_array_equal(ring, np.asarray(expected_ring, dtype=np.float32))
+        if expected:
+            coords = np.vstack([np.asarray(ring, dtype=np.float32) for rings in expected for ring in rings])
+            np.testing.assert_array_equal(reader.bbox[i], [*coords.min(axis=0), *coords.max(axis=0)])
+    assert reader.geometry(4) is None
+    assert reader.geometry(3)["type"] == "MultiPolygon"
+    assert reader.geometry(0)["type"] == "Polygon"
+
+    assert reader.properties(0) == {"risk": "flood", "severity": "high", "aqi": 150.0}
+    assert reader.properties(1) == {"risk": "fire", "city": "Delhi", "elevation": 216.5}
+    # Values that aren't numbers read back as missing
+    assert reader.properties(2) == {"risk": "flood", "source": "IMD"}
+    assert reader.properties(3)["confidence"] == pytest.approx(0.8)
+    assert reader.mask("risk", "flood").tolist() == [True, False, True, False, False]
+    assert not reader.mask("risk", "tsunami").any()
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    path = str(tmp_path / "zones.col")
+    with pytest.raises(RuntimeError):
+        with ColumnarWriter(path) as writer:
+            writer.write_all(sample_features())
+            raise RuntimeError("interrupted")
+    assert os.listdir(tmp_path) == []
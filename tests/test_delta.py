@@ -0,0 +1,96 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from geofencing.delta import (assign_ids, delta_path, index_path, load_snapshot,
+                              write_incremental)
+
+
+def zone(name, x, risk="flood", timestamp="2026-01-01T00:00:00", **props):
+    ring = [[x, 20], [x + 1, 20], [x + 1, 21], [x, 20]]
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": dict(props, risk=risk, name=name, timestamp=timestamp)}
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def by_name(path):
+    return {f["properties"]["name"]: f for f in read(path)["features"]}
+
+
+def test_ids_are_stable_and_distinct():
+    features = [zone("a", 70), zone("b", 71), zone("a", 72)]
+    ids = [f["id"] for f in assign_ids(features)]
+    assert len(set(ids)) == 3
+    assert ids[2] == f"{ids[0]}-1"
+    # Geometry and timestamps don't take part in the ID
+    assert [f["id"] for f in assign_ids([zone("a", 80, timestamp="x"), zone("b", 81)])] == ids[:2]
+
+
+def test_added_changed_removed(tmp_path):
+    path = str(tmp_path / "zones.json")
+    version, delta = write_incremental(path, [zone("a", 70), zone("b", 71), zone("c", 72)])
+    assert version == 1 and len(delta["added"]) == 3
+    first = by_name(path)
+
+    version, delta = write_incremental(path, iter([zone("a", 70), zone("b", 75), zone("d", 73)]))
+    assert version == 2
+    assert delta["added"] == [by_name(path)["d"]["id"]]
+    assert delta["changed"] == [first["b"]["id"]]
+    assert delta["removed"] == [first["c"]["id"]]
+    assert {name: f["id"] for name, f in by_name(path).items() if name in "ab"} == \
+        {name: f["id"] for name, f in first.items() if name in "ab"}
+
+    on_disk = read(delta_path(path))
+    assert on_disk["version"] == 2 and on_disk["base_version"] == 1
+    assert [f["properties"]["name"] for f in on_disk["added"]] == ["d"]
+    assert [f["properties"]["name"] for f in on_disk["changed"]] == ["b"]
+    assert on_disk["removed"] == delta["removed"]
+    assert read(path)["metadata"]["version"] == 2
+    assert read(index_path(path))["version"] == 2
+
+
+def test_unchanged_run_rewrites_nothing(tmp_path):
+    path = str(tmp_path / "zones.json")
+    write_incremental(path, [zone("a", 70), zone("b", 71)])
+    with open(path, "rb") as f:
+        before = f.read()
+
+    # Only the timestamp moved: the zones keep their first one
+    version, delta = write_incremental(path, [zone("a", 70, timestamp="2026-02-01T00:00:00"),
+                                              zone("b", 71, timestamp="2026-02-01T00:00:00")])
+    assert (version, delta) == (1, None)
+    with open(path, "rb") as f:
+        assert f.read() == before
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_refreshed_transient_zone_is_a_change(tmp_path):
+    path = str(tmp_path / "zones.json")
+    write_incremental(path, [zone("jam", 70, risk="traffic_incident"), zone("river", 71)])
+
+    later = "2026-01-01T01:00:00"
+    version, delta = write_incremental(path, [zone("jam", 70, risk="traffic_incident", timestamp=later),
+                                              zone("river", 71, timestamp=later)])
+    zones = by_name(path)
+    assert version == 2 and delta["changed"] == [zones["jam"]["id"]]
+    # The incident's expiry follows its new timestamp; the river keeps its first one
+    assert zones["jam"]["properties"]["timestamp"] == later
+    assert zones["river"]["properties"]["timestamp"] == "2026-01-01T00:00:00"
+
+
+def test_load_snapshot_skips_expired_zones(tmp_path):
+    path = str(tmp_path / "zones.json")
+    now = datetime(2026, 1, 1, 12)
+    write_incremental(path, [
+        zone("old jam", 70, risk="traffic_incident", timestamp=(now - timedelta(hours=3)).isoformat()),
+        zone("new jam", 71, risk="traffic_incident", timestamp=(now - timedelta(hours=1)).isoformat()),
+        zone("cancelled", 72, expires_at=(now - timedelta(minutes=1)).isoformat()),
+        zone("river", 73, timestamp="2020-01-01T00:00:00"),
+    ])
+    features, metadata = load_snapshot(path, now=now.timestamp())
+    assert [f["properties"]["name"] for f in features] == ["new jam", "river"]
+    assert metadata["version"] == 1
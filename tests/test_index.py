@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+shapely = pytest.importorskip("shapely")
+from shapely.geometry import shape  # noqa: E402
+
+from geofencing.index import GeofenceIndex  # noqa: E402
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def circle(x, y, radius, count):
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    ring = np.column_stack([x + radius * np.cos(angles), y + radius * np.sin(angles)])
+    return np.vstack([ring, ring[:1]]).tolist()
+
+
+def polygon(*rings):
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": list(rings)},
+            "properties": {}}
+
+
+def multipolygon(*parts):
+    return {"type": "Feature", "geometry": {"type": "MultiPolygon", "coordinates": list(parts)},
+            "properties": {}}
+
+
+FEATURES = [
+    polygon(square(0, 0, 4), square(1, 1, 2)),                    # holed
+    multipolygon([square(5, 0, 1)], [square(7, 0, 1), square(7.25, 0.25, 0.5)]),
+    polygon(circle(3, 6, 2, 400)),                                # too large to pad
+    polygon(circle(6, 5, 1.5, 32)),                               # padded fast path
+    polygon(square(2, 2, 4)),                                     # overlaps the others
+    {"type": "Feature", "geometry": None, "properties": {}},
+]
+
+
+def shapely_pairs(lats, lons, predicate):
+    pairs = set()
+    for fid, feature in enumerate(FEATURES):
+        if feature["geometry"] is None:
+            continue
+        inside = predicate(shape(feature["geometry"]), lons, lats)
+        pairs.update((int(p), fid) for p in np.flatnonzero(inside))
+    return pairs
+
+
+def index_pairs(index, lats, lons):
+    points, fids = index.match_pairs(lats, lons)
+    return set(zip(points.tolist(), fids.tolist()))
+
+
+@pytest.mark.parametrize("cell_size", [None, 0.5, 20])
+def test_match_pairs_agree_with_shapely(cell_size):
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-1, 10, 20000)
+    lats = rng.uniform(-1, 10, 20000)
+    index = GeofenceIndex(FEATURES, cell_size=cell_size)
+
+    assert index_pairs(index, lats, lons) == shapely_pairs(lats, lons, shapely.contains_xy)
+
+
+def test_match_pairs_sorted_and_unique():
+    rng = np.random.default_rng(1)
+    lons, lats = rng.uniform(-1, 10, 5000), rng.uniform(-1, 10, 5000)
+    index = GeofenceIndex(FEATURES)
+    points, fids = index.match_pairs(lats, lons)
+    keys = points * len(FEATURES) + fids
+    assert np.all(np.diff(keys) > 0)
+    assert index.query_many(lats[:50], lons[:50]) == [
+        sorted(fid for p, fid in zip(points, fids) if p == i) for i in range(50)]
+
+
+def test_points_on_edges_and_vertices():
+    lons, lats = [], []
+    for feature in FEATURES:
+        geometry = feature["geometry"]
+        if geometry is None:
+            continue
+        parts = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        for rings in parts:
+            for ring in rings:
+                ring = np.asarray(ring)
+                middles = (ring[:-1] + ring[1:]) / 2
+                for x, y in np.vstack([ring, middles]):
+                    lons.append(x)
+                    lats.append(y)
+    lats, lons = np.array(lats), np.array(lons)
+    found = index_pairs(GeofenceIndex(FEATURES), lats, lons)
+
+    # A point on (or within rounding of) a boundary may fall either side of
+    # it, but never further than that
+    inner = shapely_pairs(lats, lons, lambda g, x, y: shapely.contains_xy(g.buffer(-1e-9), x, y))
+    outer = shapely_pairs(lats, lons, lambda g, x, y: shapely.intersects_xy(g.buffer(1e-9), x, y))
+    assert inner <= found <= outer
+    assert len(found) > len(inner)
+
+
+def test_empty_inputs():
+    index = GeofenceIndex(FEATURES)
+    points, fids = index.match_pairs([], [])
+    assert points.size == fids.size == 0
+    points, fids = GeofenceIndex([]).match_pairs([1.0], [1.0])
+    assert points.size == fids.size == 0
@@ -0,0 +1,24 @@
+import json
+import os
+
+import pytest
+
+from geofencing.index import DATASETS, DEFAULT_DATA_DIR
+from geofencing.landmask import LandMask
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", DEFAULT_DATA_DIR)
+
+
+@pytest.fixture(scope="module")
+def mask():
+    return LandMask.build()
+
+
+@pytest.mark.parametrize("dataset", DATASETS)
+def test_sample_datasets_keep_every_zone(mask, dataset):
+    with open(os.path.join(DATA_DIR, f"{dataset}.json")) as f:
+        features = json.load(f)["features"]
+    assert features
+    dropped = [f["properties"] for f, keep in zip(features, mask.feature_mask(features)) if not keep]
+    assert dropped == []
+    assert len(mask.filter_features(features)) == len(features)
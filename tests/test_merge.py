@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import pytest
+
+from geofencing.merge import merge_features, normalize_properties
+
+
+def box(x0, y0, x1, y1):
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def zone(geometry, **props):
+    return {"type": "Feature", "geometry": geometry, "properties": props}
+
+
+def by_name(features):
+    return {f["properties"]["name"]: f["properties"] for f in features}
+
+
+def test_exact_duplicates_across_datasets_and_sources():
+    square = box(72, 19, 73, 20)
+    datasets = OrderedDict([
+        ("comprehensive", [zone(square, risk="Flood", severity="high", name="Mumbai flood",
+                                source="IMD", timestamp="2026-01-01T00:00:00")]),
+        ("enhanced", [zone(box(72.00001, 19, 73, 20), risk="flood", severity="High",
+                           name="Mumbai flood", source="OpenWeather", timestamp="2026-01-02T00:00:00")]),
+    ])
+    (merged,) = merge_features(datasets, min_overlap=2)
+    props = merged["properties"]
+    assert props["datasets"] == ["comprehensive", "enhanced"]
+    assert props["sources"] == ["IMD", "OpenWeather"]
+    assert props["source"] == "IMD"
+    assert props["timestamp"] == "2026-01-02T00:00:00"
+    assert props["merged_count"] == 2
+    assert merged["geometry"] == square
+
+
+def test_different_properties_are_kept_apart():
+    square = box(72, 19, 73, 20)
+    datasets = OrderedDict([
+        ("a", [zone(square, risk="flood", name="Flood"), zone(square, risk="fire", name="Fire")]),
+        ("b", [zone(square, risk="flood", name="Flood", severity="low")]),
+    ])
+    merged = merge_features(datasets, min_overlap=2)
+    assert [(f["properties"]["risk"], f["properties"].get("severity")) for f in merged] == \
+        [("flood", None), ("fire", None), ("flood", "low")]
+    assert all(f["properties"]["merged_count"] == 1 for f in merged)
+
+
+def test_zones_of_one_dataset_stay_distinct():
+    pytest.importorskip("shapely")
+    datasets = OrderedDict([("a", [zone(box(72, 19, 73, 20), risk="flood", name="One"),
+                                   zone(box(72.1, 19, 73.1, 20), risk="flood", name="Two")])])
+    assert len(merge_features(datasets)) == 2
+
+
+def test_near_duplicates_merge_across_datasets():
+    pytest.importorskip("shapely")
+    datasets = OrderedDict([
+        ("a", [zone(box(72, 19, 73, 20), risk="flood", severity="medium", name="Mumbai")]),
+        ("b", [zone(box(72.2, 19, 73.2, 20), risk="flood", severity="extreme", name="Mumbai rain"),
+               zone(box(72.2, 19, 73.2, 20), risk="fire", name="Far fire")]),
+        ("c", [zone(box(80, 10, 81, 11), risk="flood", name="Chennai")]),
+    ])
+    merged = by_name(merge_features(datasets, min_overlap=0.5))
+    assert sorted(merged) == ["Chennai", "Far fire", "Mumbai"]
+    assert merged["Mumbai"]["severity"] == "extreme"
+    assert merged["Mumbai"]["names"] == ["Mumbai", "Mumbai rain"]
+    assert merged["Mumbai"]["datasets"] == ["a", "b"]
+    # Barely overlapping zones stay apart
+    assert len(merge_features(datasets, min_overlap=0.9)) == 4
+
+
+def test_normalize_properties():
+    props = normalize_properties({"risk": "Mountain Hazard", "severity": "HIGH", "state": "Sikkim",
+                                  "aqi": None}, "mountain")
+    assert props == {"risk": "elevation_hazard", "severity": "high", "state": "Sikkim",
+                     "location": "Sikkim", "name": "Elevation hazard - Sikkim", "source": "mountain",
+                     "datasets": ["mountain"], "sources": ["mountain"], "merged_count": 1}
+    assert "severity" not in normalize_properties({"severity": "severe"}, "x")
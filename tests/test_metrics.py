@@ -0,0 +1,18 @@
+from geofencing.metrics import Metrics
+
+
+def test_mixed_int_and_str_label_values():
+    metrics = Metrics(enabled=True)
+    metrics.count("http_requests", source="weather", status=200)
+    metrics.count("http_requests", source="weather", status="error")
+    metrics.count("http_requests", source="weather", status=200)
+    with metrics.stage("fetch", status=304):
+        pass
+    with metrics.stage("fetch", status="error"):
+        pass
+
+    text = metrics.prometheus()
+    assert 'geofence_http_requests_total{source="weather",status="200"} 2' in text
+    assert 'geofence_http_requests_total{source="weather",status="error"} 1' in text
+    counters = {tuple(sorted(c["labels"].items())): c["value"] for c in metrics.snapshot()["counters"]}
+    assert counters[(("source", "weather"), ("status", "200"))] == 2
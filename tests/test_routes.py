@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from geofencing.index import GeofenceIndex
+from geofencing.routes import route_distances, route_zones
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def feature(name, *rings, multi=False):
+    geometry = {"type": "MultiPolygon", "coordinates": [[ring] for ring in rings]} if multi \
+        else {"type": "Polygon", "coordinates": list(rings)}
+    return {"type": "Feature", "geometry": geometry, "properties": {"name": name}}
+
+
+ZONES = [
+    feature("holed", box(71, 19, 73, 21), box(71.5, 19.5, 72.5, 20.5)),
+    feature("north", box(74, 20.2, 75, 21)),
+    feature("islands", box(76, 19.5, 76.5, 20.5), box(77, 19.5, 77.5, 20.5), multi=True),
+]
+
+# Along the 20th parallel from 70°E to 78°E, a vertex every 0.25°
+LONS = np.arange(70, 78.001, 0.25)
+LATS = np.full(LONS.size, 20.0)
+
+
+def km_at(lon):
+    """Distance along the route at a longitude it passes through"""
+    return float(route_distances(LATS, LONS)[np.flatnonzero(np.isclose(LONS, lon))[0]])
+
+
+def passes(results):
+    return [(r["properties"]["name"], r["entry"][0], r["exit"][0]) for r in results]
+
+
+def test_entry_and_exit_distances():
+    results = route_zones(GeofenceIndex(ZONES), LATS, LONS)
+    assert passes(results) == [("holed", pytest.approx(71), pytest.approx(71.5)),
+                               ("holed", pytest.approx(72.5), pytest.approx(73)),
+                               ("islands", pytest.approx(76), pytest.approx(76.5)),
+                               ("islands", pytest.approx(77), pytest.approx(77.5))]
+    for result in results:
+        assert result["entry_km"] == pytest.approx(km_at(result["entry"][0]), abs=1e-3)
+        assert result["exit_km"] == pytest.approx(km_at(result["exit"][0]), abs=1e-3)
+        assert result["entry"][1] == pytest.approx(20) and result["exit"][1] == pytest.approx(20)
+    assert [r["feature"] for r in results] == [0, 0, 2, 2]
+    assert results[0]["entry_km"] == pytest.approx(111.195 * np.cos(np.radians(20)), rel=1e-3)
+
+
+def test_entry_and_exit_within_segments():
+    # Two long segments: the zone edges fall inside them, not on vertices
+    lats, lons = [20.0, 20.0, 20.0], [70.0, 72.0, 74.0]
+    (first, second) = route_zones(GeofenceIndex(ZONES[:1]), lats, lons)
+    total = route_distances(lats, lons)
+    assert first["entry_km"] == pytest.approx(total[1] / 2, rel=1e-4)
+    assert first["exit_km"] == pytest.approx(total[1] * 0.75, rel=1e-4)
+    assert second["entry_km"] == pytest.approx(total[1] + (total[2] - total[1]) / 4, rel=1e-4)
+    assert second["exit_km"] == pytest.approx(total[1] + (total[2] - total[1]) / 2, rel=1e-4)
+
+
+def test_buffer_reaches_nearby_zones():
+    index = GeofenceIndex(ZONES[1:2])
+    # The zone starts 0.2° (about 22 km) north of the route
+    assert route_zones(index, LATS, LONS, buffer_km=15) == []
+    (result,) = route_zones(index, LATS, LONS, buffer_km=30)
+    assert result["properties"] == {"name": "north"}
+    assert result["entry"][0] < 74 < 75 < result["exit"][0]
+
+
+def test_route_starting_inside_a_zone():
+    lats, lons = [20.0, 20.0, 20.0], [72.0, 72.0, 74.0]
+    results = route_zones(GeofenceIndex([feature("solid", box(71, 19, 73, 21))]), lats, lons)
+    assert len(results) == 1
+    assert results[0]["entry_km"] == 0
+    assert results[0]["exit"][0] == pytest.approx(73)
+
+
+def test_no_zones_or_no_movement():
+    assert route_zones(GeofenceIndex([]), LATS, LONS) == []
+    assert route_zones(GeofenceIndex(ZONES), [20.0, 20.0], [71.8, 71.8]) == []
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from geofencing.store import FeatureStore
+
+NOW = datetime(2026, 1, 1, 12)
+TTLS = {"traffic_incident": 2 * 3600, "crowd_density": 6 * 3600}
+
+
+def zone(name, x, risk="flood", hours_ago=0, **props):
+    ring = [[x, 20.0], [x + 1, 20.0], [x + 1, 21.0], [x, 20.0]]
+    props = dict(props, risk=risk, name=name, timestamp=(NOW - timedelta(hours=hours_ago)).isoformat())
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": props}
+
+
+def multi(name, x):
+    parts = [[[[x, 10.0], [x + 1, 10.0], [x, 11.0], [x, 10.0]]],
+             [[[x + 2, 10.0], [x + 4, 10.0], [x + 2, 12.0], [x + 2, 10.0]],
+              [[x + 2.2, 10.2], [x + 2.5, 10.2], [x + 2.2, 10.5], [x + 2.2, 10.2]]]]
+    return {"type": "Feature", "geometry": {"type": "MultiPolygon", "coordinates": parts},
+            "properties": {"risk": "flood", "name": name, "tags": ["a", "b"]}}
+
+
+def as_dicts(store):
+    return [feature.to_geojson() for feature in store]
+
+
+def test_round_trip_keeps_geometry_and_properties():
+    features = [zone("a", 70), multi("b", 72),
+                {"type": "Feature", "geometry": None, "properties": {"flag": True, "count": 1}},
+                {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [0, 1], [0, 0]]]},
+                 "properties": None}]
+    store = FeatureStore(features)
+    assert len(store) == 4
+    assert as_dicts(store) == features
+    # True and 1 are interned apart
+    assert store[2]["properties"] == {"flag": True, "count": 1}
+    assert store[2]["properties"]["flag"] is True
+    assert store[-1]["properties"] is None
+    with pytest.raises(ValueError):
+        store.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": [0, 0]}})
+
+
+def test_expire_drops_due_zones_in_order():
+    store = FeatureStore(ttls=TTLS)
+    store.extend([zone("old jam", 70, "traffic_incident", hours_ago=3),
+                  zone("river", 71),
+                  zone("crowd", 72, "crowd_density", hours_ago=1),
+                  multi("hills", 73),
+                  zone("jam", 74, "traffic_incident", hours_ago=1)])
+    now = NOW.timestamp()
+    assert store.next_expiry == now - 3600
+
+    assert store.expire(now) == 1
+    assert [f["properties"]["name"] for f in store] == ["river", "crowd", "hills", "jam"]
+    assert store.next_expiry == now + 3600
+    assert store.expire(now) == 0
+
+    assert store.expire(now + 6 * 3600) == 2
+    assert [f["properties"]["name"] for f in store] == ["river", "hills"]
+    assert store.next_expiry is None
+    assert as_dicts(store) == [zone("river", 71), multi("hills", 73)]
+
+
+def test_explicit_expires_at_without_ttls():
+    store = FeatureStore()
+    store.append(zone("cancelled", 70, expires_at=(NOW - timedelta(minutes=1)).isoformat()))
+    store.append(zone("river", 71))
+    store.append(zone("bad", 72, expires_at="soon"))
+    assert store.expire(NOW.timestamp()) == 1
+    assert [f["properties"]["name"] for f in store] == ["river", "bad"]
+
+
+def test_compact_releases_unused_values_and_matches_take():
+    store = FeatureStore([zone("a", 70, city="Pune"), multi("b", 72), zone("c", 75, city="Goa"),
+                          zone("d", 76, extra=1)])
+    keep = np.array([True, False, False, True])
+    expected = as_dicts(store.take(np.flatnonzero(keep)))
+
+    store._compact(keep)
+    assert as_dicts(store) == expected
+    assert store.values["name"] == ["a", "d"]
+    assert store.values["city"] == ["Pune"]
+    assert "tags" not in store.columns
+    assert len(store.schemas) == 2
+
+    # Interning keeps working on the compacted columns
+    store.append(zone("a", 77, city="Goa"))
+    assert store.values["name"] == ["a", "d"]
+    assert store.values["city"] == ["Pune", "Goa"]
+    assert store[-1]["properties"]["city"] == "Goa"
+    assert store[0]["properties"]["name"] == store[-1]["properties"]["name"] == "a"
+
+
+def test_extend_from_store_keeps_expiry():
+    source = FeatureStore()
+    source.append(zone("jam", 70, "traffic_incident", hours_ago=1))
+    target = FeatureStore(ttls=TTLS)
+    target.extend(source)
+    assert target.next_expiry == NOW.timestamp() + 3600
+    assert target.expire(NOW.timestamp() + 3601) == 1
+    assert len(target) == 0